@@ -0,0 +1,88 @@
+"""End-to-end time of the serial stages (load all, map.sql, export all) vs the overlapping async pipeline.
+
+Needs the docker-compose Postgres (see bench_loader.py). Tables are loaded under their own names,
+like a real run, so use a scratch database.
+
+    python benchmarks/bench_async_pipeline.py --rows 200000 --chunk-size 50000
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+import yaml
+
+from common import CONFIG_DIR, SCHEMA_PATH, db_session, write_table_csv
+from async_pipeline import run_async_pipeline
+from csv_processor import CSVProcessor
+from postgresCsvExporter import PostgresCsvExporter
+from postgresLoader import PostgresLoader
+from sqlScriptExecutor import SqlScriptExecutor
+
+SQL_PATH = os.path.join(CONFIG_DIR, "map.sql")
+
+
+def serial(folder: str, output_dir: str, tables: list, chunk_size: int) -> float:
+    start = time.perf_counter()
+    processor = CSVProcessor(SCHEMA_PATH)
+    session = db_session()
+    PostgresLoader(session).load_stream(processor.stream_files(folder, chunk_size))
+    SqlScriptExecutor(session).execute_sql_file(SQL_PATH)
+    exporter = PostgresCsvExporter(session)
+    exporter.export_tables_to_csv(tables, output_dir)
+    exporter.close()
+    return time.perf_counter() - start
+
+
+def overlapped(folder: str, output_dir: str, tables: list, chunk_size: int, workers: int) -> float:
+    start = time.perf_counter()
+    session = db_session()
+    executor = SqlScriptExecutor(session)
+
+    def export_table(table):
+        exporter = PostgresCsvExporter(session)
+        try:
+            exporter.export_tables_to_csv([table], output_dir)
+        finally:
+            exporter.close()
+
+    errors = run_async_pipeline(
+        CSVProcessor(SCHEMA_PATH), PostgresLoader(session),
+        run_sql=lambda: executor.execute_sql_file(SQL_PATH), export_table=export_table,
+        raw_data_dir=folder, to_export=tables, sql_script_path=SQL_PATH,
+        chunk_size=chunk_size, load_workers=workers, export_workers=workers,
+    )
+    if errors:
+        raise RuntimeError(errors)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(SCHEMA_PATH, "r") as f:
+        tables = list(yaml.safe_load(f))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for table in tables:
+            write_table_csv(table, args.rows, folder)
+        output_dir = os.path.join(folder, "output")
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial_time = serial(folder, output_dir, tables, args.chunk_size)
+            async_time = overlapped(folder, output_dir, tables, args.chunk_size, args.workers)
+
+    print(f"{len(tables)} tables x {args.rows:,} rows, chunks of {args.chunk_size:,}")
+    print(f"serial stages: {serial_time:.2f} s")
+    print(f"async pipeline: {async_time:.2f} s  (x{serial_time / async_time:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Casting low-cardinality columns: plain casters vs the distinct-value cache.
+
+Each column holds `--distinct` different values repeated over `--rows` rows, like `last_update`
+timestamps or status flags. Both the per-value (.apply) and the column casters are measured, and
+the cached results are checked against the plain ones.
+
+    python benchmarks/bench_cast_cache.py --rows 500000 --distinct 50 500
+"""
+import argparse
+import logging
+import random
+import time
+from functools import partial
+
+import pandas as pd
+
+from common import WORDS
+from cast_cache import FormatOrder, cast_distinct, memoized
+from PostgresCaster import PostgresCaster, TIMESTAMPTZ_FORMATS, DATE_FORMATS
+from series_caster import SeriesCaster
+
+
+def column_values(kind: str, distinct: int, rng: random.Random) -> list:
+    if kind == "timestamptz":
+        return [f"20{rng.randint(0, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+                for _ in range(distinct)]
+    if kind == "date":
+        #second format of the list, every value fails the first attempt without format memory
+        return [f"20{rng.randint(0, 24):02d}/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}"
+                for _ in range(distinct)]
+    if kind == "boolean":
+        return ["t", "f", "yes", "no", "unknown"][:max(2, min(distinct, 5))]
+    return [str(rng.randint(1, 10_000)) if rng.random() > 0.05 else rng.choice(WORDS) for _ in range(distinct)]
+
+
+CASTERS = {
+    "timestamptz": (PostgresCaster.to_timestamptz, SeriesCaster.to_timestamptz, TIMESTAMPTZ_FORMATS),
+    "date": (PostgresCaster.to_date, SeriesCaster.to_date, DATE_FORMATS),
+    "boolean": (PostgresCaster.to_boolean, SeriesCaster.to_boolean, None),
+    "integer": (PostgresCaster.to_integer, SeriesCaster.to_integer, None),
+}
+
+
+def timed(fn, series):
+    start = time.perf_counter()
+    result = fn(series)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, nargs="+", default=[20, 2_000])
+    args = parser.parse_args()
+    #dirty integer values are logged once per value without the cache, keep the output readable
+    logging.disable(logging.WARNING)
+    rng = random.Random(42)
+
+    for distinct in args.distinct:
+        for kind, (scalar, column, formats) in CASTERS.items():
+            values = column_values(kind, distinct, rng)
+            series = pd.Series([rng.choice(values) for _ in range(args.rows)], dtype=object)
+            if formats:
+                cached_scalar = memoized(partial(scalar, formats=FormatOrder(formats)))
+                cached_column = cast_distinct(partial(column, formats=FormatOrder(formats)))
+            else:
+                cached_scalar = memoized(scalar)
+                cached_column = cast_distinct(column)
+
+            expected, apply_time = timed(lambda s: s.apply(scalar), series)
+            memo, memo_time = timed(lambda s: s.apply(cached_scalar), series)
+            vector, vector_time = timed(column, series)
+            distinct_result, distinct_time = timed(cached_column, series)
+            for result in (memo, vector, distinct_result):
+                pd.testing.assert_series_equal(result.astype(object), expected.astype(object))
+
+            print(f"{kind:<12} rows={args.rows:>9,} distinct={distinct:>6,}  "
+                  f"apply={apply_time:.3f}s memo={memo_time:.3f}s (x{apply_time / memo_time:.0f})  "
+                  f"column={vector_time:.3f}s distinct={distinct_time:.3f}s (x{vector_time / distinct_time:.0f})")
+
+
+if __name__ == "__main__":
+    main()
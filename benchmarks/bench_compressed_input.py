@@ -0,0 +1,113 @@
+"""Transform time of a raw CSV delivered plain, compressed or in parts, against decompressing it to disk first.
+
+"decompress to disk" is what the run needed before compressed inputs were read directly: write the
+plain file out, then process it. Plain files are read memory-mapped; "no mmap" reads them without.
+
+    python benchmarks/bench_compressed_input.py --rows 200000 --parts 4
+"""
+import argparse
+import bz2
+import contextlib
+import gzip
+import io
+import logging
+import lzma
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from common import SCHEMA_PATH, write_table_csv
+from columnar import pa
+from csv_processor import CSVProcessor
+from raw_input import open_raw
+
+
+def compress(path: str, ext: str) -> str:
+    """Copy of the CSV compressed with the codec of `ext`, or None when it is not available here."""
+    target = path + ext
+    if ext == ".zst":
+        if pa is None or not pa.Codec.is_available("zstd"):
+            return None
+        with open(path, "rb") as src, pa.output_stream(target, compression="zstd") as out:
+            shutil.copyfileobj(src, out)
+        return target
+    opener = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}[ext]
+    with open(path, "rb") as src, opener(target, "wb") as out:
+        shutil.copyfileobj(src, out)
+    return target
+
+
+def split_parts(path: str, parts: int, folder: str) -> list:
+    """The CSV as `parts` gzipped files with the same header, named like a vendor's multi-part delivery."""
+    df = pd.read_csv(path, dtype=str)
+    table = os.path.basename(path).split(".")[0]
+    os.makedirs(folder, exist_ok=True)
+    step = -(-len(df) // parts)
+    for i in range(parts):
+        df.iloc[i * step:(i + 1) * step].to_csv(os.path.join(folder, f"{table}.part{i + 1}.csv.gz"), index=False)
+    return sorted(os.listdir(folder))
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return time.perf_counter() - start
+
+
+def decompress_then_process(processor: CSVProcessor, path: str, folder: str):
+    os.makedirs(folder, exist_ok=True)
+    plain = os.path.join(folder, os.path.basename(path).split(".")[0] + ".csv")
+    with open_raw(path) as src, open(plain, "wb") as out:
+        shutil.copyfileobj(src, out)
+    processor.process_file(plain)
+    os.remove(plain)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--table", default="film")
+    parser.add_argument("--parts", type=int, default=4)
+    parser.add_argument("--engine", default="auto", choices=("auto", "c", "pyarrow"))
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    processor = CSVProcessor(SCHEMA_PATH, csv_engine=args.engine)
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_table_csv(args.table, args.rows, folder)
+        plain_mb = os.path.getsize(path) / 1024 / 1024
+
+        print(f"{args.table}: {args.rows:,} rows, {plain_mb:.1f} MB plain, engine={args.engine}")
+        #first run warms the cast caches, every timing after it starts from the same state
+        timed(lambda: processor.process_file(path))
+        seconds = timed(lambda: processor.process_file(path))
+        print(f"{'.csv':<9} {plain_mb:>7.1f} MB  process={seconds:.3f}s ({args.rows / seconds:,.0f} rows/s)")
+        #the c parser memory-maps plain files, this is its read without
+        seconds = timed(lambda: pd.read_csv(path, dtype=str, memory_map=False))
+        mapped = timed(lambda: pd.read_csv(path, dtype=str, memory_map=True))
+        print(f"{'':<9} {'':>10}  c read: no mmap={seconds:.3f}s  mmap={mapped:.3f}s")
+
+        for ext in (".gz", ".bz2", ".xz", ".zst"):
+            compressed = compress(path, ext)
+            if compressed is None:
+                print(f"{'.csv' + ext:<9} skipped, no zstd codec")
+                continue
+            size = os.path.getsize(compressed) / 1024 / 1024
+            direct = timed(lambda: processor.process_file(compressed))
+            on_disk = timed(lambda: decompress_then_process(processor, compressed, os.path.join(folder, "unpacked")))
+            print(f"{'.csv' + ext:<9} {size:>7.1f} MB  process={direct:.3f}s  "
+                  f"decompress to disk + process={on_disk:.3f}s")
+            os.remove(compressed)
+
+        parts_dir = os.path.join(folder, "parts")
+        names = split_parts(path, args.parts, parts_dir)
+        seconds = timed(lambda: processor.process_files(parts_dir))
+        print(f"{len(names)} parts    .csv.gz  process_files={seconds:.3f}s ({args.rows / seconds:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Export time and peak Python memory of the COPY streaming export vs the pandas export.
+
+Needs the docker-compose Postgres (see bench_loader.py). The table is generated, loaded,
+exported with both methods and dropped again.
+
+    python benchmarks/bench_export.py --rows 500000 --table film --gzip
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import text
+
+from common import SCHEMA_PATH, db_session, write_table_csv
+from csv_processor import CSVProcessor
+from postgresLoader import PostgresLoader
+from postgresCsvExporter import PostgresCsvExporter
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--table", default="customer")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    table = f"bench_export_{args.table}"
+    loader = PostgresLoader(db_session())
+    with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+        df, _ = CSVProcessor(SCHEMA_PATH).process_file(write_table_csv(args.table, args.rows, folder))
+        loader.load_dataframe(df, table)
+    del df
+
+    exporter = PostgresCsvExporter(db_session())
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            for method in ("pandas", "copy"):
+                tracemalloc.start()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    exporter.export_tables_to_csv([table], output_dir, method=method, compress=args.gzip)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                size = os.path.getsize(exporter.output_path(table, output_dir, args.gzip))
+                print(f"{method:<7} {args.rows:>10,} rows  {elapsed:>7.2f} s  "
+                      f"peak python memory {peak / 1024 / 1024:>8.1f} MB  file {size / 1024 / 1024:>8.1f} MB")
+    finally:
+        exporter.close()
+        with loader.session.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Export + validation time: COPY export then DBMLValidator re-read, vs in-flight validation.
+
+Needs the docker-compose Postgres (see bench_loader.py). A DBML schema matching the
+generated table is written next to the outputs.
+
+    python benchmarks/bench_export_validate.py --rows 500000
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from common import SCHEMA_PATH, db_session, write_table_csv
+from csv_processor import CSVProcessor
+from postgresLoader import PostgresLoader
+from postgresCsvExporter import PostgresCsvExporter
+from parse_dbml_schema import DBMLValidator
+
+TABLE = "bench_validate_customer"
+DBML = f'''Table "{TABLE}" {{
+  "customer_id" int4 [pk, not null]
+  "store_id" int2 [not null]
+  "first_name" text [not null]
+  "last_name" text [not null]
+  "email" text
+  "address_id" int2 [not null]
+  "activebool" bool [not null]
+  "create_date" date [not null]
+  "last_update" timestamptz
+  "active" int4
+}}
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    loader = PostgresLoader(db_session())
+    with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+        df, _ = CSVProcessor(SCHEMA_PATH).process_file(write_table_csv("customer", args.rows, folder))
+        loader.load_dataframe(df, TABLE)
+    del df
+
+    exporter = PostgresCsvExporter(db_session())
+    try:
+        with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+            schema = os.path.join(folder, "schema.dbml")
+            with open(schema, "w") as f:
+                f.write(DBML)
+            validator = DBMLValidator(folder, schema, os.path.join(folder, "invalid"))
+
+            start = time.perf_counter()
+            exporter.export_tables_to_csv([TABLE], folder)
+            validator.validate_all_csv()
+            two_pass = time.perf_counter() - start
+
+            start = time.perf_counter()
+            exporter.export_tables_to_csv([TABLE], folder, validator=validator)
+            in_flight = time.perf_counter() - start
+    finally:
+        exporter.close()
+        with loader.session.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+    print(f"export then validate: {two_pass:>7.2f} s")
+    print(f"in-flight validation: {in_flight:>7.2f} s  ({two_pass / in_flight:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
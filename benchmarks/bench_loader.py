@@ -0,0 +1,53 @@
+"""Time PostgresLoader's COPY path against DataFrame.to_sql on a local Postgres.
+
+Start the database from the repo root first (credentials come from .env):
+
+    docker compose up -d
+    python benchmarks/bench_loader.py --rows 200000 --table film
+"""
+import argparse
+import contextlib
+import io
+import logging
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from common import SCHEMA_PATH, db_session, write_table_csv
+from csv_processor import CSVProcessor
+from postgresLoader import PostgresLoader
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--table", default="customer")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_table_csv(args.table, args.rows, folder)
+        with contextlib.redirect_stdout(io.StringIO()):
+            df, table_name = CSVProcessor(SCHEMA_PATH).process_file(path)
+
+    timings = {}
+    for method in ("to_sql", "copy"):
+        loader = PostgresLoader(db_session(), load_method=method)
+        target = f"bench_{table_name}_{method}"
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader.load_dataframe(df.copy(), target)
+        timings[method] = time.perf_counter() - start
+
+        with loader.session.begin() as conn:
+            count = conn.execute(text(f"SELECT count(*) FROM {target}")).scalar()
+            conn.execute(text(f"DROP TABLE {target}"))
+        assert count == len(df), f"{method} loaded {count} rows, expected {len(df)}"
+        print(f"{method:<7} {len(df):>10,} rows  {timings[method]:>8.2f} s  {len(df) / timings[method]:>12,.0f} rows/s")
+
+    print(f"COPY speedup: {timings['to_sql'] / timings['copy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
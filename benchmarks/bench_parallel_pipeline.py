@@ -0,0 +1,52 @@
+"""Wall-clock time of the per-table transform+load, sequential vs a process pool.
+
+Needs the docker-compose Postgres (see bench_loader.py).
+
+    python benchmarks/bench_parallel_pipeline.py --rows 200000 --workers 4
+"""
+import argparse
+import contextlib
+import io
+import logging
+import tempfile
+import time
+
+import yaml
+
+from common import SCHEMA_PATH, db_config, write_table_csv
+from parallel_runner import run_tables_in_parallel
+
+
+def timed_run(folder: str, workers: int) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, errors = run_tables_in_parallel(SCHEMA_PATH, folder, db_config(), workers)
+    if errors:
+        raise RuntimeError(errors)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(SCHEMA_PATH, "r") as f:
+        tables = list(yaml.safe_load(f))
+
+    with tempfile.TemporaryDirectory() as folder:
+        for table in tables:
+            write_table_csv(table, args.rows, folder)
+
+        sequential = timed_run(folder, 1)
+        parallel = timed_run(folder, args.workers)
+
+    print(f"{len(tables)} tables x {args.rows:,} rows")
+    print(f"sequential: {sequential:.2f} s")
+    print(f"{args.workers} workers: {parallel:.2f} s  (speedup {sequential / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""CSV vs Parquet for the raw inputs: file size, read time and full transform time, plus the
+processed-table cache (second run of the same file reads the cached result instead).
+
+    python benchmarks/bench_parquet.py --rows 200000 --tables film customer
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from common import SCHEMA_PATH, write_table_csv
+from csv_processor import CSVProcessor
+
+
+def timed(fn):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--tables", nargs="+", default=["film", "customer", "category"])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    processor = CSVProcessor(SCHEMA_PATH)
+
+    with tempfile.TemporaryDirectory() as folder:
+        cached = CSVProcessor(SCHEMA_PATH, cache_dir=os.path.join(folder, "cache"))
+        for table in args.tables:
+            csv_path = write_table_csv(table, args.rows, os.path.join(folder, "csv"))
+            parquet_path = os.path.join(folder, f"{table}.parquet")
+            #same raw text, stored columnar
+            pd.read_csv(csv_path, dtype=str).to_parquet(parquet_path, index=False)
+
+            _, csv_read = timed(lambda: pd.read_csv(csv_path, dtype=str))
+            _, parquet_read = timed(lambda: pd.read_parquet(parquet_path))
+            from_csv, csv_total = timed(lambda: processor.process_file(csv_path)[0])
+            from_parquet, parquet_total = timed(lambda: processor.process_file(parquet_path)[0])
+            pd.testing.assert_frame_equal(from_parquet.astype(object), from_csv.astype(object))
+
+            _, first = timed(lambda: cached.process_file(csv_path))
+            _, second = timed(lambda: cached.process_file(csv_path))
+
+            csv_mb = os.path.getsize(csv_path) / 1024 / 1024
+            parquet_mb = os.path.getsize(parquet_path) / 1024 / 1024
+            print(f"{table:<10} rows={args.rows:>9,}  size csv={csv_mb:>7.1f} MB parquet={parquet_mb:>7.1f} MB  "
+                  f"read csv={csv_read:.3f}s parquet={parquet_read:.3f}s  "
+                  f"process csv={csv_total:.3f}s parquet={parquet_total:.3f}s  "
+                  f"cache miss={first:.3f}s hit={second:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
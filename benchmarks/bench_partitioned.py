@@ -0,0 +1,86 @@
+"""Scaling of one big raw CSV over worker processes, split into byte-range partitions.
+
+Transform only by default: every partition is read and transformed by a worker, nothing is loaded.
+With --db the file also goes through run_tables_in_parallel into the docker-compose Postgres (table
+`film` is replaced), so each partition is COPY-loaded over its own connection.
+
+    python benchmarks/bench_partitioned.py --rows 10000000 --workers 1 2 4 8 --partition-mb 128
+
+The generated file is kept in --data-dir and reused by later runs with the same row count
+(10M film rows are about 1.5 GB).
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import SCHEMA_PATH, db_config, write_table_csv
+from csv_processor import CSVProcessor
+from parallel_runner import run_tables_in_parallel
+from partitioned import partition_ranges, transform_and_load_partition
+
+
+def transform_partitions(path: str, workers: int, partition_bytes: int) -> tuple[int, float]:
+    start = time.perf_counter()
+    header, ranges = partition_ranges(path, partition_bytes)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(transform_and_load_partition, SCHEMA_PATH, None, path, "film", header, first, last, part)
+            for part, (first, last) in enumerate(ranges)
+        ]
+        rows = sum(future.result()[1] for future in futures)
+    return rows, time.perf_counter() - start
+
+
+def load_partitioned(folder: str, workers: int, partition_bytes: int) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, errors = run_tables_in_parallel(SCHEMA_PATH, folder, db_config(), workers, partition_size=partition_bytes)
+    if errors:
+        raise RuntimeError(errors)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--partition-mb", type=int, default=64)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "etl_bench_partitioned"))
+    parser.add_argument("--db", action="store_true", help="also load into Postgres")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    folder = os.path.join(args.data_dir, f"rows{args.rows}")
+    path = os.path.join(folder, "film.csv")
+    if not os.path.exists(path):
+        print(f"Generating {args.rows:,} film rows...")
+        write_table_csv("film", args.rows, folder + ".tmp")
+        shutil.move(folder + ".tmp", folder)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    partition_bytes = args.partition_mb * 1024 * 1024
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = CSVProcessor(SCHEMA_PATH).process_file(path)
+    single = time.perf_counter() - start
+    print(f"film.csv {size_mb:,.0f} MB, {args.rows:,} rows, partitions of {args.partition_mb} MB")
+    print(f"single process_file:        {single:7.2f}s  {len(df) / single:>10,.0f} rows/s")
+    del df
+
+    for workers in args.workers:
+        rows, seconds = transform_partitions(path, workers, partition_bytes)
+        print(f"partitioned, {workers:>2} worker(s):  {seconds:7.2f}s  {rows / seconds:>10,.0f} rows/s  "
+              f"(x{single / seconds:.1f})")
+        if args.db:
+            seconds = load_partitioned(folder, workers, partition_bytes)
+            print(f"  + parallel COPY load:     {seconds:7.2f}s  {args.rows / seconds:>10,.0f} raw rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Peak RSS of whole-file processing vs chunked streaming, for growing input sizes.
+
+Each measurement runs in a fresh process so peaks don't leak between runs. The loader
+is replaced by a sink that drops chunks, so no database is needed.
+
+    python benchmarks/bench_streaming_memory.py --rows 100000 400000 1600000 --chunk-size 50000
+"""
+import argparse
+import contextlib
+import io
+import logging
+import multiprocessing
+import os
+import resource
+import tempfile
+
+from common import SCHEMA_PATH, write_table_csv
+
+
+def _peak_rss_mb() -> float:
+    #ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(folder: str, chunk_size: int | None, queue) -> None:
+    logging.disable(logging.WARNING)
+    from csv_processor import CSVProcessor
+
+    processor = CSVProcessor(SCHEMA_PATH)
+    baseline = _peak_rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if chunk_size:
+            rows = sum(len(chunk) for _, chunk in processor.stream_files(folder, chunk_size))
+        else:
+            results = processor.process_files(folder)
+            rows = sum(len(df) for _, df in results)
+    queue.put((rows, _peak_rss_mb() - baseline))
+
+
+def measure(folder: str, chunk_size: int | None) -> tuple[int, float]:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(folder, chunk_size, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000, 800_000])
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--table", default="customer")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as folder:
+            path = write_table_csv(args.table, rows, folder)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            _, full = measure(folder, None)
+            _, streamed = measure(folder, args.chunk_size)
+            print(f"{args.table:<10} rows={rows:>10,}  file={size_mb:>8.1f} MB  "
+                  f"whole-file peak={full:>8.1f} MB  streaming peak={streamed:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Load time and table size with DDL compiled from a DBML schema: keys and indexes deferred vs up front.
+
+"deferred" is the replace-mode load: an UNLOGGED table without constraints, COPY-loaded chunk by
+chunk, then NOT NULL, primary key and indexes built in one pass and SET LOGGED. "up front" creates the
+same DDL logged and constrained first (append mode), so every chunk maintains the indexes as it goes.
+"header types" is the old DDL from the `name:Type` headers alone.
+
+Needs the docker-compose Postgres (see bench_loader.py).
+
+    python benchmarks/bench_table_ddl.py --rows 500000 --chunks 10
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from common import SCHEMA_PATH, db_session, table_columns, write_table_csv
+from csv_processor import CSVProcessor
+from parse_dbml_schema import parse_dbml_indexes, parse_dbml_schema
+from postgresLoader import PostgresLoader
+
+DBML_TYPES = {
+    "Integer": "int4", "Float": "numeric(12,3)", "Boolean": "bool", "Date": "date",
+    "Timestamp": "timestamp", "Timestamptz": "timestamptz", "String": "text",
+}
+
+
+def write_dbml(table: str, target: str, path: str):
+    """DBML of the table as table_format.yml types it: the first *_id column is the key, the others indexed."""
+    columns = table_columns(table)
+    key = next((col for col in columns if col.endswith("_id")), None)
+    lines = [f'Table "{target}" {{']
+    for col, rules in columns.items():
+        flags = ["pk"] if col == key else (["not null"] if rules.get("required") else [])
+        lines.append(f'  "{col}" {DBML_TYPES.get(rules.get("type"), "text")}' + (f" [{', '.join(flags)}]" if flags else ""))
+    indexes = [col for col in columns if col.endswith("_id") and col != key]
+    if indexes:
+        lines.append("  Indexes {")
+        lines += [f"    {col}" for col in indexes]
+        lines.append("  }")
+    lines.append("}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def timed_load(loader: PostgresLoader, chunks: list, target: str) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_stream((target, chunk.copy()) for chunk in chunks)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--table", default="film")
+    parser.add_argument("--chunks", type=int, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    target = f"bench_{args.table}_ddl"
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_table_csv(args.table, args.rows, folder)
+        schema = os.path.join(folder, "schema.dbml")
+        write_dbml(args.table, target, schema)
+        dbml = {"dbml_tables": parse_dbml_schema(schema), "dbml_indexes": parse_dbml_indexes(schema)}
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = [chunk for chunk, _ in CSVProcessor(SCHEMA_PATH).iter_file_chunks(path, -(-args.rows // args.chunks))]
+
+    session = db_session()
+    runs = {
+        "header types": PostgresLoader(session),
+        "up front": PostgresLoader(session, load_modes={target: "append"}, **dbml),
+        "deferred": PostgresLoader(session, **dbml),
+    }
+    print(f"{args.table}: {args.rows:,} rows in {len(chunks)} chunks")
+    for name, loader in runs.items():
+        with session.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {target}"))
+        seconds = timed_load(loader, chunks, target)
+        with session.begin() as conn:
+            count = conn.execute(text(f"SELECT count(*) FROM {target}")).scalar()
+            size = conn.execute(text(f"SELECT pg_total_relation_size('{target}')")).scalar() / 1024 / 1024
+            persistence = conn.execute(text(f"SELECT relpersistence FROM pg_class WHERE relname = '{target}'")).scalar()
+        assert count == args.rows, f"{name} loaded {count} rows, expected {args.rows}"
+        print(f"{name:<13} {seconds:>7.2f} s  {args.rows / seconds:>10,.0f} rows/s  {size:>7.1f} MB with indexes"
+              f"  ({'logged' if persistence == 'p' else 'unlogged'})")
+    with session.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {target}"))
+    session.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Throughput of DBMLValidator's chunked column checks vs the former csv.DictReader row loop.
+
+Generates temp_*.csv exports (with a share of invalid values) and a matching DBML schema,
+checks both implementations flag the same rows, then times them and the process-pool mode.
+
+    python benchmarks/bench_validator.py --rows 500000 --files 4 --workers 4
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import tempfile
+import time
+
+import common  # noqa: F401  (puts src/ on sys.path)
+from parse_dbml_schema import DBMLValidator
+
+DBML = '''Table "bench_{n}" {{
+  "id" int4 [pk, not null]
+  "code" bpchar(3) [not null]
+  "price" numeric(5,2)
+  "active" bool
+  "created" date [not null]
+  "updated" timestamptz [not null]
+  "note" text
+}}
+'''
+
+
+def write_export(path: str, rows: int, seed: int):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "code", "price", "active", "created", "updated", "note"])
+        for i in range(rows):
+            row = [str(i), rng.choice(["ABC", "XY", "Q"]), f"{rng.uniform(0, 999):.2f}", rng.choice(["t", "f"]),
+                   "2022-02-15", "2022-02-15 09:46:27+00", rng.choice(["", "some note"])]
+            if rng.random() < 0.01:
+                col = rng.randrange(6)
+                row[col] = {0: "x1", 1: "ABCD", 2: "1,5", 3: "maybe", 4: "2022/02/15", 5: ""}[col]
+            writer.writerow(row)
+
+
+def reference_invalid_rows(validator: DBMLValidator, csv_path: str, table_name: str) -> list:
+    """The row-by-row loop DBMLValidator used before, kept here as the baseline."""
+    invalid = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            row_errors = []
+            for col_name, col_schema in validator.tables[table_name].items():
+                is_valid, err_msg = validator._validate_value(row.get(col_name, "").strip(), col_schema)
+                if not is_valid:
+                    row_errors.append(f"{col_name}: {err_msg}")
+            if row_errors:
+                row["error"] = "; ".join(row_errors)
+                invalid.append(row)
+    return invalid
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        output = os.path.join(folder, "output")
+        invalid = os.path.join(folder, "invalid")
+        os.makedirs(output)
+        schema = os.path.join(folder, "schema.dbml")
+        with open(schema, "w") as f:
+            f.write("\n".join(DBML.format(n=n) for n in range(args.files)))
+        for n in range(args.files):
+            write_export(os.path.join(output, f"temp_bench_{n}.csv"), args.rows, seed=n)
+
+        validator = DBMLValidator(output, schema, invalid)
+        total = args.rows * args.files
+
+        start = time.perf_counter()
+        expected = {n: reference_invalid_rows(validator, os.path.join(output, f"temp_bench_{n}.csv"), f"bench_{n}")
+                    for n in range(args.files)}
+        row_loop = time.perf_counter() - start
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            validator.validate_all_csv(workers=1)
+            chunked = time.perf_counter() - start
+
+            for n in range(args.files):
+                with open(os.path.join(invalid, f"temp_bench_{n}.csv"), newline="", encoding="utf-8") as f:
+                    assert list(csv.DictReader(f)) == expected[n], f"invalid rows differ for bench_{n}"
+
+            start = time.perf_counter()
+            validator.validate_all_csv(workers=args.workers)
+            parallel = time.perf_counter() - start
+
+    print(f"{args.files} files x {args.rows:,} rows")
+    print(f"row loop:            {total / row_loop:>12,.0f} rows/s")
+    print(f"chunked columns:     {total / chunked:>12,.0f} rows/s  ({row_loop / chunked:.1f}x)")
+    print(f"{args.workers} worker processes: {total / parallel:>12,.0f} rows/s  ({row_loop / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Compare CSVProcessor's per-value `.apply` path with the vectorized column path.
+
+    python benchmarks/bench_vectorized_transform.py --rows 200000 --tables film customer category
+"""
+import argparse
+import contextlib
+import io
+import logging
+import tempfile
+import time
+
+import pandas as pd
+
+from common import SCHEMA_PATH, write_table_csv
+from csv_processor import CSVProcessor
+
+
+def run(processor: CSVProcessor, path: str) -> tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    #process_file prints every step, keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, _ = processor.process_file(path)
+    return df, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--tables", nargs="+", default=["film", "customer", "category"])
+    args = parser.parse_args()
+    #both paths log the same cast failures, only the timings matter here
+    logging.disable(logging.WARNING)
+
+    row_path = CSVProcessor(SCHEMA_PATH, vectorized=False)
+    vector_path = CSVProcessor(SCHEMA_PATH, vectorized=True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        for table in args.tables:
+            path = write_table_csv(table, args.rows, folder)
+            expected, row_time = run(row_path, path)
+            result, vector_time = run(vector_path, path)
+            pd.testing.assert_frame_equal(result.astype(object), expected.astype(object))
+
+            print(f"{table:<10} rows={len(expected):>9,}  "
+                  f"apply={len(expected) / row_time:>12,.0f} rows/s  "
+                  f"vectorized={len(expected) / vector_time:>12,.0f} rows/s  "
+                  f"speedup={row_time / vector_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
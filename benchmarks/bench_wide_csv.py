@@ -0,0 +1,65 @@
+"""Transform time of raw CSVs padded with columns the schema does not configure, per CSV engine.
+
+Only the configured columns are parsed, so the time should stay flat as the file gets wider.
+"all columns" is the read of every column the processor did before, for reference.
+
+    python benchmarks/bench_wide_csv.py --rows 200000 --extra 0 20 80
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+from common import SCHEMA_PATH, WORDS, write_table_csv
+from csv_processor import CSVProcessor
+
+
+def widen(path: str, extra: int, seed: int = 42) -> str:
+    """Copy of the CSV with `extra` unconfigured text columns appended."""
+    df = pd.read_csv(path, dtype=str)
+    rng = random.Random(seed)
+    pool = [" ".join(rng.choice(WORDS) for _ in range(3)) for _ in range(1_000)]
+    for i in range(extra):
+        df[f"vendor_{i}"] = [pool[rng.randrange(len(pool))] for _ in range(len(df))]
+    wide_path = os.path.join(os.path.dirname(path), f"wide{extra}", os.path.basename(path))
+    os.makedirs(os.path.dirname(wide_path), exist_ok=True)
+    df.to_csv(wide_path, index=False)
+    return wide_path
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--table", default="film")
+    parser.add_argument("--extra", type=int, nargs="+", default=[0, 20, 80])
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    processors = {engine: CSVProcessor(SCHEMA_PATH, csv_engine=engine) for engine in ("c", "auto")}
+    with tempfile.TemporaryDirectory() as folder:
+        path = write_table_csv(args.table, args.rows, folder)
+        for extra in args.extra:
+            wide_path = widen(path, extra)
+            size = os.path.getsize(wide_path) / 1024 / 1024
+            all_columns = timed(lambda: pd.read_csv(wide_path, dtype=str))
+            times = {engine: timed(lambda p=p: p.process_file(wide_path)) for engine, p in processors.items()}
+            print(f"+{extra:<3} columns  {size:>7.1f} MB  read all columns={all_columns:.3f}s  "
+                  + "  ".join(f"process {engine}={seconds:.3f}s ({args.rows / seconds:,.0f} rows/s)"
+                              for engine, seconds in times.items()))
+
+
+if __name__ == "__main__":
+    main()
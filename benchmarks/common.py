@@ -0,0 +1,110 @@
+import csv
+import os
+import random
+import sys
+
+import yaml
+from dotenv import load_dotenv
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+SCHEMA_PATH = os.path.join(CONFIG_DIR, "table_format.yml")
+
+#benchmarks import the pipeline modules the same way main.py does, from inside src/
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def _value(col: str, col_type: str, rng: random.Random, row: int) -> str:
+    if col_type == "Integer":
+        return str(row + 1) if col.endswith("_id") else str(rng.randint(0, 5000))
+    if col_type == "Float":
+        return f"{rng.uniform(0, 100):.3f}"
+    if col_type == "Boolean":
+        return rng.choice(["t", "f", "true", "false"])
+    if col_type == "Date":
+        return f"20{rng.randint(0, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if col_type in ("Timestamp", "Timestamptz"):
+        #Timestamp columns come from timestamptz exports with milliseconds, like film.last_update
+        millis = f".{rng.randint(0, 999):03d}" if col_type == "Timestamp" else ""
+        return (f"20{rng.randint(0, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}{millis}+00")
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+#values no caster accepts, per type
+DIRTY_VALUES = {
+    "Integer": ["12x", "n/a", "1.2.3", "--"],
+    "Float": ["1,5.3", "abc", "12..5", "NaN?"],
+    "Boolean": ["maybe", "2", "yess", "?"],
+    "Date": ["2021-13-45", "31/12/2021", "yesterday", "2021-02"],
+    "Timestamp": ["2021-02-30 25:61:00", "noon", "2021-01-01T", "12:00:00"],
+    "Timestamptz": ["2021-02-30 25:61:00+00", "tomorrow", "2021-01-01 00:00", "00:00:00+00"],
+}
+
+
+def _mixed_format(value: str, col_type: str, rng: random.Random) -> str:
+    """Rewrite a clean date value in one of the other formats the casters accept."""
+    if col_type in ("Date", "Timestamp") and rng.random() < 0.5:
+        return value.replace("-", "/")
+    if col_type == "Timestamptz":
+        return rng.choice([value, value[:-3], value[:-3] + f".{rng.randint(0, 999_999):06d}+00"])
+    return value
+
+
+def table_columns(table: str) -> dict:
+    """Column rules of `table` in table_format.yml, without table-level keys like load_mode."""
+    with open(SCHEMA_PATH, "r") as f:
+        schema = yaml.safe_load(f)
+    return {col: rules for col, rules in schema[table].items() if isinstance(rules, dict)}
+
+
+def write_table_csv(table: str, rows: int, folder: str, seed: int = 42,
+                    nulls: float = 0.0, dirty: float = 0.0, mixed_dates: bool = False) -> str:
+    """
+    Write `rows` random rows for `table` as defined in table_format.yml, return the file path.
+    `nulls` and `dirty` are the share of empty and uncastable values, `mixed_dates` spreads date
+    values over every format the casters accept. With the defaults the output is unchanged.
+    """
+    columns = table_columns(table)
+    rng = random.Random(seed)
+
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{table}.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        for row in range(rows):
+            values = []
+            for col, rules in columns.items():
+                value = _value(col, rules["type"], rng, row)
+                if nulls and rng.random() < nulls:
+                    value = ""
+                elif dirty and rng.random() < dirty and rules["type"] in DIRTY_VALUES:
+                    value = rng.choice(DIRTY_VALUES[rules["type"]])
+                elif mixed_dates:
+                    value = _mixed_format(value, rules["type"], rng)
+                values.append(value)
+            writer.writerow(values)
+    return path
+
+
+def db_config() -> dict:
+    """Connection settings of the docker-compose database, read from .env like main.py does."""
+    return {
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT'),
+        'database': os.getenv('DB_NAME')
+    }
+
+
+def db_session():
+    """DatabaseSession on the docker-compose database, like the one main.py opens for a run."""
+    from db_session import DatabaseSession
+    return DatabaseSession(**db_config())
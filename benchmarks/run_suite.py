@@ -0,0 +1,221 @@
+"""End-to-end benchmark of the pipeline stages on a synthetic dataset, with regression checks.
+
+Generates a raw CSV for every table of config/table_format.yml (with nulls, uncastable values and
+mixed date formats), then runs CSVProcessor + PostgresLoader, PostgresCsvExporter and DBMLValidator
+against the docker-compose Postgres. Every stage is recorded by RunMetrics; the report (throughput,
+CPU time and memory per stage and table) is written to benchmarks/results/ and compared with a
+baseline report when one is given.
+
+    docker compose up -d
+    python benchmarks/run_suite.py --rows 1000000 --save-baseline
+    python benchmarks/run_suite.py --rows 1000000 --baseline benchmarks/results/baseline.json
+
+--no-db only runs the generation and the transforms. Generated files are kept in --data-dir and
+reused by later runs with the same settings.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import yaml
+from sqlalchemy import text
+
+from common import SCHEMA_PATH, db_session, table_columns, write_table_csv
+import metrics
+from csv_processor import CSVProcessor
+from parse_dbml_schema import DBMLValidator
+from postgresCsvExporter import PostgresCsvExporter
+from postgresLoader import PostgresLoader
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+#DBML types of the exported columns, as PostgresLoader creates them
+DBML_TYPES = {
+    "Integer": "int4",
+    "Float": "float8",
+    "String": "text",
+    "Boolean": "text",
+    "Date": "date",
+    "Timestamp": "timestamptz",
+    "Timestamptz": "timestamptz",
+}
+#a stage slower than its baseline by more than this share is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def bench_table(table: str) -> str:
+    return f"bench_{table}"
+
+
+def write_dbml(tables: list, path: str):
+    """DBML schema of the bench tables, built from table_format.yml."""
+    with open(path, "w") as f:
+        for table in tables:
+            f.write(f'Table "{bench_table(table)}" {{\n')
+            for col, rules in table_columns(table).items():
+                constraint = " [not null]" if rules.get("required") else ""
+                f.write(f'  "{col}" {DBML_TYPES.get(rules["type"], "text")}{constraint}\n')
+            f.write("}\n")
+
+
+def generate(tables: list, args) -> str:
+    settings = f"rows{args.rows}-nulls{args.nulls}-dirty{args.dirty}-mixed{int(args.mixed_dates)}-seed{args.seed}"
+    folder = os.path.join(args.data_dir, settings)
+    for table in tables:
+        if os.path.exists(os.path.join(folder, f"{table}.csv")):
+            continue
+        with metrics.stage("generate", table) as record:
+            path = write_table_csv(table, args.rows, folder, args.seed,
+                                   nulls=args.nulls, dirty=args.dirty, mixed_dates=args.mixed_dates)
+            record["rows_out"], record["bytes"] = args.rows, os.path.getsize(path)
+    return folder
+
+
+def transform_and_load(processor: CSVProcessor, folder: str, args, errors: dict):
+    loader = None if args.no_db else PostgresLoader(db_session())
+    created = set()
+    for table_name, chunk in processor.stream_files(folder, args.chunk_size):
+        if loader is None or table_name in errors:
+            continue
+        target = bench_table(table_name)
+        try:
+            if target in created:
+                loader.append_dataframe(chunk, target)
+            else:
+                loader.load_dataframe(chunk, target, finish=False)
+                created.add(target)
+        except Exception as e:
+            #one bad table must not hide the timings of the others
+            errors[table_name] = f"load: {type(e).__name__}: {str(e).splitlines()[0]}"
+            created.discard(target)
+    for target in sorted(created):
+        loader.finish_table(target)
+    return sorted(created)
+
+
+def export_and_validate(loaded: list, folder: str, tables: list, args):
+    output_dir = os.path.join(folder, "output")
+    invalid_dir = os.path.join(folder, "invalid")
+    schema = os.path.join(folder, "schema.dbml")
+    write_dbml(tables, schema)
+
+    exporter = PostgresCsvExporter(db_session())
+    try:
+        if args.export_workers > 1:
+            exporter.export_tables_concurrently(loaded, output_dir, args.export_workers)
+        else:
+            exporter.export_tables_to_csv(loaded, output_dir)
+    finally:
+        exporter.close()
+    DBMLValidator(output_dir, schema, invalid_dir).validate_all_csv(args.validate_workers)
+
+
+def drop_tables(loaded: list):
+    loader = PostgresLoader(db_session())
+    with loader.session.begin() as conn:
+        for table in loaded:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def throughput(report: dict) -> dict:
+    """{(stage, table): rows/s} of the top-level stages of a report."""
+    rates = {}
+    for stats in report["stages"]:
+        if stats["detail"] is None and stats.get("rows_out") and stats.get("wall_s"):
+            rates[(stats["stage"], stats["table"])] = stats["rows_out"] / stats["wall_s"]
+    return rates
+
+
+def compare(report: dict, baseline: dict) -> list:
+    """Print throughput against the baseline, return the stages that regressed."""
+    current, before = throughput(report), throughput(baseline)
+    if baseline.get("rows") != report.get("rows"):
+        print(f"⚠️ Baseline ran {baseline.get('rows'):,} rows per table, this run {report.get('rows'):,}")
+    regressions = []
+    for key in sorted(current.keys() & before.keys(), key=lambda k: (k[0], k[1] or "")):
+        change = current[key] / before[key] - 1
+        flag = ""
+        if change < -REGRESSION_THRESHOLD:
+            flag = "  ❌ regression"
+            regressions.append({"stage": key[0], "table": key[1], "change": change})
+        print(f"{key[0]:<10} {key[1] or '':<12} {before[key]:>12,.0f} -> {current[key]:>12,.0f} rows/s "
+              f"({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per table, 10k to 10M")
+    parser.add_argument("--tables", nargs="+", help="tables of table_format.yml, all by default")
+    parser.add_argument("--nulls", type=float, default=0.05)
+    parser.add_argument("--dirty", type=float, default=0.01)
+    parser.add_argument("--no-mixed-dates", dest="mixed_dates", action="store_false")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--export-workers", type=int, default=4)
+    parser.add_argument("--validate-workers", type=int, default=4)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "etl_bench"))
+    parser.add_argument("--no-db", action="store_true")
+    parser.add_argument("--baseline", help="report of an earlier run to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help=f"also write {RESULTS_DIR}/baseline.json")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with open(SCHEMA_PATH, "r") as f:
+        tables = args.tables or list(yaml.safe_load(f))
+
+    run = metrics.RunMetrics()
+    metrics.activate(run)
+    errors = {}
+    loaded = []
+    #the pipeline prints per table and per step, the suite prints the summary
+    with contextlib.redirect_stdout(io.StringIO()):
+        folder = generate(tables, args)
+        #the dirty values are set aside as a run with quarantine_dir would, instead of failing the load
+        processor = CSVProcessor(SCHEMA_PATH, quarantine_dir=os.path.join(folder, "quarantine"))
+        try:
+            loaded = transform_and_load(processor, folder, args, errors)
+            if loaded:
+                export_and_validate(loaded, folder, tables, args)
+        finally:
+            if loaded:
+                drop_tables(loaded)
+
+    run.summary()
+    for table, error in errors.items():
+        print(f"❌ {table}: {error}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, time.strftime("run-%Y%m%d-%H%M%S.json"))
+    report = run.report(path, rows=args.rows, tables=tables, nulls=args.nulls, dirty=args.dirty,
+                        mixed_dates=args.mixed_dates, chunk_size=args.chunk_size, database=not args.no_db,
+                        commit=git_commit(), python=platform.python_version(), errors=errors)
+    print(f"📊 Report written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f))
+        report["regressions"] = regressions
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(os.path.join(RESULTS_DIR, "baseline.json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
-from datetime import datetime, date, time
-from typing import Optional, Union
+from datetime import datetime, date, time, timezone
+from typing import Iterable, Optional, Union
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+#failed casts are logged per value at debug level only, CSVProcessor quarantines the rows and logs counts
+
+#formats tried in order; a caster given a FormatOrder tries the column's last match first instead
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S")
+TIMESTAMPTZ_FORMATS = (
+    "%Y-%m-%d %H:%M:%S.%f%z",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S",
+)
 
 class PostgresCaster:
 
@@ -19,7 +30,7 @@ class PostgresCaster:
                 return True
             elif val in ("n", "no", "f", "false", "off", "0"):
                 return False
-        logger.warning(f"Could not cast value to boolean: {value}")
+        logger.debug(f"Could not cast value to boolean: {value}")
         return value
 
     @staticmethod
@@ -31,7 +42,7 @@ class PostgresCaster:
         try:
             return int(value)
         except (ValueError, TypeError):
-            logger.warning(f"Could not cast value to integer: {value}")
+            logger.debug(f"Could not cast value to integer: {value}")
             return value
 
     @staticmethod
@@ -43,64 +54,65 @@ class PostgresCaster:
         try:
             return float(value)
         except (ValueError, TypeError):
-            logger.warning(f"Could not cast value to float: {value}")
+            logger.debug(f"Could not cast value to float: {value}")
             return value
 
     @staticmethod
-    def to_date(value: Optional[Union[str, date]]) -> Union[date, str, None]:
+    def to_date(value: Optional[Union[str, date]], formats: Iterable[str] = DATE_FORMATS) -> Union[date, str, None]:
         if value is None:
             return None
         if isinstance(value, date) and not isinstance(value, datetime):
             return value
         if isinstance(value, str):
-            for fmt in ("%Y-%m-%d", "%Y/%m/%d"):
+            for fmt in formats:
                 try:
-                    return datetime.strptime(value, fmt).date()
+                    parsed = datetime.strptime(value, fmt).date()
                 except ValueError:
                     continue
-        logger.warning(f"Could not cast value to date: {value}")
+                _record(formats, fmt)
+                return parsed
+        logger.debug(f"Could not cast value to date: {value}")
         return value
 
     @staticmethod
-    def to_timestamp(value: Optional[Union[str, datetime]]) -> Union[datetime, str, None]:
+    def to_timestamp(value: Optional[Union[str, datetime]],
+                     formats: Iterable[str] = TIMESTAMP_FORMATS) -> Union[datetime, str, None]:
         if value is None:
             return None
         if isinstance(value, datetime):
             return value
         if isinstance(value, str):
-            for fmt in ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M:%S"):
+            for fmt in formats:
                 try:
-                    return datetime.strptime(value, fmt)
+                    parsed = datetime.strptime(value, fmt)
                 except ValueError:
                     continue
-        logger.warning(f"Could not cast value to timestamp: {value}")
+                _record(formats, fmt)
+                return parsed
+        logger.debug(f"Could not cast value to timestamp: {value}")
         return value
     
     @staticmethod
-    def to_timestamptz(value: Optional[Union[str, datetime]]) -> Union[datetime, str, None]:
+    def to_timestamptz(value: Optional[Union[str, datetime]],
+                       formats: Iterable[str] = TIMESTAMPTZ_FORMATS) -> Union[datetime, str, None]:
         if value is None:
             return None
         if isinstance(value, datetime):
             if value.tzinfo is None:
-                return value.replace(tzinfo=pytz.UTC)
+                return value.replace(tzinfo=timezone.utc)
             return value
         if isinstance(value, str):
-            formats = (
-                "%Y-%m-%d %H:%M:%S.%f%z",
-                "%Y-%m-%d %H:%M:%S%z", 
-                "%Y-%m-%d %H:%M:%S.%f",
-                "%Y-%m-%d %H:%M:%S",   
-            )
             value = value.replace('+00', '+0000') 
             for fmt in formats:
                 try:
                     dt = datetime.strptime(value, fmt)
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=pytz.UTC)
-                    return dt
                 except ValueError:
                     continue
-        logger.warning(f"Could not cast value to timestamptz: {value}")
+                _record(formats, fmt)
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                return dt
+        logger.debug(f"Could not cast value to timestamptz: {value}")
         return value
     @staticmethod
     def to_string(value):
@@ -113,3 +125,10 @@ class PostgresCaster:
         except Exception as e:
             logging.warning(f"Could not cast value to string: {value} ({e})")
             return value
+
+
+def _record(formats, fmt):
+    #plain tuples have nothing to remember
+    record = getattr(formats, "record", None)
+    if record is not None:
+        record(fmt)
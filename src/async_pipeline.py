@@ -0,0 +1,189 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlScriptExecutor import written_tables
+
+
+def _file_chunks(processor, file_path, chunk_size):
+    """(chunk, table_name) pairs of one raw file, the whole file as one chunk without a chunk size."""
+    if chunk_size:
+        yield from processor.iter_file_chunks(file_path, chunk_size)
+    else:
+        yield processor.process_file(file_path)
+
+
+class AsyncPipeline:
+    """
+    Transform, load, map.sql and export as overlapping stages instead of one after the other.
+
+    Every raw file is transformed chunk by chunk on a transform thread and handed to its load task
+    through a bounded queue: while table A is COPY-loaded, table B is already being transformed, and a
+    slow load holds back its transform instead of letting chunks pile up in memory. map.sql runs once
+    every load has finished; a table it does not write is exported as soon as its own load is done,
+    the others right after the script.
+
+    The stages are psycopg2/pandas calls run on thread pools from one event loop: COPY and query
+    round trips release the GIL, so loads and exports overlap with the CPU-bound transforms.
+    """
+
+    def __init__(self, processor, loader, run_sql, export_table, chunk_size=None, queue_size=4,
+                 transform_workers=2, load_workers=4, export_workers=4):
+        self.processor = processor
+        self.loader = loader
+        #run_sql() runs map.sql, export_table(table) writes one table; both are blocking calls
+        self.run_sql = run_sql
+        self.export_table = export_table
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.pools = {
+            "transform": ThreadPoolExecutor(transform_workers, thread_name_prefix="transform"),
+            "load": ThreadPoolExecutor(load_workers, thread_name_prefix="load"),
+            "export": ThreadPoolExecutor(export_workers, thread_name_prefix="export"),
+        }
+        self.errors = {}
+
+    async def _in(self, pool, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pools[pool], fn, *args)
+
+    async def _transform(self, file_path, queue):
+        chunks = _file_chunks(self.processor, file_path, self.chunk_size)
+        cancelled = False
+        try:
+            while True:
+                item = await self._in("transform", next, chunks, None)
+                if item is None:
+                    break
+                #waits while the load side is `queue_size` chunks behind
+                await queue.put(item)
+        except asyncio.CancelledError:
+            #the load side failed, nobody is waiting for the end marker
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                await queue.put(None)
+
+    async def _load(self, queue, created, locks):
+        rows = 0
+        while (item := await queue.get()) is not None:
+            chunk, table_name = item
+            #parts of one table load in order: the first chunk creates the table, the rest append
+            async with locks.setdefault(table_name, asyncio.Lock()):
+                if table_name in created:
+                    await self._in("load", self.loader.append_dataframe, chunk, table_name)
+                else:
+                    #keys and indexes wait until every file of the table is in, see _finish
+                    await self._in("load", partial(self.loader.load_dataframe, finish=False), chunk, table_name)
+                    created.add(table_name)
+            rows += len(chunk)
+        return rows
+
+    async def _transform_and_load(self, file_path, table_name, loaded, created, locks):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        start = time.perf_counter()
+        transform = asyncio.create_task(self._transform(file_path, queue))
+        try:
+            rows = await self._load(queue, created, locks)
+            await transform
+            print(f"✅ Loaded '{table_name}' ({rows:,} rows) in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            transform.cancel()
+            self.errors[table_name] = f"{os.path.basename(file_path)}: {type(e).__name__}: {e}"
+            print(f"❌ Failed to load '{file_path}': {e}")
+        finally:
+            #a table is ready once every file feeding it is done
+            remaining, event = loaded[table_name]
+            loaded[table_name] = (remaining - 1, event)
+            if remaining == 1:
+                await self._finish(table_name)
+                event.set()
+
+    async def _finish(self, table_name):
+        if table_name in self.errors:
+            return
+        try:
+            await self._in("load", self.loader.finish_table, table_name)
+        except Exception as e:
+            self.errors[table_name] = f"{type(e).__name__}: {e}"
+            print(f"❌ Failed to build the keys and indexes of '{table_name}': {e}")
+
+    async def _export(self, table, ready):
+        await ready.wait()
+        if table in self.errors:
+            return
+        try:
+            await self._in("export", self.export_table, table)
+        except Exception as e:
+            self.errors[table] = f"{type(e).__name__}: {e}"
+            print(f"❌ Failed to export table '{table}': {e}")
+
+    async def _run_sql(self, loads, sql_done):
+        try:
+            await asyncio.gather(*loads)
+            if self.errors:
+                #map.sql over a partly loaded database would publish inconsistent tables
+                print("⏭️ Skipping map.sql and the exports that depend on it, some tables failed to load")
+                for table in sql_done:
+                    self.errors.setdefault(table, "not run: map.sql was skipped")
+                return
+            await self._in("load", self.run_sql)
+        except Exception as e:
+            self.errors["map.sql"] = f"{type(e).__name__}: {e}"
+            for table in sql_done:
+                self.errors.setdefault(table, "not run: map.sql failed")
+            print(f"❌ map.sql failed: {e}")
+        finally:
+            for event in sql_done.values():
+                event.set()
+
+    async def run(self, raw_files, to_export, sql_script):
+        """Run every stage; returns {table or "map.sql": error} for what failed."""
+        start = time.perf_counter()
+        file_tables = {path: self.processor._table_plan(path).table_name for path in raw_files}
+        #table -> (files still loading, set once they are all done)
+        loaded = {}
+        for table in file_tables.values():
+            remaining, event = loaded.get(table, (0, asyncio.Event()))
+            loaded[table] = (remaining + 1, event)
+        writes = written_tables(sql_script)
+        sql_done = {table: asyncio.Event() for table in to_export if table in writes}
+        created, locks = set(), {}
+
+        loads = [
+            asyncio.create_task(self._transform_and_load(path, table, loaded, created, locks))
+            for path, table in file_tables.items()
+        ]
+        sql = asyncio.create_task(self._run_sql(loads, sql_done))
+
+        exports = []
+        for table in to_export:
+            if table in sql_done:
+                ready = sql_done[table]
+            elif table in loaded:
+                ready = loaded[table][1]
+            else:
+                #neither loaded in this run nor written by map.sql: it can go out right away
+                ready = asyncio.Event()
+                ready.set()
+            exports.append(asyncio.create_task(self._export(table, ready)))
+
+        try:
+            await asyncio.gather(sql, *exports)
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown(wait=True)
+        print(f"⏱️ Pipeline finished in {time.perf_counter() - start:.2f}s")
+        return self.errors
+
+
+def run_async_pipeline(processor, loader, run_sql, export_table, raw_data_dir, to_export, sql_script_path,
+                       tables=None, **options):
+    """Blocking entry point: build the pipeline and run it on a fresh event loop."""
+    raw_files = [os.path.join(raw_data_dir, f) for f in processor.list_raw_files(raw_data_dir, tables)]
+    with open(sql_script_path, 'r') as f:
+        sql_script = f.read()
+    pipeline = AsyncPipeline(processor, loader, run_sql, export_table, **options)
+    return asyncio.run(pipeline.run(raw_files, [t.strip() for t in to_export if t.strip()], sql_script))
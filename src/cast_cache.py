@@ -0,0 +1,113 @@
+import logging
+import threading
+from functools import lru_cache, wraps
+from typing import Callable, Iterable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+#distinct values remembered per column by the scalar casters
+DEFAULT_MEMO_SIZE = 65_536
+#casting the uniques only pays off when values repeat, above this ratio the column is cast as is
+DISTINCT_RATIO = 0.5
+
+
+class FormatOrder:
+    """
+    The date formats of one column, most recently successful first.
+    Casters iterate it instead of their fixed tuple and call `record` with the format that matched,
+    so a column written in the second format stops paying for a failed first attempt on every value.
+
+    The column path infers the column's format once from a sample (`infer`), unless the format is
+    pinned with `format:` in table_format.yml. Values no format can parse are quarantined by CSVProcessor.
+    One instance is shared by the threads transforming the parts of a table, updates hold a lock and
+    iteration walks a snapshot.
+    """
+
+    def __init__(self, formats: Iterable[str], pinned: bool = False):
+        self.formats = list(formats)
+        self.pinned = pinned
+        self.inferred = None
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(tuple(self.formats))
+
+    def record(self, fmt: str):
+        with self._lock:
+            self._move_first(fmt)
+
+    def _move_first(self, fmt: str):
+        if self.formats[0] != fmt:
+            self.formats.remove(fmt)
+            self.formats.insert(0, fmt)
+
+    def infer(self, matches: Callable[[str], int]):
+        """Keep the format matching the most sampled values, `matches(fmt)` counts them. Runs once."""
+        with self._lock:
+            #a second thread waits for the first inference instead of sampling again
+            if self.pinned or self.inferred is not None:
+                return self.inferred
+            counts = {fmt: matches(fmt) for fmt in self.formats}
+            #ties keep the current order
+            best = max(self.formats, key=counts.get)
+            if counts[best]:
+                self.inferred = best
+                self._move_first(best)
+            return self.inferred
+
+    def flush(self, column: str):
+        """Report the inferred format once, so it can be pinned."""
+        with self._lock:
+            if self.inferred is None or self._reported:
+                return
+            self._reported = True
+        logger.info(f"Inferred format '{self.inferred}' for {column}, "
+                    f"pin it with `format: \"{self.inferred}\"` in table_format.yml")
+
+    def __repr__(self):
+        return f"FormatOrder({self.formats})"
+
+
+def memoized(cast: Callable, maxsize: int = DEFAULT_MEMO_SIZE) -> Callable:
+    """Wrap a scalar caster in a bounded LRU: each distinct value is cast (and logged) once."""
+    #typed: 1, 1.0 and True must not share a cache entry
+    cached = lru_cache(maxsize=maxsize, typed=True)(cast)
+
+    @wraps(cast)
+    def cast_value(value):
+        try:
+            hash(value)
+        except TypeError:
+            return cast(value)
+        return cached(value)
+
+    cast_value.cache_info = cached.cache_info
+    cast_value.cache_clear = cached.cache_clear
+    return cast_value
+
+
+def cast_distinct(cast: Callable[[pd.Series], pd.Series], ratio: float = DISTINCT_RATIO):
+    """
+    Wrap a column caster so it only sees the distinct values of the column, then map the results back.
+    Low-cardinality columns (timestamps repeated over thousands of rows, flags, ids) are cast in a
+    fraction of the time; columns that are mostly unique are passed through unchanged.
+    """
+
+    @wraps(cast)
+    def cast_column(series: pd.Series) -> pd.Series:
+        if len(series) < 2:
+            return cast(series)
+        #NaN is kept as a value of its own so the caster still decides what a null becomes
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        if len(uniques) > len(series) * ratio:
+            return cast(series)
+        casted = cast(pd.Series(uniques, name=series.name))
+        out = casted.take(codes)
+        out.index = series.index
+        return out
+
+    return cast_column
@@ -0,0 +1,177 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # parquet support is optional, CSV keeps working without pyarrow
+    pa = None
+    pacsv = None
+    pq = None
+
+from manifest import RunManifest
+
+#postgres type oids -> arrow types for parquet exports, anything else is written as text
+PG_OID_TO_ARROW = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1700: "float64",   #numeric, parquet readers get doubles rather than python Decimals
+    25: "string",
+    1042: "string",
+    1043: "string",
+    1082: "date32",
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+
+
+def require_pyarrow():
+    if pq is None:
+        raise ImportError("Parquet support needs pyarrow: pip install pyarrow")
+
+
+def _arrow_type(oid):
+    name = PG_OID_TO_ARROW.get(oid, "string")
+    if name == "timestamp":
+        return pa.timestamp("us")
+    if name == "timestamptz":
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, name)()
+
+
+#strings read as NULL, the defaults of pandas.read_csv
+CSV_NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def read_csv_strings(source, columns):
+    """
+    `columns` of a CSV file (path, arrow stream or file object) as strings with pyarrow's multithreaded
+    reader, the same frame as `pd.read_csv(source, dtype=str, usecols=columns)`. pandas' own pyarrow engine lets arrow infer
+    types first, which rewrites values such as timestamps, so the reader is called directly.
+    """
+    require_pyarrow()
+    if not columns:
+        #pyarrow reads every column for an empty include_columns, pandas none (and no rows)
+        return pd.DataFrame()
+    table = pacsv.read_csv(
+        source,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in columns},
+            null_values=CSV_NULL_VALUES,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def parquet_columns(path):
+    require_pyarrow()
+    return pq.read_schema(path).names
+
+
+def _nullable_int(arrow_type):
+    #integer columns with NULLs would otherwise come back as float64, and render as "1.0"
+    if pa.types.is_integer(arrow_type):
+        return pd.api.types.pandas_dtype(str(arrow_type).replace("u", "U").replace("int", "Int"))
+    return None
+
+
+def read_parquet_chunks(path, chunk_size, columns=None):
+    """
+    Yield DataFrames of at most `chunk_size` rows, reading one record batch at a time (only `columns`).
+    Integer columns are nullable Int64 (Int32, ...), whether or not they hold NULLs.
+    """
+    require_pyarrow()
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield batch.to_pandas(types_mapper=_nullable_int)
+
+
+def write_cursor_parquet(cursor, file_path, batch_size=100_000):
+    """
+    Write the rows of an executed (server-side) cursor to a parquet file, one row group per batch.
+    The arrow schema comes from the postgres column types, so every batch has the same schema.
+    Returns the number of rows written.
+    """
+    require_pyarrow()
+    rows = cursor.fetchmany(batch_size)
+    schema = pa.schema([(col.name, _arrow_type(col.type_code)) for col in cursor.description])
+    text_columns = {i for i, field in enumerate(schema) if pa.types.is_string(field.type)}
+
+    written = 0
+    with pq.ParquetWriter(file_path, schema) as writer:
+        while rows:
+            columns = list(zip(*rows))
+            arrays = []
+            for i, field in enumerate(schema):
+                values = columns[i]
+                if i in text_columns:
+                    values = [None if v is None else str(v) for v in values]
+                elif field.type == pa.float64():
+                    values = [None if v is None else float(v) for v in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            written += len(rows)
+            rows = cursor.fetchmany(batch_size)
+    return written
+
+
+def stringify_frame(df):
+    """Render typed columns as the text COPY would have written, empty string for NULL."""
+    out = pd.DataFrame(index=df.index)
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_bool_dtype(values.dtype):
+            values = values.map({True: "t", False: "f"}, na_action="ignore")
+        #through object, Series.map would turn a nullable Int column into floats first
+        out[col] = values.astype(object).map(str, na_action="ignore").fillna("").astype(object)
+    return out
+
+
+class ProcessedTableCache:
+    """
+    Processed frames stored as parquet between runs, keyed by the hash of the raw file and of its
+    table_format.yml section. A hit skips reading and transforming the raw file.
+    """
+
+    def __init__(self, cache_dir):
+        require_pyarrow()
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, table_name, raw_path, schema_section, raw_digest=None):
+        """Cache file of a raw file; `raw_digest` is its sha256 when already known (the run manifest's)."""
+        key = RunManifest.hash_section([raw_digest or RunManifest.hash_file(raw_path), schema_section])
+        #one entry per raw file, the parts of a table are cached side by side
+        return os.path.join(self.cache_dir, f"{os.path.basename(raw_path)}-{key[:16]}.parquet")
+
+    def get(self, cache_path):
+        if os.path.exists(cache_path):
+            return pd.read_parquet(cache_path)
+        return None
+
+    def put(self, cache_path, df, table_name):
+        #older entries of the same raw file are stale once a new key is written
+        prefix = os.path.basename(cache_path).rsplit("-", 1)[0] + "-"
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(".parquet"):
+                os.remove(os.path.join(self.cache_dir, name))
+        try:
+            df.to_parquet(cache_path, index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as e:
+            #columns mixing cast values and uncast strings have no single arrow type
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            print(f"⚠️ Not caching '{table_name}': {e}")
@@ -1,9 +1,22 @@
+import numpy as np
 import pandas as pd
 import yaml
 from formater import Formater
-from PostgresCaster import PostgresCaster
+from PostgresCaster import PostgresCaster, DATE_FORMATS, TIMESTAMP_FORMATS, TIMESTAMPTZ_FORMATS
+from series_formater import SeriesFormater
+from series_caster import SeriesCaster
+from columnar import ProcessedTableCache, pa, parquet_columns, read_csv_strings, read_parquet_chunks
+from cast_cache import FormatOrder, cast_distinct, memoized
+import metrics
+from quarantine import Quarantine, failed_casts
+from raw_input import CSV_EXTENSIONS, arrow_source, csv_source, open_raw
 import ast
+import csv
+import io
 import os
+from functools import partial
+from types import MappingProxyType
+from typing import Callable, NamedTuple
 
 TRANSFORM_MAP = {
     "Replace": Formater.replace,
@@ -11,8 +24,20 @@ TRANSFORM_MAP = {
     "ToDatetime": Formater.to_datetime,
     "ToFloat": Formater.to_float,
     "RegexReplace": Formater.regex_replace,
-    "ToInt": Formater.to_int,
-    "ToUpper": Formater.to_upper,
+    #these two parse a value directly, `ToInt()` / `ToUpper()` take no argument and return them as is
+    "ToInt": lambda: Formater.to_int,
+    "ToUpper": lambda: Formater.to_upper,
+}
+
+#same steps, run on a whole column at once
+VECTOR_TRANSFORM_MAP = {
+    "Replace": SeriesFormater.replace,
+    "Regex_replace": SeriesFormater.regex_replace,
+    "ToDatetime": SeriesFormater.to_datetime,
+    "ToFloat": SeriesFormater.to_float,
+    "RegexReplace": SeriesFormater.regex_replace,
+    "ToInt": SeriesFormater.to_int,
+    "ToUpper": SeriesFormater.to_upper,
 }
 
 #TODO separate the logic of the costume change and PostgreSQL type output.
@@ -26,14 +51,112 @@ FIX_AND_CHECK_TYPE_MAP = {
     "Timestamptz": PostgresCaster.to_timestamptz
 }
 
+VECTOR_TYPE_MAP = {
+    "Timestamp": SeriesCaster.to_timestamp,
+    "Date": SeriesCaster.to_date,
+    "Float": SeriesCaster.to_float,
+    "Integer": SeriesCaster.to_integer,
+    "Boolean": SeriesCaster.to_boolean,
+    "String": SeriesCaster.to_string,
+    "Timestamptz": SeriesCaster.to_timestamptz
+}
+
+#types whose casters try several formats, each column remembers which one its values use
+DATETIME_FORMATS = {
+    "Date": DATE_FORMATS,
+    "Timestamp": TIMESTAMP_FORMATS,
+    "Timestamptz": TIMESTAMPTZ_FORMATS,
+}
+
+#dtypes of cast columns, nullable so missing values stay NULL instead of turning ints into floats
+NATIVE_DTYPES = {
+    "Integer": "Int64",
+    "Float": "Float64",
+    "Boolean": "boolean",
+}
+
+#a String column with at most this share of distinct values is kept as a category
+CATEGORY_RATIO = 0.5
+
+#raw inputs: text read as all-str (plain or compressed), parquet read with its column types
+RAW_EXTENSIONS = CSV_EXTENSIONS + ('.parquet',)
+
+#parsers of raw CSV files: auto takes pyarrow's multithreaded reader for whole files when it is installed
+CSV_ENGINES = ("auto", "c", "pyarrow")
+
+#`load_mode` of a table in table_format.yml: recreate it, append to it, or merge on its primary key
+LOAD_MODES = ("replace", "append", "upsert")
+
+def native_column(series: pd.Series, type_name: str) -> pd.Series:
+    """
+    A cast column with a native dtype instead of Python objects: nullable Int64/Float64/boolean,
+    datetime64 (UTC for aware timestamps) and category for repetitive strings. Left as is when its
+    values do not fit one dtype.
+    """
+    try:
+        if type_name in NATIVE_DTYPES:
+            return series.astype(NATIVE_DTYPES[type_name])
+        if type_name in DATETIME_FORMATS:
+            if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                values = series
+            else:
+                try:
+                    values = pd.to_datetime(series)
+                except ValueError:
+                    #several UTC offsets convert to UTC, but naive values mixed in keep the server's zone
+                    if any(v.tzinfo is None for v in series.dropna()):
+                        return series
+                    values = pd.to_datetime(series, utc=True)
+            return values.dt.tz_convert("UTC") if values.dt.tz is not None else values
+        if type_name == "String" and len(series) and series.nunique() <= CATEGORY_RATIO * len(series):
+            return series.astype("category")
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return series
+
+
+class ColumnPlan(NamedTuple):
+    """One column of a table schema, with every step resolved ahead of the run."""
+    name: str
+    type_name: str
+    required: bool
+    parse: Callable | None    #all parse steps fused into one callable, None when there are none
+    type_fixer: Callable
+    formats: FormatOrder | None = None    #date formats of the column, inferred or pinned with `format:`
+    parse_steps: tuple = ()    #(step as written, callable) of each parse step, timed one by one on whole columns
+
+
+class TablePlan(NamedTuple):
+    table_name: str
+    columns: tuple[ColumnPlan, ...]
+    load_mode: str = "replace"
+
+
 class CSVProcessor:
-    def __init__(self, schema_path):
+    def __init__(self, schema_path, vectorized=True, cache_dir=None, quarantine_dir=None, csv_engine="auto"):
         with open(schema_path, 'r') as f:
             self.schema = yaml.safe_load(f)
-            
-    
-    
-    def get_transform_callable(self, step_str: str):
+        #vectorized runs every step on whole columns, otherwise each value goes through .apply
+        self.vectorized = vectorized
+        if csv_engine not in CSV_ENGINES:
+            raise ValueError(f"Unknown CSV engine: {csv_engine}, expected one of {CSV_ENGINES}")
+        if csv_engine == "pyarrow" and pa is None:
+            raise ImportError("The pyarrow CSV engine needs pyarrow: pip install pyarrow")
+        self.csv_engine = csv_engine
+        #processed frames kept as parquet between runs, keyed on raw file and schema hashes
+        self.cache = ProcessedTableCache(cache_dir) if cache_dir else None
+        #raw file name -> sha256 already computed for the run manifest, the cache keys reuse them
+        self.file_digests = {}
+        #rows with a value that failed its cast never reach the loader, they are set aside here
+        self.quarantine = Quarantine(quarantine_dir)
+        #compiled once here so a bad schema fails before any file is read
+        self.plans = MappingProxyType({
+            table_name: self.compile_table(table_name, config)
+            for table_name, config in (self.schema or {}).items()
+        })
+
+    def parse_step(self, step_str: str):
+        """Split `Name(args...)` into the function name and its literal arguments."""
         open_paren = step_str.find("(")
         if open_paren == -1 or not step_str.endswith(")"):
             raise ValueError(f"Invalid format: {step_str}")
@@ -44,66 +167,294 @@ class CSVProcessor:
         args = ast.literal_eval(args_str)
         if not isinstance(args, tuple):
             args = (args,)
+        return func_name, args
+
+    def get_transform_callable(self, step_str: str):
+        func_name, args = self.parse_step(step_str)
 
-        if func_name not in TRANSFORM_MAP:
+        transform_map = VECTOR_TRANSFORM_MAP if self.vectorized else TRANSFORM_MAP
+        if func_name not in transform_map:
             raise ValueError(f"Unknown transform function: {func_name}")
 
         #take a function give it the params needed and return a callable like => Formater.replace('-', '/') and will return a function parse() with '-', '/' params already set in it
-        return TRANSFORM_MAP[func_name](*args)
+        return transform_map[func_name](*args)
             
-    def check_and_fix_type(self, type_name: str):
-        if type_name not in FIX_AND_CHECK_TYPE_MAP:
+    def column_formats(self, type_name: str, pinned=None):
+        """The FormatOrder of a date column: the pinned `format:` (one format or a list) or the type's defaults."""
+        if pinned is None:
+            return FormatOrder(DATETIME_FORMATS[type_name]) if type_name in DATETIME_FORMATS else None
+        if type_name not in DATETIME_FORMATS:
+            raise ValueError(f"`format` only applies to {', '.join(DATETIME_FORMATS)} columns, not {type_name}")
+        pinned = [pinned] if isinstance(pinned, str) else pinned
+        if not pinned or not all(isinstance(fmt, str) and fmt for fmt in pinned):
+            raise ValueError(f"Invalid format: {pinned}")
+        return FormatOrder(pinned, pinned=True)
+
+    def check_and_fix_type(self, type_name: str, formats: FormatOrder | None = None):
+        type_map = VECTOR_TYPE_MAP if self.vectorized else FIX_AND_CHECK_TYPE_MAP
+        if type_name not in type_map:
             raise ValueError(f"Unknown type for PostgresCaster: {type_name}")
 
-        return FIX_AND_CHECK_TYPE_MAP[type_name]
+        #built per column: the format memory and the value cache belong to one column only
+        fixer = type_map[type_name]
+        if formats is not None:
+            fixer = partial(fixer, formats=formats)
+        return cast_distinct(fixer) if self.vectorized else memoized(fixer)
 
-    def process_file(self, csv_path):
-        table_name = csv_path.split("/")[-1].split(".")[0]
-        config = self.schema.get(table_name)
+    def compile_table(self, table_name, config) -> TablePlan:
+        if not isinstance(config, dict) or not config:
+            raise ValueError(f"Invalid schema for table '{table_name}': expected a mapping of columns")
+
+        load_mode = config.get("load_mode", "replace")
+        if load_mode not in LOAD_MODES:
+            raise ValueError(f"Invalid load_mode '{load_mode}' for table '{table_name}', expected one of {LOAD_MODES}")
+
+        columns = []
+        for col, rules in config.items():
+            if col == "load_mode":
+                continue
+            if not isinstance(rules, dict):
+                raise ValueError(f"Invalid schema for column '{table_name}.{col}': expected a mapping of rules")
+            try:
+                steps = [(step, self.get_transform_callable(step)) for step in rules.get("parse") or [] if step]
+                formats = self.column_formats(rules.get("type"), rules.get("format"))
+                type_fixer = self.check_and_fix_type(rules.get("type"), formats)
+            except (ValueError, TypeError, SyntaxError) as e:
+                raise ValueError(f"Invalid schema for column '{table_name}.{col}': {e}") from e
+
+            columns.append(ColumnPlan(
+                name=col,
+                type_name=rules.get("type"),
+                required=bool(rules.get("required", False)),
+                parse=Formater.field_parser(*(fn for _, fn in steps)) if steps else None,
+                type_fixer=type_fixer,
+                formats=formats,
+                parse_steps=tuple(steps),
+            ))
+        return TablePlan(table_name, tuple(columns), load_mode)
 
-        if not config:
+    def _run(self, series: pd.Series, fn) -> pd.Series:
+        if self.vectorized:
+            return fn(series)
+        return series.apply(fn)
+
+    def load_modes(self):
+        return {table_name: plan.load_mode for table_name, plan in self.plans.items()}
+
+    @staticmethod
+    def table_name_for(csv_path):
+        """Everything before the first dot: `film.csv`, `film.part2.csv.gz` and `film.2024-01.csv` all feed `film`."""
+        return os.path.basename(csv_path).split(".")[0]
+
+    def _table_plan(self, csv_path) -> TablePlan:
+        table_name = self.table_name_for(csv_path)
+        plan = self.plans.get(table_name)
+
+        if not plan:
             raise ValueError(f"No config found for table {table_name}")
+        return plan
+
+    @staticmethod
+    def _read_columns(plan: TablePlan, header):
+        """Columns of the file the schema configures, in file order: the others are never parsed."""
+        wanted = {column.name for column in plan.columns}
+        return [col for col in header if col in wanted]
+
+    @staticmethod
+    def _csv_header(csv_path):
+        #a compressed file only has its first block decompressed
+        with io.TextIOWrapper(open_raw(csv_path), newline="", encoding="utf-8-sig") as f:
+            return next(csv.reader(f), [])
+
+    def _read_csv(self, source, usecols):
+        """
+        A whole raw CSV as strings, with pyarrow's parser unless the engine is pinned to c. `source` is
+        a path (plain files are memory-mapped, compressed ones decompressed as they stream) or a buffer.
+        """
+        if self.csv_engine != "c" and pa is not None:
+            try:
+                if not isinstance(source, str):
+                    return read_csv_strings(source, usecols)
+                with arrow_source(source) as stream:
+                    return read_csv_strings(stream, usecols)
+            except ValueError as e:
+                #pyarrow rejects some files the c parser reads, e.g. rows with more fields than the header
+                if self.csv_engine == "pyarrow":
+                    raise
+                name = source if isinstance(source, str) else "partition"
+                print(f"⚠️ pyarrow could not parse '{name}' ({str(e).splitlines()[0]}), using the c parser")
+                if not isinstance(source, str):
+                    source.seek(0)
+        if not isinstance(source, str):
+            return pd.read_csv(source, dtype=str, usecols=usecols)
+        with csv_source(source) as raw:
+            return pd.read_csv(raw, dtype=str, usecols=usecols, memory_map=isinstance(raw, str))
+
+    def _cache_path(self, plan: TablePlan, csv_path):
+        if not self.cache:
+            return None
+        return self.cache.path_for(plan.table_name, csv_path, self.schema.get(plan.table_name),
+                                   self.file_digests.get(os.path.basename(csv_path)))
+
+    def process_file(self, csv_path):
+        plan = self._table_plan(csv_path)
+
+        cache_path = self._cache_path(plan, csv_path)
+        if cache_path:
+            cached = self.cache.get(cache_path)
+            if cached is not None:
+                print(f"♻️ Using cached '{plan.table_name}' from {cache_path}")
+                return cached, plan.table_name
+
+        with metrics.stage("read", plan.table_name) as record:
+            if csv_path.endswith('.parquet'):
+                df = pd.read_parquet(csv_path, columns=self._read_columns(plan, parquet_columns(csv_path)))
+            else:
+                #load everything as string for uniform processing
+                df = self._read_csv(csv_path, self._read_columns(plan, self._csv_header(csv_path)))
+            record["rows_out"] = len(df)
+            record["bytes"] = os.path.getsize(csv_path)
+        df = self.transform(df, plan)
+
+        if cache_path:
+            self.cache.put(cache_path, df, plan.table_name)
+        return df, plan.table_name
+
+    def process_partition(self, csv_path, data: bytes):
+        """Transform one byte range of a raw CSV: `data` holds the file's header, then whole records."""
+        plan = self._table_plan(csv_path)
+        with metrics.stage("read", plan.table_name) as record:
+            header = next(csv.reader(io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")), [])
+            df = self._read_csv(io.BytesIO(data), self._read_columns(plan, header))
+            record["rows_out"], record["bytes"] = len(df), len(data)
+        return self.transform(df, plan)
 
-        df = pd.read_csv(csv_path, dtype=str)  #load everything as string for uniform processing
+    def iter_file_chunks(self, csv_path, chunk_size):
+        """Yield (processed_chunk, table_name) for every `chunk_size` rows of the file."""
+        plan = self._table_plan(csv_path)
 
+        #chunked runs never write the processed-table cache, so they do not hash files to look it up
+        metrics.add("read", plan.table_name, bytes=os.path.getsize(csv_path))
+        if csv_path.endswith('.parquet'):
+            columns = self._read_columns(plan, parquet_columns(csv_path))
+            chunks = read_parquet_chunks(csv_path, chunk_size, columns)
+            for chunk in metrics.timed_chunks(chunks, "read", plan.table_name):
+                yield self.transform(chunk, plan), plan.table_name
+            return
+
+        #pyarrow's parser has no chunked reads, chunks go through the c parser
+        usecols = self._read_columns(plan, self._csv_header(csv_path))
+        with csv_source(csv_path) as raw, pd.read_csv(
+            raw, dtype=str, usecols=usecols, chunksize=chunk_size, memory_map=isinstance(raw, str)
+        ) as reader:
+            for chunk in metrics.timed_chunks(reader, "read", plan.table_name):
+                yield self.transform(chunk, plan), plan.table_name
+
+    def transform(self, df, plan: TablePlan):
+        """Apply a compiled table plan to a raw frame (all-string from CSV, typed from parquet)."""
+        with metrics.stage("transform", plan.table_name, rows_in=len(df)) as record:
+            df = self._transform(df, plan)
+            record["rows_out"] = len(df)
+        return df
+
+    def _transform(self, df, plan: TablePlan):
         column_renames = {}
+        #reason -> labels of the rows whose value failed that column's cast
+        failures = {}
 
-        for col, rules in config.items():
+        #rows missing a required value are dropped before any column is parsed or cast; a required
+        #column absent from the file drops every row
+        required = [column.name for column in plan.columns if column.required]
+        if required:
+            values = df.reindex(columns=required)
+            df = df[(values.notna() & (values != "")).all(axis=1)]
+
+        for column in plan.columns:
+            col = column.name
             #skip missing columns
             if col not in df.columns:
                 df[col] = None
 
-            #drop rows if required and empty
-            if rules.get("required", False):
-                df = df[df[col].notna() & (df[col] != "")]
-
             #parse steps
-            for step in rules.get("parse", []):
-                print(step)
-                if step:
-                    callable_replace = self.get_transform_callable(step)
-                    print(callable_replace)
-                    df[col] = df[col].apply(callable_replace)
+            if column.parse:
+                #steps work on text, typed parquet columns are rendered first
+                if not (pd.api.types.is_string_dtype(df[col].dtype) or df[col].dtype == object):
+                    df[col] = df[col].map(str, na_action="ignore")
+                if self.vectorized:
+                    #each step is a whole-column call already, timing them apart shows which one is slow
+                    for step, fn in column.parse_steps:
+                        with metrics.stage("parse", plan.table_name, f"{col} {step}", rows_in=len(df)):
+                            df[col] = fn(df[col])
+                else:
+                    #per value the steps stay fused into one .apply pass
+                    with metrics.stage("parse", plan.table_name, col, rows_in=len(df)):
+                        df[col] = self._run(df[col], column.parse)
 
-            print(rules.get("type"))
-            type_fixer = self.check_and_fix_type(rules.get("type"))
-            df[col] = df[col].apply(type_fixer)
+            with metrics.stage("cast", plan.table_name, col, rows_in=len(df)):
+                df[col] = self._run(df[col], column.type_fixer)
+                if column.type_name != "String":
+                    failed = failed_casts(df[col])
+                    if failed.any():
+                        failures[f"{col}: not a valid {column.type_name}"] = df.index[failed]
+            if column.formats is not None:
+                column.formats.flush(f"{plan.table_name}.{col}")
 
             #change column name with type name:type
-            col_with_type = f"{col}:{rules.get('type')}"
-            column_renames[col] = col_with_type
+            column_renames[col] = f"{col}:{column.type_name}"
+
+        if failures:
+            errors = self._cast_errors(failures, df.index)
+            if self.quarantine.add(plan.table_name, df.loc[errors.index], errors, len(df)):
+                df = df.drop(index=errors.index)
+
+        #without the uncast strings every column fits its native dtype
+        with metrics.stage("compact", plan.table_name, rows_in=len(df)) as record:
+            record["bytes_in"] = int(df.memory_usage(deep=True).sum())
+            for column in plan.columns:
+                df[column.name] = native_column(df[column.name], column.type_name)
+            record["rows_out"], record["bytes"] = len(df), int(df.memory_usage(deep=True).sum())
 
         df.rename(columns=column_renames, inplace=True)
         df.reset_index(drop=True, inplace=True)
-        return df , table_name
+        return df
 
-    def process_files(self, folderPath):
-        
-        #get all CSV filenames in the folder
-        csv_files_list = [f for f in os.listdir(folderPath) if f.endswith('.csv')]
+    @staticmethod
+    def _cast_errors(failures, index) -> pd.Series:
+        """One `col: reason; col: reason` message per failing row still in the frame."""
+        errors = pd.Series("", index=index, dtype=object)
+        for reason, labels in failures.items():
+            #rows dropped afterwards by a required column are not quarantined
+            labels = labels.intersection(index)
+            errors[labels] = np.where(errors[labels] == "", reason, errors[labels] + "; " + reason)
+        return errors[errors != ""]
+
+    def list_raw_files(self, folderPath, tables=None):
+        """
+        Raw filenames (.csv, compressed .csv.gz/.bz2/.xz/.zst, .parquet) in the folder, only those feeding
+        `tables` when given. Sorted, so the parts of a table come in name order.
+        """
+        files = sorted(f for f in os.listdir(folderPath) if f.endswith(RAW_EXTENSIONS))
+        if tables is not None:
+            files = [f for f in files if self.table_name_for(f) in tables]
+        return files
+
+    def raw_files_by_table(self, folderPath):
+        files_by_table = {}
+        for file in self.list_raw_files(folderPath):
+            files_by_table.setdefault(self.table_name_for(file), []).append(os.path.join(folderPath, file))
+        return files_by_table
 
-        print(csv_files_list)
-        print("ccc")
+    def stream_files(self, folderPath, chunk_size, tables=None):
+        """Yield (table_name, processed_chunk) pairs, one file and one chunk at a time."""
+        for file in self.list_raw_files(folderPath, tables):
+            file_path = os.path.join(folderPath, file)
+            for chunk, table_name in self.iter_file_chunks(file_path, chunk_size):
+                yield table_name, chunk
+
+    def process_files(self, folderPath, tables=None):
+        
+        #get all raw filenames in the folder
+        csv_files_list = self.list_raw_files(folderPath, tables)
 
         results = []
         
@@ -111,7 +462,7 @@ class CSVProcessor:
             file_path = os.path.join(folderPath, file)
             
             processed_rows, table_name  = self.process_file(file_path)
-            print(processed_rows, table_name)
+            print(f"🔄 Processed '{file}' into '{table_name}' ({len(processed_rows)} rows)")
             results.append((table_name, processed_rows))
         return results
     
\ No newline at end of file
@@ -0,0 +1,86 @@
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, text
+
+#server settings a stage may override, e.g. {"sql": {"work_mem": "256MB", "statement_timeout": "30min"}}
+_SETTING_RE = re.compile(r"^\w+(\.\w+)?$")
+
+
+class DatabaseSession:
+    """
+    The one engine of a run: loader, SQL executor and exporter all check their connections out of its
+    bounded pool, so connections are set up once and reused across stages. Connections are pinged on
+    checkout and recycled after `pool_recycle` seconds, and each stage can run with its own server
+    settings (`stage_settings`), applied per transaction or for as long as a raw connection is held.
+    """
+
+    def __init__(self, user, password, host, port, database, pool_size=8, max_overflow=0, pool_timeout=300,
+                 pool_recycle=1800, stage_settings=None):
+        for stage, settings in (stage_settings or {}).items():
+            for name in settings:
+                if not _SETTING_RE.match(name):
+                    raise ValueError(f"Invalid setting name '{name}' for stage '{stage}'")
+        #keyword arguments of this session, to open the same one in a worker process
+        self.config = {
+            "user": user, "password": password, "host": host, "port": port, "database": database,
+            "pool_size": pool_size, "max_overflow": max_overflow, "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle, "stage_settings": stage_settings,
+        }
+        self.stage_settings = {stage: dict(settings) for stage, settings in (stage_settings or {}).items()}
+        #checkouts past pool_size + max_overflow wait up to pool_timeout for a connection to come back
+        self.capacity = pool_size + max_overflow
+        self.engine = create_engine(
+            f'postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}',
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=True,
+        )
+
+    def _settings(self, stage):
+        return self.stage_settings.get(stage, {}) if stage else {}
+
+    def ping(self):
+        """Fail fast on a wrong DSN or an unreachable server, before any file is transformed."""
+        with self.engine.connect() as conn:
+            version = conn.execute(text("SHOW server_version")).scalar()
+        print(f"✅ Connected to PostgreSQL {version} (pool of {self.capacity} connections).")
+
+    @contextmanager
+    def begin(self, stage=None):
+        """A transaction on a pooled connection, with the stage's settings local to it."""
+        with self.engine.begin() as conn:
+            for name, value in self._settings(stage).items():
+                conn.execute(text("SELECT set_config(:name, :value, true)"), {"name": name, "value": str(value)})
+            yield conn
+
+    @contextmanager
+    def raw(self, stage=None):
+        """
+        A pooled psycopg2 connection for COPY and server-side cursors. The stage's settings hold for
+        the whole checkout and are reset before the connection goes back to the pool.
+        """
+        fairy = self.engine.raw_connection()
+        conn = fairy.dbapi_connection
+        settings = self._settings(stage)
+        try:
+            if settings:
+                with conn.cursor() as cur:
+                    for name, value in settings.items():
+                        cur.execute("SELECT set_config(%s, %s, false)", (name, str(value)))
+                conn.commit()
+            yield conn
+        finally:
+            try:
+                conn.rollback()
+                if settings:
+                    with conn.cursor() as cur:
+                        cur.execute("; ".join(f"RESET {name}" for name in settings))
+                    conn.commit()
+            finally:
+                fairy.close()
+
+    def dispose(self):
+        self.engine.dispose()
@@ -68,10 +68,12 @@ class Formater:
 
     @staticmethod
     def regex_replace(to_replace: str, replace_by: str) -> Callable[[str | None], str | None]:
+        pattern = re.compile(to_replace)
+
         def parse(value: str | None) -> str | None:
             if value is None:
                 return None
-            return re.sub(to_replace, replace_by, value)
+            return pattern.sub(replace_by, value)
         return parse
 
     @staticmethod
@@ -1,8 +1,13 @@
 from csv_processor import CSVProcessor
 from postgresLoader import PostgresLoader
-from sqlScriptExecutor import SqlScriptExecutor
+from sqlScriptExecutor import SqlScriptExecutor, written_by
 from postgresCsvExporter import PostgresCsvExporter
-from parse_dbml_schema import validate_dbml_csv_files
+from parallel_runner import run_tables_in_parallel
+from async_pipeline import run_async_pipeline
+from db_session import DatabaseSession
+from manifest import RunManifest
+from metrics import RunMetrics, activate, profiled
+from parse_dbml_schema import DBMLValidator, validate_dbml_csv_files, parse_dbml_indexes, parse_dbml_schema, primary_keys
 import os
 import yaml
 from dotenv import load_dotenv
@@ -13,13 +18,108 @@ def load_config(path="../config/config.yml"):
     with open(path, 'r') as file:
         return yaml.safe_load(file)
 
-def main():
-    print(os.getcwd())
-    config = load_config()
+def loader_options(config, processor):
+    """
+    PostgresLoader keyword arguments: load method, per-table load modes, upsert keys from the DBML schema
+    and, with `dbml_ddl`, the parsed DBML the tables are created from.
+    """
+    load_modes = processor.load_modes()
+    keys = {}
+    dbml_tables = dbml_indexes = None
+    if config.get('dbml_ddl', False) and os.path.exists(config['dbml_schema_path']):
+        dbml_tables = parse_dbml_schema(config['dbml_schema_path'])
+        dbml_indexes = parse_dbml_indexes(config['dbml_schema_path'])
+    if 'upsert' in load_modes.values():
+        dbml_tables = dbml_tables or parse_dbml_schema(config['dbml_schema_path'])
+        keys = {t: primary_keys(dbml_tables, t) for t, mode in load_modes.items() if mode == 'upsert'}
+    return {
+        'load_method': config.get('load_method', 'copy'),
+        'load_modes': load_modes,
+        'primary_keys': keys,
+        'dbml_tables': dbml_tables if config.get('dbml_ddl', False) else None,
+        'dbml_indexes': dbml_indexes,
+    }
 
-    processor = CSVProcessor(schema_path=config['schema_path'])
-    res = processor.process_files(config['raw_data_dir'])
-    print(res)
+def load_tables(config, processor, session, tables=None):
+    """Transform and load the raw files, only those of `tables` when given."""
+    chunk_size = config.get('chunk_size')
+    options = loader_options(config, processor)
+    workers = config.get('workers', 1)
+    if workers > 1:
+        #one table per process, map.sql only runs once every table has been attempted
+        _, errors = run_tables_in_parallel(
+            config['schema_path'], config['raw_data_dir'], session.config, workers, options, chunk_size, tables,
+            config.get('cache_dir'), config.get('quarantine_dir'), config.get('csv_engine', 'auto'),
+            (config.get('partition_size_mb') or 0) * 1024 * 1024, processor.file_digests
+        )
+        if errors:
+            raise RuntimeError(f"{len(errors)} table(s) failed to load: {', '.join(errors)}")
+    elif chunk_size:
+        loader = PostgresLoader(session, **options)
+        #stream each file chunk by chunk into the loader, memory stays bounded by chunk_size
+        loader.load_stream(processor.stream_files(config['raw_data_dir'], chunk_size, tables))
+    else:
+        loader = PostgresLoader(session, **options)
+        res = processor.process_files(config['raw_data_dir'], tables)
+        loader.load_all_dataframes(loader, res)
+
+def export_tables(config, session, to_export, validator=None):
+    """
+    Export `to_export` with the configured format, compression and concurrency.
+    Returns {table: error message} of the exports that failed.
+    """
+    exporter = PostgresCsvExporter(session)
+    output_dir = config.get('output_dir', '../data/output')
+    compress = config.get('export_gzip', False)
+    export_format = config.get('export_format', 'csv')
+    export_workers = config.get('export_workers', 1)
+    try:
+        if export_workers > 1 and len(to_export) > 1:
+            results = exporter.export_tables_concurrently(
+                to_export, output_dir, export_workers, compress, validator, file_format=export_format
+            )
+            return {table: result["error"] for table, result in results.items() if result["error"]}
+        return exporter.export_tables_to_csv(
+            to_export, output_dir, compress=compress, validator=validator, file_format=export_format
+        )
+    finally:
+        exporter.close()
+
+def export_table_or_raise(config, session, table, validator=None):
+    """Export one table on its own (async pipeline), raising when it failed."""
+    failed = export_tables({**config, 'export_workers': 1}, session, [table], validator)
+    if failed:
+        raise RuntimeError(failed[table])
+
+def run_overlapped(config, processor, session, executor, tables, to_export, validator=None, sql_tables=None):
+    """Transform, load, map.sql and export with the stages overlapping (`pipeline: async`)."""
+    loader = PostgresLoader(session, **loader_options(config, processor))
+    errors = run_async_pipeline(
+        processor,
+        loader,
+        run_sql=lambda: executor.execute_sql_file(config['sql_script_path'], sql_tables),
+        #each table is exported on its own as soon as it is ready, no shared snapshot
+        export_table=lambda table: export_table_or_raise(config, session, table, validator),
+        raw_data_dir=config['raw_data_dir'],
+        to_export=to_export,
+        sql_script_path=config['sql_script_path'],
+        tables=tables,
+        chunk_size=config.get('chunk_size'),
+        queue_size=config.get('pipeline_queue_size', 4),
+        transform_workers=config.get('transform_workers', 2),
+        load_workers=config.get('workers', 4),
+        export_workers=config.get('export_workers', 4),
+    )
+    if errors:
+        raise RuntimeError(f"{len(errors)} pipeline step(s) failed: {', '.join(errors)}")
+
+def run_pipeline(config):
+    processor = CSVProcessor(
+        schema_path=config['schema_path'],
+        cache_dir=config.get('cache_dir'),
+        quarantine_dir=config.get('quarantine_dir'),
+        csv_engine=config.get('csv_engine', 'auto'),
+    )
 
     db_config = {
         'user': os.getenv('DB_USER'),
@@ -28,24 +128,102 @@ def main():
         'port': os.getenv('DB_PORT'),
         'database': os.getenv('DB_NAME')
     }
-
-    loader = PostgresLoader(**db_config)
-    loader.load_all_dataframes(loader, res)
-
-    executor = SqlScriptExecutor(**db_config)
-    executor.execute_sql_file(config['sql_script_path'])
-
-    exporter = PostgresCsvExporter(**db_config)
-    tables = config['to_export']
-    exporter.export_tables_to_csv(tables)
-    exporter.close()
-    
-    
-    validate_dbml_csv_files(
-    output_folder="../data/output",
-    schemas_folder="../data/dbml_validator/schema.dbml",
-    invalid_folder="../data/dbml_validator/invalid"
+    #one engine and connection pool for every stage of the run
+    session = DatabaseSession(
+        **db_config,
+        pool_size=config.get('db_pool_size', 8),
+        max_overflow=config.get('db_max_overflow', 0),
+        stage_settings=config.get('db_stage_settings'),
     )
 
+    #independent statement groups of map.sql run on `sql_workers` pooled connections
+    executor = SqlScriptExecutor(session, workers=config.get('sql_workers', 1))
+    to_export = config['to_export']
+    #None runs all of map.sql, a set only the statements reading one of those tables
+    sql_tables = None
+    manifest = None
+    if config.get('manifest_path'):
+        #incremental run: only tables whose raw files or schema section changed are processed again
+        manifest = RunManifest(config['manifest_path'])
+        #with dbml_ddl the DBML types, keys and indexes are part of what a table is loaded from
+        dbml_tables = loader_options(config, processor)['dbml_tables'] or {}
+        fingerprint = manifest.fingerprint(
+            processor.raw_files_by_table(config['raw_data_dir']), processor.schema,
+            config['dbml_schema_path'] if dbml_tables else None, dbml_tables
+        )
+        #every raw file is hashed once per run, the processed-table cache keys reuse these digests
+        processor.file_digests = {name: digest for entry in fingerprint.values() for name, digest in entry["files"].items()}
+        sql_hash = RunManifest.hash_file(config['sql_script_path'])
+        changed = manifest.changed_tables(fingerprint)
+        sql_changed = manifest.sql_script_changed(sql_hash)
+        if not sql_changed:
+            if config.get('sql_only_changed', True):
+                sql_tables = changed
+            #tables map.sql rebuilds from a changed table are exported again too
+            rebuilt = written_by(executor.plan_file(config['sql_script_path'], sql_tables))
+            to_export = [t for t in to_export if t in changed or t in rebuilt]
+        print(f"🔁 Changed tables: {sorted(changed) or 'none'}, map.sql changed: {sql_changed}")
+        if not changed and not sql_changed:
+            print("✅ Nothing changed since the last run.")
+            return
+        tables = changed
+    else:
+        tables = None
+
+    output_dir = config.get('output_dir', '../data/output')
+    invalid_folder = config.get('invalid_dir', '../data/dbml_validator/invalid')
+    validator = None
+    #in-flight validation reads the COPY text stream, parquet exports are validated afterwards
+    if to_export and config.get('validate_in_flight', False) and config.get('export_format', 'csv') == 'csv':
+        #rows are checked while they stream out of COPY, there is no second pass over the files
+        validator = DBMLValidator(output_dir, config['dbml_schema_path'], invalid_folder)
+
+    export_errors = {}
+    session.ping()
+    try:
+        if config.get('pipeline') == 'async':
+            run_overlapped(config, processor, session, executor, tables, to_export, validator, sql_tables)
+        else:
+            if tables is None or tables:
+                load_tables(config, processor, session, tables)
+
+            executor.execute_sql_file(config['sql_script_path'], sql_tables)
+
+            if to_export:
+                export_errors = export_tables(config, session, to_export, validator)
+    finally:
+        session.dispose()
+
+    if to_export and validator is None:
+        validate_dbml_csv_files(
+        output_folder=output_dir,
+        schemas_folder=config['dbml_schema_path'],
+        invalid_folder=invalid_folder,
+        workers=config.get('validate_workers', 1)
+        )
+
+    #a failed export must run again next time, the manifest only records fully successful runs
+    if export_errors:
+        raise RuntimeError(f"{len(export_errors)} table(s) failed to export: {', '.join(export_errors)}")
+
+    if manifest:
+        manifest.update(fingerprint, sql_hash)
+        manifest.save()
+
+def main():
+    config = load_config()
+
+    #every stage of the run records its timings, rows and memory into this run
+    run = RunMetrics()
+    activate(run)
+    try:
+        with profiled(config.get('profile_path')):
+            run_pipeline(config)
+    finally:
+        run.summary()
+        if config.get('metrics_path'):
+            run.report(config['metrics_path'], workers=config.get('workers', 1), chunk_size=config.get('chunk_size'))
+            print(f"📊 Run report written to {config['metrics_path']}")
+
 if __name__ == "__main__":
     main()
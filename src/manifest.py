@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+
+
+class RunManifest:
+    """
+    Content hashes of the inputs of the last successful run, stored as JSON:
+    {
+      "tables": {"film": {"files": {"film.csv": "<sha256>"}, "schema": "<sha256>", "dbml": "<sha256>"}, ...},
+      "sql_script": "<sha256>"
+    }
+    A table whose raw files, table_format.yml section and DBML schema (when its DDL comes from one)
+    hash the same as last time is unchanged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data = {"tables": {}, "sql_script": None}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    @staticmethod
+    def hash_file(path: str, block_size: int = 1 << 20) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_section(section) -> str:
+        """Hash a parsed YAML section, so formatting and key order don't count as changes."""
+        return hashlib.sha256(json.dumps(section, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def fingerprint(self, raw_files: dict, schema: dict, dbml_path: str = None, dbml_tables=()) -> dict:
+        """
+        Build {table: {"files": {name: hash}, "schema": hash}} from {table: [file paths]}. The tables
+        in `dbml_tables` also get the hash of the DBML file their DDL is compiled from.
+        """
+        dbml_hash = self.hash_file(dbml_path) if dbml_path else None
+        fingerprint = {}
+        for table_name, paths in raw_files.items():
+            entry = {
+                "files": {os.path.basename(p): self.hash_file(p) for p in sorted(paths)},
+                "schema": self.hash_section(schema.get(table_name)),
+            }
+            if dbml_hash and table_name in dbml_tables:
+                entry["dbml"] = dbml_hash
+            fingerprint[table_name] = entry
+        return fingerprint
+
+    def changed_tables(self, current: dict) -> set:
+        previous = self.data.get("tables", {})
+        return {table_name for table_name, entry in current.items() if previous.get(table_name) != entry}
+
+    def sql_script_changed(self, sql_hash: str) -> bool:
+        return self.data.get("sql_script") != sql_hash
+
+    def update(self, current: dict, sql_hash: str):
+        self.data.setdefault("tables", {}).update(current)
+        self.data["sql_script"] = sql_hash
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        #replace in one step so an interrupted write never leaves a truncated manifest
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,185 @@
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+#summed over every call of a stage, the rest are maxima
+_SUMMED = ("calls", "errors", "wall_s", "cpu_s", "rows_in", "rows_out", "bytes_in", "bytes")
+
+
+def _max_rss_mb() -> float:
+    #ru_maxrss is the high-water mark of the process, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RunMetrics:
+    """
+    Wall time, CPU time, rows, bytes and memory of every stage of a run, per table.
+
+    Calls of the same (stage, table, detail) are summed, so per-chunk and per-column stages stay one
+    line each. Stages nest (`transform` contains the `parse` and `cast` of its columns), their times
+    overlap. CPU time is the time of the calling thread; memory is the process peak RSS at the end of
+    the stage and how much the stage raised it. Stages of worker processes are sent back with
+    `collect` and added with `merge`.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, table=None, detail=None, rows_in=None):
+        """Time the block; it can fill rows_out, bytes (and rows_in, bytes_in) in the yielded dict."""
+        record = {"rows_in": rows_in, "rows_out": None, "bytes_in": None, "bytes": None}
+        rss_before = _max_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        failed = False
+        try:
+            yield record
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            peak = _max_rss_mb()
+            self.add(name, table, detail, calls=1, errors=int(failed),
+                     wall_s=time.perf_counter() - wall, cpu_s=time.thread_time() - cpu,
+                     rows_in=record["rows_in"], rows_out=record["rows_out"],
+                     bytes_in=record["bytes_in"], bytes=record["bytes"],
+                     peak_rss_mb=peak, rss_growth_mb=peak - rss_before)
+
+    def add(self, name, table=None, detail=None, **fields):
+        """Add figures to a stage without timing anything, e.g. the size of a file once it is written."""
+        key = (name, table, detail)
+        with self._lock:
+            stats = self._stages.setdefault(key, {"stage": name, "table": table, "detail": detail})
+            for field, value in fields.items():
+                if value is None:
+                    continue
+                if field in _SUMMED:
+                    stats[field] = stats.get(field, 0) + value
+                else:
+                    stats[field] = max(stats.get(field, value), value)
+
+    def records(self):
+        with self._lock:
+            return [dict(stats) for stats in self._stages.values()]
+
+    def merge(self, records):
+        for stats in records:
+            fields = {k: v for k, v in stats.items() if k not in ("stage", "table", "detail")}
+            self.add(stats["stage"], stats["table"], stats["detail"], **fields)
+
+    def totals(self):
+        """Stage totals over every table, top-level stages only (no detail)."""
+        totals = {}
+        for stats in self.records():
+            if stats["detail"] is not None:
+                continue
+            total = totals.setdefault(stats["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "rows_out": 0, "bytes": 0})
+            for field in total:
+                total[field] += stats.get(field) or 0
+        return totals
+
+    def report(self, path, **extra):
+        """Write the run report as JSON and return it."""
+        report = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "wall_s": time.perf_counter() - self._start,
+            "peak_rss_mb": _max_rss_mb(),
+            **extra,
+            "totals": self.totals(),
+            "stages": sorted(self.records(), key=lambda s: (s["stage"], s["table"] or "", s["detail"] or "")),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def summary(self):
+        for name, total in sorted(self.totals().items(), key=lambda item: -item[1]["wall_s"]):
+            rows = f", {total['rows_out']:,} rows" if total["rows_out"] else ""
+            size = f", {total['bytes'] / 1024 / 1024:.1f} MB" if total["bytes"] else ""
+            print(f"⏱️ {name:<10} {total['wall_s']:>8.2f}s wall {total['cpu_s']:>8.2f}s cpu{rows}{size}")
+        for stats in sorted(self.records(), key=lambda s: s["table"] or ""):
+            #frames before and after their columns got native dtypes, summed over chunks
+            if stats["stage"] == "compact" and stats["detail"] is None and stats.get("bytes_in"):
+                saved = 1 - stats["bytes"] / stats["bytes_in"]
+                print(f"🗜️ {stats['table']:<10} {stats['bytes_in'] / 1024 / 1024:>8.1f} MB -> "
+                      f"{stats['bytes'] / 1024 / 1024:.1f} MB in memory ({saved:.0%} saved)")
+
+
+#the run stages are recorded into, None when metrics are off
+_active = None
+
+
+def activate(run):
+    global _active
+    previous, _active = _active, run
+    return previous
+
+
+def active():
+    return _active
+
+
+def stage(name, table=None, detail=None, rows_in=None):
+    """RunMetrics.stage on the active run, a no-op when there is none."""
+    if _active is None:
+        return nullcontext({"rows_in": rows_in, "rows_out": None, "bytes": None})
+    return _active.stage(name, table, detail, rows_in)
+
+
+def add(name, table=None, detail=None, **fields):
+    if _active is not None:
+        _active.add(name, table, detail, **fields)
+
+
+def merge(records):
+    if _active is not None and records:
+        _active.merge(records)
+
+
+def collect(fn, *args, **kwargs):
+    """Run fn with a fresh RunMetrics (in a worker process) and return (result, stage records)."""
+    run = RunMetrics()
+    previous = activate(run)
+    try:
+        return fn(*args, **kwargs), run.records()
+    finally:
+        activate(previous)
+
+
+def timed_chunks(chunks, name, table=None, detail=None):
+    """Yield from an iterator of frames, timing how long each one takes to produce."""
+    iterator = iter(chunks)
+    while True:
+        with stage(name, table, detail) as record:
+            chunk = next(iterator, None)
+            if chunk is not None:
+                record["rows_out"] = len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+@contextmanager
+def profiled(path=None):
+    """cProfile the block and dump the stats to `path` (read them with pstats or snakeviz); no-op without one."""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        print(f"📈 Profile written to {path}")
@@ -0,0 +1,197 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from csv_processor import CSVProcessor
+from db_session import DatabaseSession
+import metrics
+from partitioned import create_table_for, partition_ranges, transform_and_load_partition
+from postgresLoader import PostgresLoader
+from quarantine import Quarantine
+
+
+def transform_and_load(schema_path, db_config, file_path, loader_options=None, chunk_size=None, cache_dir=None,
+                       quarantine_dir=None, csv_engine="auto", append=False, part=None, file_digests=None):
+    """
+    Transform one raw file and load it into its table. Runs inside a worker process.
+    With `append` the table was created beforehand for all the files of the table and is only appended
+    to; `part` gives the file its own quarantine file, combined with the others afterwards.
+    `file_digests` are the raw files' hashes from the run manifest, reused by the processed-table cache.
+    """
+    start = time.perf_counter()
+    processor = CSVProcessor(schema_path=schema_path, cache_dir=cache_dir, quarantine_dir=quarantine_dir,
+                             csv_engine=csv_engine)
+    if part is not None:
+        processor.quarantine = Quarantine(quarantine_dir, part=part)
+    processor.file_digests = file_digests or {}
+    #engines do not cross processes, each worker opens the run's session again from its settings
+    session = DatabaseSession(**db_config)
+    loader = PostgresLoader(session, **(loader_options or {}))
+
+    if chunk_size:
+        rows = 0
+        table_name = processor._table_plan(file_path).table_name
+        for i, (chunk, _) in enumerate(processor.iter_file_chunks(file_path, chunk_size)):
+            rows += len(chunk)
+            if i == 0 and not append:
+                loader.load_dataframe(chunk, table_name, finish=False)
+            else:
+                loader.append_dataframe(chunk, table_name)
+        loader.finish_table(table_name)
+    else:
+        df, table_name = processor.process_file(file_path)
+        rows = len(df)
+        if append:
+            loader.append_dataframe(df, table_name)
+        else:
+            loader.load_dataframe(df, table_name)
+
+    session.dispose()
+    return table_name, rows, time.perf_counter() - start
+
+
+def transform_and_load_parts(schema_path, db_config, parts, loader_options=None, chunk_size=None, cache_dir=None,
+                             quarantine_dir=None, csv_engine="auto", file_digests=None):
+    """The (part, file) pairs of one upsert table, in order in one worker: merges into a table must not run side by side."""
+    rows, seconds = 0, 0.0
+    for part, file_path in parts:
+        table_name, part_rows, part_seconds = transform_and_load(
+            schema_path, db_config, file_path, loader_options, chunk_size, cache_dir, quarantine_dir, csv_engine,
+            append=True, part=part, file_digests=file_digests
+        )
+        rows, seconds = rows + part_rows, seconds + part_seconds
+    return table_name, rows, seconds
+
+
+def run_tables_in_parallel(schema_path, raw_data_dir, db_config, workers, loader_options=None, chunk_size=None,
+                           tables=None, cache_dir=None, quarantine_dir=None, csv_engine="auto", partition_size=None,
+                           file_digests=None):
+    """
+    Transform and load every raw file, one file per worker process.
+    Every table is attempted; failures are collected instead of stopping the run.
+    `db_config` are DatabaseSession keyword arguments (`DatabaseSession.config`), `loader_options` are PostgresLoader
+    keyword arguments (load_method, load_modes, primary_keys) and `tables` restricts the run to the files of those
+    tables. `cache_dir` enables the processed-table cache, `quarantine_dir` is where rows failing their casts are
+    written, `csv_engine` the parser of raw CSV files and `file_digests` the raw files' manifest hashes.
+    A table fed by several files (`film.part1.csv.gz`, `film.part2.csv.gz`) is created empty first, then
+    every file appends to it and its keys and indexes are built once they all succeeded. With several workers, CSV files larger than `partition_size` bytes are also
+    split into partitions of about that size, transformed and COPY-loaded by several workers at once.
+    Returns (loaded, errors): {table: (rows, seconds)} and {file: error message}.
+    """
+    processor = CSVProcessor(schema_path=schema_path)
+    files_by_table = {}
+    for file in processor.list_raw_files(raw_data_dir, tables):
+        files_by_table.setdefault(processor.table_name_for(file), []).append(os.path.join(raw_data_dir, file))
+    if workers <= 1:
+        partition_size = None
+
+    loaded = {}
+    errors = {}
+    start = time.perf_counter()
+
+    #tables several tasks write to are created here, their tasks only append
+    shared = {
+        table_name: files for table_name, files in files_by_table.items()
+        if len(files) > 1 or any(_partitioned(processor, f, partition_size) for f in files)
+    }
+    #the session stays open for the keys and indexes built at the end
+    session = DatabaseSession(**db_config) if shared else None
+    loader = PostgresLoader(session, **(loader_options or {})) if shared else None
+    for table_name, files in list(shared.items()):
+        try:
+            create_table_for(processor, loader, files[0])
+        except Exception as e:
+            errors[files[0]] = f"{type(e).__name__}: {e}"
+            del shared[table_name]
+            files_by_table.pop(table_name)
+
+    #(label, table, function, arguments) of every unit of work
+    tasks = []
+    #shared tables with a task that failed, or a file that could not be split, keep no keys
+    failed = set()
+    common = (loader_options, chunk_size, cache_dir, quarantine_dir, csv_engine)
+    for table_name, files in files_by_table.items():
+        if table_name not in shared:
+            tasks.append((files[0], table_name, transform_and_load,
+                          (schema_path, db_config, files[0], *common, False, None, file_digests)))
+            continue
+        if processor.plans[table_name].load_mode == 'upsert':
+            tasks.append((", ".join(files), table_name, transform_and_load_parts,
+                          (schema_path, db_config, list(enumerate(files)), *common, file_digests)))
+            continue
+        part = 0
+        for file_path in files:
+            if not _partitioned(processor, file_path, partition_size):
+                tasks.append((file_path, table_name, transform_and_load,
+                              (schema_path, db_config, file_path, *common, True, part, file_digests)))
+                part += 1
+                continue
+            try:
+                header, ranges = partition_ranges(file_path, partition_size)
+            except Exception as e:
+                errors[file_path] = f"{type(e).__name__}: {e}"
+                failed.add(table_name)
+                continue
+            for first, last in ranges:
+                tasks.append((f"{file_path} [bytes {first}-{last}]", table_name, transform_and_load_partition,
+                              (schema_path, db_config, file_path, table_name, header, first, last, part,
+                               loader_options, quarantine_dir, csv_engine)))
+                part += 1
+
+    def done(table_name, rows, seconds):
+        #parts and partitions of one table add up
+        total_rows, total_seconds = loaded.get(table_name, (0, 0.0))
+        loaded[table_name] = (total_rows + rows, total_seconds + seconds)
+
+    if workers <= 1:
+        for label, table_name, fn, args in tasks:
+            try:
+                done(*fn(*args))
+            except Exception as e:
+                errors[label] = f"{type(e).__name__}: {e}"
+                failed.add(table_name)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(metrics.collect, fn, *args): (label, table_name)
+                       for label, table_name, fn, args in tasks}
+            #as_completed only returns once every submitted table has finished or failed
+            for future in as_completed(futures):
+                try:
+                    result, records = future.result()
+                    metrics.merge(records)
+                    done(*result)
+                except Exception as e:
+                    label, table_name = futures[future]
+                    errors[label] = f"{type(e).__name__}: {e}"
+                    failed.add(table_name)
+
+    quarantine = Quarantine(quarantine_dir)
+    for table_name in shared:
+        quarantine.combine(table_name)
+        if table_name in failed:
+            continue
+        try:
+            loader.finish_table(table_name)
+        except Exception as e:
+            errors[table_name] = f"{type(e).__name__}: {e}"
+    if session is not None:
+        session.dispose()
+
+    wall = time.perf_counter() - start
+    busy = sum(seconds for _, seconds in loaded.values())
+    print(f"⏱️ Loaded {len(loaded)} tables in {wall:.2f}s with {workers} worker(s) "
+          f"(sum of per-table times {busy:.2f}s, speedup x{busy / wall if wall else 0:.1f})")
+    for file_path, error in errors.items():
+        print(f"❌ Failed to load '{file_path}': {error}")
+
+    return loaded, errors
+
+
+def _partitioned(processor: CSVProcessor, file_path, partition_size):
+    """Whether a raw file is big enough to be split; upserts stay whole, parallel merges would contend on keys."""
+    return (
+        bool(partition_size)
+        and file_path.endswith('.csv')
+        and os.path.getsize(file_path) > partition_size
+        and processor._table_plan(file_path).load_mode != 'upsert'
+    )
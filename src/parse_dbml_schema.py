@@ -1,8 +1,161 @@
+import contextlib
 import os
-import csv
 import glob
 import re
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Any, NamedTuple, Tuple
+
+import pandas as pd
+
+from columnar import read_parquet_chunks, stringify_frame
+import metrics
+
+INT_TYPES = ("int4", "int2", "int8", "integer", "smallint", "bigint")
+BOOL_VALUES = ("true", "false", "1", "0", "t", "f")
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}(:?\d{2})?)?$")
+BPCHAR_RE = re.compile(r"bpchar\((\d+)\)")
+NOT_NULL_ERROR = "Value is required (not null constraint)"
+#an Indexes entry: "col", col or (col_a, col_b), with optional [pk, unique, name: "...", type: btree]
+INDEX_RE = re.compile(r'^(?:\(([^)]+)\)|"?([\w]+)"?)\s*(?:\[(.+)\])?\s*$')
+
+class DbmlIndex(NamedTuple):
+    """One entry of a table's `Indexes { ... }` block."""
+    columns: Tuple[str, ...]
+    unique: bool = False
+    pk: bool = False
+    name: str = None
+    method: str = None
+
+
+def _default_sql(raw: str) -> str:
+    """SQL of a DBML default: `expression` as is, 'text' as a string literal, numbers and true/false/null bare."""
+    if raw.startswith("`") and raw.endswith("`"):
+        return raw[1:-1]
+    if len(raw) > 1 and raw[0] == raw[-1] and raw[0] in "'\"":
+        return "'" + raw[1:-1].replace("\\'", "'").replace("'", "''") + "'"
+    return raw
+
+
+def _parse_index(line: str) -> DbmlIndex:
+    m = INDEX_RE.match(line)
+    if not m:
+        return None
+    columns = tuple(c.strip().strip('"') for c in (m.group(1) or m.group(2)).split(","))
+    options = {}
+    for option in re.split(r',\s*', m.group(3) or ""):
+        key, _, value = option.partition(":")
+        options[key.strip()] = value.strip().strip("'\"") or True
+    return DbmlIndex(columns, bool(options.get("unique")), bool(options.get("pk")),
+                     options.get("name"), options.get("type"))
+
+
+def _parse_dbml(schema_file: str):
+    """(tables, indexes) of a DBML file, see parse_dbml_schema and parse_dbml_indexes."""
+    tables = {}
+    indexes = {}
+    current_table = None
+    in_indexes = False
+    #a type is a name, with (length) or (precision, scale), and [] for arrays
+    column_re = re.compile(r'^\s*"([^"]+)"\s+([\w]+(?:\([\d,\s]*\))?(?:\[\])*)(?:\s+\[(.+)\])?')
+    constraint_split_re = re.compile(r',\s*')
+
+    with open(schema_file, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    for line in lines:
+        line = line.strip()
+        if line.startswith("Table "):
+            # Get table name inside quotes
+            m = re.match(r'Table\s+"([^"]+)"\s*{', line)
+            if m:
+                current_table = m.group(1)
+                tables[current_table] = {}
+                indexes[current_table] = []
+        elif current_table and in_indexes:
+            #the block's closing brace ends the indexes, not the table
+            if line.startswith("}"):
+                in_indexes = False
+            elif (index := _parse_index(line)) is not None:
+                indexes[current_table].append(index)
+        elif current_table and re.match(r'^indexes\s*{', line, re.IGNORECASE):
+            in_indexes = True
+        elif current_table and line.startswith("}"):
+            current_table = None
+        elif current_table:
+            # parse columns inside table
+            col_match = column_re.match(line)
+            if col_match:
+                col_name = col_match.group(1)
+                col_type = col_match.group(2)
+                raw_constraints = col_match.group(3)
+                constraints = {}
+
+                if raw_constraints:
+                    parts = constraint_split_re.split(raw_constraints)
+                    for p in parts:
+                        p = p.strip()
+                        if p == "pk" or p == "primary key":
+                            constraints["pk"] = True
+                        elif p == "not null":
+                            constraints["not null"] = True
+                        elif p == "increment":
+                            constraints["increment"] = True
+                        elif p.startswith("default:"):
+                            raw_default = p[len("default:"):].strip()
+                            constraints["default"] = raw_default.strip("`'\"")
+                            constraints["default_sql"] = _default_sql(raw_default)
+                        else:
+                            constraints[p] = True
+
+                tables[current_table][col_name] = {
+                    "type": col_type,
+                    "constraints": constraints
+                }
+
+    #a composite `(a, b) [pk]` index makes its columns the primary key
+    for table_name, table_indexes in indexes.items():
+        for index in table_indexes:
+            if index.pk:
+                for col in index.columns:
+                    if col in tables[table_name]:
+                        tables[table_name][col]["constraints"]["pk"] = True
+    return tables, indexes
+
+
+def parse_dbml_schema(schema_file: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Parses the DBML schema file and returns a dict of table schemas:
+    {
+      "table_name": {
+        "column_name": {
+          "type": "int4",
+          "constraints": {
+              "pk": True,
+              "not null": True,
+              "default": ...,
+              "default_sql": ...,
+              ...
+          }
+        },
+        ...
+      },
+      ...
+    }
+    """
+    return _parse_dbml(schema_file)[0]
+
+
+def parse_dbml_indexes(schema_file: str) -> Dict[str, List[DbmlIndex]]:
+    """The `Indexes { ... }` entries of every table of the DBML schema file, pk entries included."""
+    return _parse_dbml(schema_file)[1]
+
+
+def primary_keys(tables: Dict[str, Dict[str, Dict[str, Any]]], table_name: str) -> List[str]:
+    """Columns flagged [pk] for a table of a parsed DBML schema, in declaration order."""
+    columns = tables.get(table_name, {})
+    return [col for col, col_schema in columns.items() if col_schema["constraints"].get("pk")]
+
 
 class DBMLValidator:
     def __init__(self, output_folder: str, schema_file: str, invalid_folder: str):
@@ -10,75 +163,13 @@ class DBMLValidator:
         self.schema_file = schema_file
         self.invalid_folder = invalid_folder
         self.tables = self._parse_dbml_schema()
+        self._checks = {}
 
     def _parse_dbml_schema(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
-        """
-        Parses the DBML schema file and returns a dict of table schemas:
-        {
-          "table_name": {
-            "column_name": {
-              "type": "int4",
-              "constraints": {
-                  "pk": True,
-                  "not null": True,
-                  "default": ...,
-                  ...
-              }
-            },
-            ...
-          },
-          ...
-        }
-        """
-        tables = {}
-        current_table = None
-        column_re = re.compile(r'^\s*"([^"]+)"\s+([\w\[\]()]+)(?:\s+\[(.+)\])?')
-        constraint_split_re = re.compile(r',\s*')
-
-        with open(self.schema_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Table "):
-                # Get table name inside quotes
-                m = re.match(r'Table\s+"([^"]+)"\s*{', line)
-                if m:
-                    current_table = m.group(1)
-                    tables[current_table] = {}
-            elif current_table and line.startswith("}"):
-                current_table = None
-            elif current_table:
-                # parse columns inside table
-                col_match = column_re.match(line)
-                if col_match:
-                    col_name = col_match.group(1)
-                    col_type = col_match.group(2)
-                    raw_constraints = col_match.group(3)
-                    constraints = {}
-
-                    if raw_constraints:
-                        parts = constraint_split_re.split(raw_constraints)
-                        for p in parts:
-                            p = p.strip()
-                            if p == "pk":
-                                constraints["pk"] = True
-                            elif p == "not null":
-                                constraints["not null"] = True
-                            elif p == "increment":
-                                constraints["increment"] = True
-                            elif p.startswith("default:"):
-                                default_val = p[len("default:"):].strip()
-                                default_val = default_val.strip("`'\"")
-                                constraints["default"] = default_val
-                            else:
-                                constraints[p] = True
-
-                    tables[current_table][col_name] = {
-                        "type": col_type,
-                        "constraints": constraints
-                    }
-        return tables
+        return parse_dbml_schema(self.schema_file)
+
+    def primary_keys(self, table_name: str) -> List[str]:
+        return primary_keys(self.tables, table_name)
 
     def _validate_value(self, value: str, col_schema: Dict[str, Any]) -> (bool, str):
         """
@@ -91,30 +182,30 @@ class DBMLValidator:
 
         if not val or val == "NULL":
             if constraints.get("not null"):
-                return False, "Value is required (not null constraint)"
+                return False, NOT_NULL_ERROR
             else:
                 return True, ""
 
         # Type checks
         try:
-            if col_type in ["int4", "int2", "int8", "integer", "smallint", "bigint"]:
+            if col_type in INT_TYPES:
                 int(val)  # check if int
             elif col_type.startswith("numeric") or col_type.startswith("decimal"):
                 float(val)  # check if float
             elif col_type == "bool":
-                if val.lower() not in ["true", "false", "1", "0", "t", "f"]:
+                if val.lower() not in BOOL_VALUES:
                     return False, "Invalid boolean value"
             elif col_type == "date":
-                if not re.match(r"^\d{4}-\d{2}-\d{2}$", val):
+                if not DATE_RE.match(val):
                     return False, "Invalid date format (expected YYYY-MM-DD)"
             elif col_type in ("timestamptz", "timestamp"):
-                if not re.match(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}(:?\d{2})?)?$", val):
+                if not TIMESTAMP_RE.match(val):
                     return False, "Invalid timestamp format"
             
             elif col_type.startswith("text") or col_type == "text":
                 pass
             elif col_type.startswith("bpchar"):
-                max_len_match = re.match(r"bpchar\((\d+)\)", col_type)
+                max_len_match = BPCHAR_RE.match(col_type)
                 if max_len_match:
                     max_len = int(max_len_match.group(1))
                     if len(val) > max_len:
@@ -130,75 +221,167 @@ class DBMLValidator:
 
         return True, ""
 
-    def validate_single_csv(self, csv_path: str):
+    def _fast_check(self, col_type: str) -> Callable[[pd.Series], pd.Series]:
+        """
+        Whole-column check marking the non-empty values that are certainly valid for `col_type`.
+        Anything it doesn't accept goes through _validate_value, which has the final word and the message.
+        """
+        if col_type in INT_TYPES:
+            return lambda s: s.str.fullmatch(r"[+-]?[0-9]+")
+        if col_type.startswith("numeric") or col_type.startswith("decimal"):
+            return lambda s: s.str.fullmatch(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+        if col_type == "bool":
+            return lambda s: s.str.lower().isin(BOOL_VALUES)
+        if col_type == "date":
+            return lambda s: s.str.fullmatch(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+        if col_type in ("timestamptz", "timestamp"):
+            return lambda s: s.str.fullmatch(
+                r"[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}(\.[0-9]+)?([+-][0-9]{2}(:?[0-9]{2})?)?"
+            )
+        if not col_type.startswith("text") and col_type.startswith("bpchar"):
+            max_len_match = BPCHAR_RE.match(col_type)
+            if max_len_match:
+                max_len = int(max_len_match.group(1))
+                return lambda s: s.str.len() <= max_len
+        return lambda s: pd.Series(True, index=s.index)
+
+    def compile_table_checks(self, table_name: str) -> List[Tuple[str, Dict[str, Any], bool, Callable]]:
+        """(column, schema, not_null, fast_check) for every column of the table, built once per table."""
+        if table_name not in self._checks:
+            self._checks[table_name] = [
+                (col_name, col_schema, bool(col_schema.get("constraints", {}).get("not null")),
+                 self._fast_check(col_schema.get("type", "").lower()))
+                for col_name, col_schema in self.tables[table_name].items()
+            ]
+        return self._checks[table_name]
+
+    def validate_chunk(self, chunk: pd.DataFrame, table_name: str) -> pd.Series:
+        """Return the error message of every invalid row of a raw all-string chunk, indexed like the chunk."""
+        errors = {}
+        for col_name, col_schema, not_null, fast_check in self.compile_table_checks(table_name):
+            if col_name in chunk.columns:
+                values = chunk[col_name].fillna("").astype(str).str.strip()
+            else:
+                values = pd.Series("", index=chunk.index)
+
+            empty = (values == "") | (values == "NULL")
+            if not_null:
+                for idx in chunk.index[empty.to_numpy()]:
+                    errors.setdefault(idx, []).append(f"{col_name}: {NOT_NULL_ERROR}")
+
+            certain = fast_check(values).fillna(False).astype(bool)
+            uncertain = ~empty & ~certain
+            for idx, val in values[uncertain].items():
+                is_valid, err_msg = self._validate_value(val, col_schema)
+                if not is_valid:
+                    errors.setdefault(idx, []).append(f"{col_name}: {err_msg}")
+
+        #rows keep the error order of the schema columns
+        invalid_index = [idx for idx in chunk.index if idx in errors]
+        return pd.Series(["; ".join(errors[idx]) for idx in invalid_index], index=invalid_index, dtype=object)
+
+    def invalid_path(self, table_name: str) -> str:
+        return os.path.join(self.invalid_folder, f"temp_{table_name}.csv")
+
+    def validate_single_csv(self, csv_path: str, chunk_size: int = 100_000):
         """
         Validate a single CSV file against its table schema.
-        The CSV is expected to be named like "temp_tableName.csv"
+        The CSV is expected to be named like "temp_tableName.csv" (or "temp_tableName.csv.gz",
+        or a "temp_tableName.parquet" export, whose typed values are checked in their text form)
         Invalid rows will be written to invalid_folder with same filename
         plus an extra column "error"
+        The file is read in chunks and only invalid rows are written out, nothing is kept in memory.
+        Returns (rows, invalid_rows), or None if the file was skipped.
         """
         filename = os.path.basename(csv_path)
-        m = re.match(r"temp_(.+)\.csv", filename)
+        m = re.match(r"temp_(.+?)\.(csv(\.gz)?|parquet)$", filename)
         if not m:
             print(f"Skipping {filename}: filename does not match pattern 'temp_<table>.csv'")
             return
         table_name = m.group(1)
+        #invalid rows are always written uncompressed
+        filename = f"temp_{table_name}.csv"
 
         if table_name not in self.tables:
             print(f"Table '{table_name}' not found in DBML schema, skipping {filename}")
             return
 
         schema_cols = self.tables[table_name]
+        invalid_file_path = self.invalid_path(table_name)
+        invalid_count = 0
+        rows = 0
 
-        invalid_rows = []
-        valid_rows = []
-
-        with open(csv_path, newline="", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            csv_columns = reader.fieldnames
-
-            #check that CSV columns match the schema keys (allow extra columns with warn)
-            missing_cols = [c for c in schema_cols.keys() if c not in csv_columns]
-            if missing_cols:
-                print(f"Warning: CSV '{filename}' missing columns {missing_cols} compared to schema")
-
-            for row_num, row in enumerate(reader, 2):
-                row_errors = []
-                for col_name, col_schema in schema_cols.items():
-                    val = row.get(col_name, "").strip()
-                    is_valid, err_msg = self._validate_value(val, col_schema)
-                    if not is_valid:
-                        row_errors.append(f"{col_name}: {err_msg}")
-
-                if row_errors:
-                    #add error column
-                    row["error"] = "; ".join(row_errors)
-                    invalid_rows.append(row)
-                else:
-                    valid_rows.append(row)
-
-        if invalid_rows:
-            #write invalid rows to file
-            os.makedirs(self.invalid_folder, exist_ok=True)
-            invalid_file_path = os.path.join(self.invalid_folder, filename)
-            with open(invalid_file_path, "w", newline="", encoding="utf-8") as invalid_csvfile:
-                fieldnames = csv_columns + ["error"] if "error" not in csv_columns else csv_columns
-                writer = csv.DictWriter(invalid_csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(invalid_rows)
-            print(f"Found {len(invalid_rows)} invalid rows in {filename}. Written to {invalid_file_path}")
+        with metrics.stage("validate", table_name) as record:
+            if csv_path.endswith(".parquet"):
+                batches = read_parquet_chunks(csv_path, chunk_size)
+                reader = contextlib.closing(stringify_frame(batch) for batch in batches)
+            else:
+                reader = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+            with reader as chunks:
+                for chunk_num, chunk in enumerate(chunks):
+                    if chunk_num == 0:
+                        #check that CSV columns match the schema keys (allow extra columns with warn)
+                        missing_cols = [c for c in schema_cols.keys() if c not in chunk.columns]
+                        if missing_cols:
+                            print(f"Warning: CSV '{filename}' missing columns {missing_cols} compared to schema")
+
+                    rows += len(chunk)
+                    errors = self.validate_chunk(chunk, table_name)
+                    if errors.empty:
+                        continue
+
+                    #add error column, stream invalid rows to the file as they are found
+                    invalid = chunk.loc[errors.index].copy()
+                    invalid["error"] = errors
+                    if invalid_count == 0:
+                        os.makedirs(self.invalid_folder, exist_ok=True)
+                    invalid.to_csv(invalid_file_path, mode="w" if invalid_count == 0 else "a",
+                                   header=invalid_count == 0, index=False, lineterminator="\r\n")
+                    invalid_count += len(invalid)
+            record["rows_in"], record["rows_out"] = rows, rows - invalid_count
+            record["bytes"] = os.path.getsize(csv_path)
+
+        if invalid_count:
+            print(f"Found {invalid_count} invalid rows in {filename}. Written to {invalid_file_path}")
         else:
             print(f"All rows valid in {filename}")
+        return rows, invalid_count
 
-    def validate_all_csv(self):
+    def validate_all_csv(self, workers: int = 1):
         csv_files = glob.glob(os.path.join(self.output_folder, "temp_*.csv"))
+        csv_files += glob.glob(os.path.join(self.output_folder, "temp_*.csv.gz"))
+        csv_files += glob.glob(os.path.join(self.output_folder, "temp_*.parquet"))
         print(f"Found {len(csv_files)} CSV files to validate.")
 
-        for csv_file in csv_files:
-            self.validate_single_csv(csv_file)
+        if workers <= 1:
+            for csv_file in csv_files:
+                self.validate_single_csv(csv_file)
+            return
+
+        #each worker parses the DBML schema once and validates whole files
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(self.output_folder, self.schema_file, self.invalid_folder),
+        ) as pool:
+            for _, records in pool.map(_validate_in_worker, csv_files):
+                metrics.merge(records)
+
+
+_worker_validator = None
+
+
+def _init_worker(output_folder: str, schema_file: str, invalid_folder: str):
+    global _worker_validator
+    _worker_validator = DBMLValidator(output_folder, schema_file, invalid_folder)
+
+
+def _validate_in_worker(csv_path: str):
+    #stage timings go back to the parent with the result
+    return metrics.collect(_worker_validator.validate_single_csv, csv_path)
 
 
-def validate_dbml_csv_files(output_folder: str, schemas_folder: str, invalid_folder: str):
+def validate_dbml_csv_files(output_folder: str, schemas_folder: str, invalid_folder: str, workers: int = 1):
     validator = DBMLValidator(output_folder, schemas_folder, invalid_folder)
-    validator.validate_all_csv()
+    validator.validate_all_csv(workers)
 
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pandas as pd
+
+from csv_processor import CSVProcessor
+from db_session import DatabaseSession
+from postgresLoader import PostgresLoader
+from quarantine import Quarantine
+
+#bytes read at a time while looking for record boundaries
+SCAN_BLOCK = 1 << 24
+
+
+def record_boundaries(path, partition_bytes, block_size=SCAN_BLOCK):
+    """
+    Byte offsets where a record of the CSV starts, about every `partition_bytes`: the first one is the
+    end of the header. A newline only ends a record outside of a quoted value, which the count of `"`
+    read so far tells (`""` escapes keep it even), so the file is scanned once, a block at a time.
+    """
+    size = os.path.getsize(path)
+    boundaries = []
+    target = 0
+    with open(path, "rb") as f:
+        block_start = 0
+        #quote parity at the start of the block
+        quoted = False
+        while target < size:
+            block = f.read(block_size)
+            if not block:
+                break
+            #quote parity is tracked up to `counted` inside the block
+            counted, parity = 0, quoted
+            search = max(target - block_start, 0)
+            while 0 <= search < len(block):
+                newline = block.find(b"\n", search)
+                if newline == -1:
+                    break
+                parity ^= block.count(b'"', counted, newline) & 1
+                counted = newline
+                if not parity:
+                    boundary = block_start + newline + 1
+                    boundaries.append(boundary)
+                    target = boundary + partition_bytes
+                search = max(newline + 1, target - block_start)
+            quoted ^= block.count(b'"') & 1
+            block_start += len(block)
+    return [b for b in boundaries if b < size] or [size]
+
+
+def partition_ranges(path, partition_bytes):
+    """(header, [(start, end), ...]): the header line and the byte ranges of whole records after it."""
+    boundaries = record_boundaries(path, partition_bytes)
+    with open(path, "rb") as f:
+        header = f.read(boundaries[0])
+    ends = boundaries[1:] + [os.path.getsize(path)]
+    return header, [(start, end) for start, end in zip(boundaries, ends) if end > start]
+
+
+def read_partition(path, header, start, end):
+    """The raw bytes of one partition, behind the file's header so it parses like a file of its own."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return header + f.read(end - start)
+
+
+def transform_and_load_partition(schema_path, db_config, csv_path, table_name, header, start, end, part,
+                                 loader_options=None, quarantine_dir=None, csv_engine="auto"):
+    """
+    Transform one byte range of a raw file and append it to its table, in a worker process. The table
+    must exist already. Without `db_config` the partition is only transformed (benchmarks).
+    """
+    started = time.perf_counter()
+    processor = CSVProcessor(schema_path=schema_path, csv_engine=csv_engine)
+    #partitions of a table quarantine into their own files, combined once they are all done
+    processor.quarantine = Quarantine(quarantine_dir, part=part)
+    df = processor.process_partition(csv_path, read_partition(csv_path, header, start, end))
+
+    if db_config is not None:
+        #each worker COPYs over its own connection, the partitions load in parallel
+        session = DatabaseSession(**{**db_config, "pool_size": 1})
+        try:
+            PostgresLoader(session, **(loader_options or {})).append_dataframe(df, table_name)
+        finally:
+            session.dispose()
+    return table_name, len(df), time.perf_counter() - started
+
+
+def create_table_for(processor: CSVProcessor, loader: PostgresLoader, csv_path, table_name=None):
+    """
+    (Re)create the table of a raw file from its typed header, empty, before partitions append to it. Its keys
+    and indexes wait for `loader.finish_table` once every partition is in.
+    """
+    plan = processor._table_plan(csv_path)
+    empty = processor.transform(pd.DataFrame({column.name: pd.Series(dtype=str) for column in plan.columns}), plan)
+    loader.load_dataframe(empty, table_name or plan.table_name, finish=False)
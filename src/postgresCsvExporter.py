@@ -1,45 +1,250 @@
+import gzip
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 import pandas as pd
-import psycopg2
+from columnar import write_cursor_parquet
+import metrics
+
+EXPORT_FORMATS = ("csv", "parquet")
 
 class PostgresCsvExporter:
-    def __init__(self, user, password, host, port, database):
-        self.config = {
-            "dbname": database,
-            "user": user,
-            "password": password,
-            "host": host,
-            "port": port
-        }
+    def __init__(self, session):
+        #DatabaseSession shared with the other stages, exports run with its "export" settings
+        self.session = session
         self.conn = None
+        self._checkout = ExitStack()
 
     def connect(self):
+        #the leader connection stays checked out of the pool until close()
         try:
-            self.conn = psycopg2.connect(**self.config)
-            print("✅ Connected to PostgreSQL.")
+            self.conn = self._checkout.enter_context(self.session.raw("export"))
         except Exception as e:
             print("❌ Connection failed:", e)
             raise
 
-    def export_tables_to_csv(self, table_names, output_dir="."):
+    def output_path(self, table, output_dir, compress=False, file_format="csv"):
+        if file_format == "parquet":
+            #parquet pages are compressed already
+            return os.path.join(output_dir, f"temp_{table}.parquet")
+        return os.path.join(output_dir, f"temp_{table}.csv" + (".gz" if compress else ""))
+
+    def export_table_parquet(self, table, file_path, conn=None, batch_size=100_000):
+        """Write the table as parquet through a server-side cursor, one row group per batch."""
+        conn = conn or self.conn
+        with conn.cursor(name=f"export_{table}") as cur:
+            cur.itersize = batch_size
+            cur.execute(f'SELECT * FROM "{table}"')
+            write_cursor_parquet(cur, file_path, batch_size)
+        conn.commit()
+
+    def export_table_copy(self, table, file_path, compress=False, conn=None):
+        """Stream the table straight into the file with COPY ... TO STDOUT, never holding it in memory."""
+        conn = conn or self.conn
+        opener = gzip.open if compress else open
+        with opener(file_path, "wb") as f, conn.cursor() as cur:
+            cur.copy_expert(f'COPY (SELECT * FROM "{table}") TO STDOUT WITH CSV HEADER', f)
+        conn.commit()
+
+    def export_and_validate_table(self, table, validator, file_path, compress=False, conn=None, chunk_size=100_000):
+        """
+        Export and check DBML constraints in one pass: COPY output is parsed chunk by chunk as it
+        streams in, valid rows go to `file_path` and invalid ones to the validator's invalid folder.
+        Returns (rows, invalid_rows).
+        """
+        conn = conn or self.conn
+        read_fd, write_fd = os.pipe()
+        failure = []
+
+        def produce():
+            try:
+                with os.fdopen(write_fd, "wb") as sink, conn.cursor() as cur:
+                    cur.copy_expert(f'COPY (SELECT * FROM "{table}") TO STDOUT WITH CSV HEADER', sink)
+            except Exception as e:
+                failure.append(e)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        parse_error = None
+        try:
+            #closing the read end on error makes the COPY side fail fast instead of blocking
+            with os.fdopen(read_fd, "rb") as source:
+                counts = self._split_valid_rows(source, table, validator, file_path, compress, chunk_size)
+        except Exception as e:
+            parse_error = e
+        finally:
+            producer.join()
+        if failure or parse_error:
+            #a failed COPY leaves an empty or cut stream: no partial output or invalid rows stay behind
+            for path in (file_path, validator.invalid_path(table)):
+                if os.path.exists(path):
+                    os.remove(path)
+            #the database error is the cause, the parse error of its truncated stream only a symptom
+            if failure:
+                raise failure[0] from parse_error
+            raise parse_error
+        conn.commit()
+        return counts
+
+    def _split_valid_rows(self, source, table, validator, file_path, compress, chunk_size):
+        checked = table in validator.tables
+        if not checked:
+            print(f"Table '{table}' not found in DBML schema, exporting it unchecked")
+
+        rows = 0
+        invalid_rows = 0
+        invalid_file = None
+        opener = gzip.open if compress else open
+        try:
+            with opener(file_path, "wt", newline="", encoding="utf-8") as out:
+                reader = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk_size)
+                for chunk_num, chunk in enumerate(reader):
+                    errors = validator.validate_chunk(chunk, table) if checked else pd.Series(dtype=object)
+                    chunk.drop(index=errors.index).to_csv(out, header=chunk_num == 0, index=False)
+                    rows += len(chunk)
+                    if errors.empty:
+                        continue
+
+                    invalid = chunk.loc[errors.index].copy()
+                    invalid["error"] = errors
+                    if invalid_file is None:
+                        os.makedirs(validator.invalid_folder, exist_ok=True)
+                        invalid_file = open(validator.invalid_path(table), "w", newline="", encoding="utf-8")
+                    invalid.to_csv(invalid_file, header=invalid_rows == 0, index=False, lineterminator="\r\n")
+                    invalid_rows += len(invalid)
+        finally:
+            if invalid_file:
+                invalid_file.close()
+
+        if invalid_rows:
+            print(f"Found {invalid_rows} invalid rows in '{table}'. Written to {validator.invalid_path(table)}")
+        return rows, invalid_rows
+
+    def export_table_pandas(self, table, file_path, compress=False):
+        df = pd.read_sql(f'SELECT * FROM "{table}"', self.conn)
+        df.to_csv(file_path, index=False, compression="gzip" if compress else None)
+
+    def _export_one(self, table, file_path, method, compress, validator, file_format, conn=None):
+        """Write one table in the requested format, recorded as its `export` stage."""
+        with metrics.stage("export", table) as record:
+            if file_format == "parquet":
+                self.export_table_parquet(table, file_path, conn=conn)
+            elif validator is not None:
+                rows, invalid_rows = self.export_and_validate_table(table, validator, file_path, compress, conn=conn)
+                record["rows_in"], record["rows_out"] = rows, rows - invalid_rows
+            elif method == "copy":
+                self.export_table_copy(table, file_path, compress, conn=conn)
+            else:
+                self.export_table_pandas(table, file_path, compress)
+            record["bytes"] = os.path.getsize(file_path)
+
+    def _check_format(self, file_format, validator):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {file_format}")
+        if file_format == "parquet" and validator is not None:
+            raise ValueError("In-flight validation reads the COPY text stream, it needs the csv format")
+
+    def export_tables_to_csv(self, table_names, output_dir="../data/output", method="copy", compress=False,
+                             validator=None, file_format="csv"):
+        """
+        Export tables one by one. With a DBMLValidator, rows are checked while streaming (copy only).
+        Returns {table: error message} of the tables that failed.
+        """
         if not self.conn:
             self.connect()
+        if method not in ("copy", "pandas"):
+            raise ValueError(f"Unknown export method: {method}")
+        self._check_format(file_format, validator)
+        os.makedirs(output_dir, exist_ok=True)
 
+        failed = {}
         for table in table_names:
             table = table.strip()
             if not table:
                 continue
 
+            file_path = self.output_path(table, output_dir, compress, file_format)
             try:
                 print(f"⬇️ Exporting table '{table}'...")
-                df = pd.read_sql(f'SELECT * FROM "{table}"', self.conn)
-                file_path = f"../data/output/temp_{table}.csv"
-                df.to_csv(file_path, index=False)
+                self._export_one(table, file_path, method, compress, validator, file_format)
                 print(f"✅ Saved to '{file_path}'")
             except Exception as e:
+                #a failed statement aborts the transaction, the next tables need a clean one
+                self.conn.rollback()
+                if os.path.exists(file_path):
+                    os.remove(file_path)
                 print(f"❌ Failed to export table '{table}':", e)
+                failed[table] = str(e)
+        return failed
+
+    def _export_in_snapshot(self, snapshot, table, output_dir, compress, validator=None, file_format="csv"):
+        """Export one table on a pooled connection that reads the leader's snapshot."""
+        file_path = self.output_path(table, output_dir, compress, file_format)
+        start = time.perf_counter()
+        with self.session.raw("export") as conn:
+            try:
+                conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+                with conn.cursor() as cur:
+                    #must be the first statement of the transaction
+                    cur.execute("SET TRANSACTION SNAPSHOT %s", (snapshot,))
+                self._export_one(table, file_path, "copy", compress, validator, file_format, conn=conn)
+                return {"file": file_path, "seconds": time.perf_counter() - start,
+                        "bytes": os.path.getsize(file_path), "error": None}
+            except Exception as e:
+                conn.rollback()
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return {"file": None, "seconds": time.perf_counter() - start, "bytes": 0, "error": str(e)}
+            finally:
+                conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+    def export_tables_concurrently(self, table_names, output_dir="../data/output", workers=4, compress=False,
+                                   validator=None, file_format="csv"):
+        """
+        Export tables at the same time over connections of the session's pool.
+        Every export reads the snapshot exported by this exporter's connection, so all files
+        describe the same database state. With a DBMLValidator, rows are checked while streaming. Returns {table: {"file", "seconds", "bytes", "error"}}.
+        """
+        if not self.conn:
+            self.connect()
+        self._check_format(file_format, validator)
+        os.makedirs(output_dir, exist_ok=True)
+        tables = [t.strip() for t in table_names if t.strip()]
+        #the leader holds one connection of the pool for the whole export
+        workers = max(1, min(workers, self.session.capacity - 1))
+
+        #the leader transaction stays open until every worker has finished reading its snapshot
+        self.conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot()")
+            snapshot = cur.fetchone()[0]
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    table: executor.submit(
+                        self._export_in_snapshot, snapshot, table, output_dir, compress, validator, file_format
+                    )
+                    for table in tables
+                }
+                results = {table: future.result() for table, future in futures.items()}
+        finally:
+            self.conn.rollback()
+            self.conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+        for table, result in results.items():
+            if result["error"]:
+                print(f"❌ Failed to export table '{table}':", result["error"])
+            else:
+                print(f"✅ Saved '{table}' to '{result['file']}' "
+                      f"({result['bytes'] / 1024 / 1024:.1f} MB in {result['seconds']:.2f}s)")
+        return results
 
     def close(self):
+        """Give the leader connection back to the session's pool."""
         if self.conn:
-            self.conn.close()
-            print("Connection closed.")
+            self.conn = None
+            self._checkout.close()
 
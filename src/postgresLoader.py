@@ -1,11 +1,35 @@
+import io
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
+
+import metrics
+from parse_dbml_schema import INT_TYPES
+from table_ddl import compile_table
+
+#NULL marker written in the COPY payload, distinct from an empty string
+COPY_NULL = '\\N'
 
 class PostgresLoader:
-    def __init__(self, user, password, host, port, database):
-        self.engine = create_engine(
-            f'postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}'
-        )
+    def __init__(self, session, load_method='copy', load_modes=None, primary_keys=None, dbml_tables=None,
+                 dbml_indexes=None):
+        #DatabaseSession shared with the other stages, loads run with its "load" settings
+        self.session = session
+        if load_method not in ('copy', 'to_sql'):
+            raise ValueError(f"Unknown load method: {load_method}")
+        #copy streams a CSV buffer through COPY FROM STDIN, to_sql sends INSERT batches
+        self.load_method = load_method
+        #per table: replace (DROP+CREATE), append, or upsert merged on primary_keys[table]
+        self.load_modes = load_modes or {}
+        self.primary_keys = primary_keys or {}
+        for table_name, mode in self.load_modes.items():
+            if mode == 'upsert' and not self.primary_keys.get(table_name):
+                raise ValueError(f"Table '{table_name}' uses load_mode upsert but has no primary key")
+        #parsed DBML schema (parse_dbml_schema, parse_dbml_indexes): exact column types, defaults, keys and
+        #indexes of the tables it describes; tables it does not describe get their header types only
+        self.dbml_tables = dbml_tables or {}
+        self.dbml_indexes = dbml_indexes or {}
+        #replace-mode tables bulk loaded without constraints, waiting for finish_table
+        self._pending = {}
 
     def _map_strtype_to_postgres(self, col_type: str) -> str:
         """Map string type from header to PostgreSQL data type."""
@@ -23,12 +47,20 @@ class PostgresLoader:
         else:
             return 'TEXT'
 
-    def load_dataframe(self, df: pd.DataFrame, table_name: str):
-        columns = df.columns.tolist()
+    def table_ddl(self, table_name: str, cols_and_types):
+        """TableDDL of a table from its (name, header type) columns and its DBML schema, when it has one."""
+        return compile_table(table_name, cols_and_types, self.dbml_tables.get(table_name),
+                             self.dbml_indexes.get(table_name))
+
+    def _split_header(self, df: pd.DataFrame, table_name: str = None):
+        """
+        Split `name:Type` headers into (name, pg_type) pairs and the bare column names. With `table_name`
+        the types are the exact ones of the table's DDL.
+        """
         cols_and_types = []
         new_col_names = []
 
-        for col in columns:
+        for col in df.columns.tolist():
             if ':' in col:
                 name, col_type = col.split(':', 1)
                 pg_type = self._map_strtype_to_postgres(col_type)
@@ -37,22 +69,176 @@ class PostgresLoader:
             else:
                 cols_and_types.append((col.strip(), 'TEXT'))
                 new_col_names.append(col.strip())
+        if table_name is not None:
+            ddl = self.table_ddl(table_name, cols_and_types)
+            cols_and_types = [(column.name, column.pg_type) for column in ddl.columns]
+        return cols_and_types, new_col_names
+
+    def load_dataframe(self, df: pd.DataFrame, table_name: str, finish=True):
+        """
+        (Re)create the table and load the frame. A replace-mode table is created UNLOGGED without keys or
+        NOT NULL and gets them once its rows are in; with `finish=False` that is left to finish_table, for
+        callers appending more chunks first.
+        """
+        cols_and_types, new_col_names = self._split_header(df)
+        load_mode = self.load_modes.get(table_name, 'replace')
+        ddl = self.table_ddl(table_name, cols_and_types)
+        cols_and_types = [(column.name, column.pg_type) for column in ddl.columns]
 
         #remove types
         df.columns = new_col_names
 
-
-        #CREATE TABLE statement dynamically
-        cols_sql = ', '.join([f"{name} {dtype}" for name, dtype in cols_and_types])        
-        with self.engine.begin() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS {table_name};"))
-            conn.execute(text(f"CREATE TABLE {table_name} ({cols_sql})"))
+        with metrics.stage("create", table_name), self.session.begin("load") as conn:
+            if load_mode == 'replace':
+                conn.execute(text(f"DROP TABLE IF EXISTS {table_name};"))
+                #no WAL, index or constraint upkeep during the COPY, finish_table adds them in one pass
+                conn.execute(text(ddl.create_sql(unlogged=True, constraints=False)))
+            elif load_mode == 'append':
+                conn.execute(text(ddl.create_sql(if_not_exists=True)))
+                for statement in ddl.index_sql():
+                    conn.execute(text(statement))
+            else:
+                keys = self.primary_keys[table_name]
+                ddl = ddl._replace(primary_key=keys)
+                conn.execute(text(ddl.create_sql(if_not_exists=True)))
+                #tables first created by a replace run have no key ON CONFLICT could use
+                conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {table_name}_upsert_key ON {table_name} ({', '.join(keys)})"))
+                for statement in ddl.index_sql():
+                    conn.execute(text(statement))
+        if load_mode == 'replace':
+            self._pending[table_name] = ddl
 
         #insert into PostgreSQL
-        df.to_sql(table_name, self.engine, if_exists='append', index=False)
+        self._write(df, table_name, cols_and_types)
+        if finish:
+            self.finish_table(table_name)
+
+        source = "the DBML schema" if table_name in self.dbml_tables else "header types"
+        print(f"✅ Loaded DataFrame into table '{table_name}' ({load_mode}) with schema from {source}.")
+
+    def append_dataframe(self, df: pd.DataFrame, table_name: str):
+        """Insert into a table already created by load_dataframe."""
+        cols_and_types, new_col_names = self._split_header(df, table_name)
+        df.columns = new_col_names
+        self._write(df, table_name, cols_and_types)
+
+    def finish_table(self, table_name: str):
+        """
+        NOT NULL, primary key and indexes of a table bulk loaded by load_dataframe, built in one pass over
+        its rows instead of row by row, then SET LOGGED. Tables not waiting for it are left alone.
+        """
+        ddl = self._pending.pop(table_name, None)
+        if ddl is None:
+            return
+        #index builds use the load stage's maintenance_work_mem
+        with metrics.stage("constraints", table_name), self.session.begin("load") as conn:
+            for statement in ddl.constraint_sql() + ddl.index_sql():
+                conn.execute(text(statement))
+            conn.execute(text(f"ALTER TABLE {table_name} SET LOGGED"))
+
+    def _write(self, df: pd.DataFrame, table_name: str, cols_and_types):
+        with metrics.stage("load", table_name, rows_in=len(df)) as record:
+            if self.load_modes.get(table_name) == 'upsert':
+                self.upsert_dataframe(df, table_name, cols_and_types)
+            else:
+                self._insert(df, table_name, cols_and_types)
+            record["rows_out"] = len(df)
+
+    def upsert_dataframe(self, df: pd.DataFrame, table_name: str, cols_and_types):
+        """Load into an unlogged staging table, then merge into the target with INSERT ... ON CONFLICT."""
+        keys = self.primary_keys[table_name]
+        staging = f"{table_name}_staging"
+        columns = [name for name, _ in cols_and_types]
+        updates = [name for name in columns if name not in keys]
+
+        #ON CONFLICT cannot touch the same row twice in one statement, the last row of a key wins
+        df = df.drop_duplicates(subset=keys, keep='last')
+
+        with self.session.begin("load") as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+            conn.execute(text(f"CREATE UNLOGGED TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS)"))
+        try:
+            self._insert(df, staging, cols_and_types)
+
+            cols_sql = ', '.join(columns)
+            if updates:
+                #rows that come back identical are left alone instead of being rewritten
+                on_conflict = (
+                    "DO UPDATE SET " + ', '.join(f"{name} = EXCLUDED.{name}" for name in updates)
+                    + f" WHERE ({', '.join(f'{table_name}.{name}' for name in updates)})"
+                    + f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{name}' for name in updates)})"
+                )
+            else:
+                on_conflict = "DO NOTHING"
+            with self.session.begin("load") as conn:
+                conn.execute(text(
+                    f"INSERT INTO {table_name} ({cols_sql}) SELECT {cols_sql} FROM {staging} "
+                    f"ON CONFLICT ({', '.join(keys)}) {on_conflict}"
+                ))
+        finally:
+            with self.session.begin("load") as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+
+    def _insert(self, df: pd.DataFrame, table_name: str, cols_and_types):
+        if self.load_method == 'copy':
+            self.copy_dataframe(df, table_name, cols_and_types)
+        else:
+            with self.session.begin("load") as conn:
+                df.to_sql(table_name, conn, if_exists='append', index=False)
+
+    def _copy_payload(self, df: pd.DataFrame, cols_and_types) -> io.StringIO:
+        """Serialize the frame as CSV text that COPY parses into the column types of the table."""
+        out = df.copy(deep=False)
+        for name, pg_type in cols_and_types:
+            dtype = out[name].dtype
+            #frames from CSVProcessor carry nullable Int64/Float64, datetime64 and category columns,
+            #which to_csv renders as COPY expects; only older object/float frames need fixing up
+            #NaN in an integer column makes it float and renders 1 as "1.0"
+            if pg_type.lower() in INT_TYPES and pd.api.types.is_float_dtype(dtype):
+                out[name] = out[name].astype('Int64')
+            #booleans land in TEXT or boolean columns, spell them the way INSERT parameters did
+            elif pd.api.types.is_bool_dtype(dtype) or (
+                dtype == object and pd.api.types.infer_dtype(out[name], skipna=True) == 'boolean'
+            ):
+                out[name] = out[name].map({True: 'true', False: 'false'})
+
+        buffer = io.StringIO()
+        out.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+        buffer.seek(0)
+        return buffer
+
+    def copy_dataframe(self, df: pd.DataFrame, table_name: str, cols_and_types):
+        """Bulk load with COPY FROM STDIN, in one transaction."""
+        buffer = self._copy_payload(df, cols_and_types)
+        columns = ', '.join(name for name, _ in cols_and_types)
+        #characters of the payload, the same as bytes for ASCII data
+        metrics.add("load", table_name, bytes=buffer.seek(0, io.SEEK_END))
+        buffer.seek(0)
+
+        #an error leaves the COPY uncommitted, the session rolls it back on release
+        with self.session.raw("load") as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                    buffer
+                )
+            conn.commit()
 
-        print(f"✅ Loaded DataFrame into table '{table_name}' with schema from header types.")
-        
     def load_all_dataframes(self, loader , processed_list ):
-        for table_name, dataframe in processed_list:
-            loader.load_dataframe(dataframe, table_name)
+        #parts of one table (film.part1.csv, film.part2.csv) load into it one after the other
+        loader.load_stream(processed_list)
+
+    def load_stream(self, chunks):
+        """
+        Load (table_name, chunk) pairs as they come: the first chunk of a table recreates it, the rest append.
+        Keys and indexes are built once the stream is done.
+        """
+        created = []
+        for table_name, chunk in chunks:
+            if table_name in created:
+                self.append_dataframe(chunk, table_name)
+            else:
+                self.load_dataframe(chunk, table_name, finish=False)
+                created.append(table_name)
+        for table_name in created:
+            self.finish_table(table_name)
@@ -0,0 +1,98 @@
+import glob
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+#share of a chunk's rows that may be quarantined; above it the types of table_format.yml are taken to be
+#wrong for the file and the table fails instead of loading what is left
+MAX_SHARE = 0.5
+
+
+def failed_casts(series: pd.Series) -> np.ndarray:
+    """Rows a caster left as their raw string: casters return the value unchanged when it does not convert."""
+    if isinstance(series.dtype, pd.StringDtype):
+        #every value stayed a string, e.g. `.apply` over a column where no value converted
+        return series.notna().to_numpy()
+    if series.dtype != object:
+        #a typed column (int64, float64, bool, datetime64) has nothing left uncast
+        return np.zeros(len(series), dtype=bool)
+    values = series.to_numpy(dtype=object)
+    return np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+
+
+class Quarantine:
+    """
+    Rows of a table with a value that could not be cast, set aside so the rest of the table loads.
+    Each table gets one file, `<folder>/<table>.csv`, holding the rows as they reached the cast (failing
+    values as read) and an `error` column naming the failing columns. Files are rewritten on the first
+    rows of each run and appended to for the following chunks. Without a folder nothing is set aside: the
+    rows stay in the frame and fail the load, as they did before quarantining.
+    Processes working on parts of the same table each write `<table>.part<n>.csv` instead, merged by
+    `combine` once every part is done.
+    """
+
+    def __init__(self, folder=None, part=None, max_share=MAX_SHARE):
+        self.folder = folder
+        self.part = part
+        self.max_share = max_share
+        self.counts = {}
+        #transform threads of the async pipeline share one quarantine, parts of a table share its file
+        self._lock = threading.Lock()
+
+    def path_for(self, table_name):
+        if not self.folder:
+            return None
+        suffix = f".part{self.part:05d}" if self.part is not None else ""
+        return os.path.join(self.folder, f"{table_name}{suffix}.csv")
+
+    def combine(self, table_name):
+        """Merge the part files of a table, in part order, into `<table>.csv`. Returns the rows merged."""
+        if not self.folder:
+            return 0
+        parts = sorted(glob.glob(os.path.join(glob.escape(self.folder), f"{glob.escape(table_name)}.part*.csv")))
+        rows = 0
+        with open(os.path.join(self.folder, f"{table_name}.csv"), "w", newline="", encoding="utf-8") as out:
+            for path in parts:
+                frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+                frame.to_csv(out, header=rows == 0, index=False)
+                rows += len(frame)
+                os.remove(path)
+        if not rows:
+            os.remove(os.path.join(self.folder, f"{table_name}.csv"))
+        return rows
+
+    def add(self, table_name, rows: pd.DataFrame, errors: pd.Series, total_rows: int) -> bool:
+        """
+        Set the failing rows of a chunk aside. Returns False without a folder, the rows are then only
+        reported. Raises ValueError once more than `max_share` of the chunk failed, after writing them.
+        """
+        by_column = errors.str.split("; ").explode().str.split(":", n=1).str[0].value_counts()
+        detail = ", ".join(f"{col}: {count}" for col, count in by_column.items())
+        if not self.folder:
+            logger.warning(f"{len(rows)} of {total_rows} rows of {table_name} have values that do not cast "
+                           f"({detail}), set quarantine_dir to set them aside instead of failing the load")
+            return False
+
+        metrics.add("quarantine", table_name, rows_out=len(rows))
+        path = self.path_for(table_name)
+        out = rows.copy()
+        out["error"] = errors
+        with self._lock:
+            first = table_name not in self.counts
+            self.counts[table_name] = self.counts.get(table_name, 0) + len(rows)
+            os.makedirs(self.folder, exist_ok=True)
+            out.to_csv(path, mode="w" if first else "a", header=first, index=False)
+
+        if len(rows) > self.max_share * total_rows:
+            raise ValueError(f"{len(rows)} of {total_rows} rows of {table_name} failed their cast ({detail}), "
+                             f"more than {self.max_share:.0%}: check its types in table_format.yml, "
+                             f"the rows are in {path}")
+        logger.warning(f"Quarantined {len(rows)} of {total_rows} rows of {table_name} ({detail}), written to {path}")
+        return True
@@ -0,0 +1,64 @@
+import bz2
+import gzip
+import lzma
+import os
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # .zst inputs are read through pyarrow's codec when zstandard is missing
+    zstandard = None
+
+from columnar import pa
+
+#compressed raw files (`film.csv.gz`), decompressed while they are read, never onto disk
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd"}
+#codecs pyarrow may decompress itself, off the GIL
+ARROW_CODECS = ("gzip", "bz2", "zstd")
+CSV_EXTENSIONS = (".csv",) + tuple(f".csv{ext}" for ext in COMPRESSIONS)
+
+
+def compression_of(path):
+    return COMPRESSIONS.get(os.path.splitext(path)[1])
+
+
+def open_raw(path):
+    """Binary stream of a raw file, decompressed on the fly."""
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, "rb")
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if zstandard is not None:
+        return zstandard.open(path, "rb")
+    if pa is not None and pa.Codec.is_available("zstd"):
+        return pa.input_stream(path, compression="zstd")
+    raise ImportError(f"Reading {path} needs zstandard or pyarrow: pip install zstandard")
+
+
+def arrow_source(path):
+    """Input of pyarrow's CSV reader: a memory map of a plain file, arrow's own codecs when it has them."""
+    compression = compression_of(path)
+    if compression is None:
+        return pa.memory_map(path)
+    #pyarrow has no xz codec, and builds may lack any of the others
+    if compression in ARROW_CODECS and pa.Codec.is_available(compression):
+        return pa.input_stream(path, compression=compression)
+    return open_raw(path)
+
+
+@contextmanager
+def csv_source(path):
+    """
+    What pandas.read_csv reads: the path of a plain file, which it memory-maps (`memory_map=` this
+    being a str), or a decompressing stream, closed on exit.
+    """
+    if compression_of(path) is None:
+        yield path
+        return
+    with open_raw(path) as stream:
+        yield stream
@@ -0,0 +1,172 @@
+from functools import partial
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+from PostgresCaster import PostgresCaster, DATE_FORMATS, TIMESTAMP_FORMATS, TIMESTAMPTZ_FORMATS, _record
+from series_formater import INT64_LIMIT, parse_floats, strptime_pattern, text_values
+
+TRUE_VALUES = ("y", "yes", "t", "true", "on", "1")
+FALSE_VALUES = ("n", "no", "f", "false", "off", "0")
+
+_INT_RE = r"\s*[+-]?[0-9]{1,18}\s*"
+_ZERO_OFFSET_RE = r"(?:[+-]00:?00|Z)"
+#values looked at to infer the format of a column
+INFER_SAMPLE = 1_000
+
+
+def _finish(series: pd.Series, parsed: np.ndarray, done: np.ndarray, scalar: Callable,
+            nulls_to_scalar: bool = False, infer: bool = False) -> pd.Series:
+    """Merge vectorized results with the scalar caster applied to every value the fast path left out."""
+    result = series.to_numpy(dtype=object, copy=True)
+    result[done] = parsed[done]
+    rest = ~done if nulls_to_scalar else ~done & series.notna().to_numpy()
+    if rest.any():
+        result[rest] = [scalar(v) for v in result[rest]]
+    out = pd.Series(result, index=series.index, name=series.name, dtype=object)
+    return out.infer_objects() if infer else out
+
+
+def _infer_format(series: pd.Series, formats: Iterable[str], utc: bool,
+                  pattern_for: Callable[[str], str | None] = strptime_pattern):
+    """Let a column's FormatOrder pick its format from a sample of the values, the first time only."""
+    infer = getattr(formats, "infer", None)
+    if infer is None or formats.pinned or formats.inferred is not None:
+        return
+    sample = series.dropna().head(INFER_SAMPLE)
+    if sample.empty:
+        return
+
+    def matches(fmt: str) -> int:
+        pattern = pattern_for(fmt)
+        if pattern is None:
+            return 0
+        shaped = sample[sample.str.fullmatch(pattern, na=False).to_numpy(dtype=bool)]
+        return int(pd.to_datetime(shaped, format=fmt, errors="coerce", utc=utc).notna().sum())
+
+    infer(matches)
+
+
+def _pydatetimes(attempt: pd.Series) -> np.ndarray:
+    return np.asarray(attempt.dt.to_pydatetime(), dtype=object)
+
+
+def _parse_formats(series: pd.Series, formats: Iterable[str], utc: bool,
+                   pattern_for: Callable[[str], str | None] = strptime_pattern,
+                   convert: Callable[[pd.Series], np.ndarray] = _pydatetimes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Try each format in order on the rows not parsed yet, like the scalar loop does per value.
+    A column's FormatOrder infers its format first, so a clean column is parsed in one call.
+    Stops once every value is parsed; the format parsing the most rows is recorded in a FormatOrder.
+    Each attempt is `convert`ed to Python objects at its own resolution: pandas parses dates outside
+    the nanosecond range (9999-12-31, 1500-01-01) at a coarser one, which no single column can hold.
+    """
+    series = text_values(series)
+    _infer_format(series, formats, utc, pattern_for)
+    parsed = np.empty(len(series), dtype=object)
+    done = np.zeros(len(series), dtype=bool)
+    present = series.notna().to_numpy()
+    best, best_count = None, 0
+    #a FormatOrder is reordered by _record, iterate over a snapshot
+    for fmt in tuple(formats):
+        if not (present & ~done).any():
+            break
+        pattern = pattern_for(fmt)
+        if pattern is None:
+            continue
+        shaped = series.str.fullmatch(pattern, na=False).to_numpy(dtype=bool) & ~done
+        if not shaped.any():
+            continue
+        attempt = pd.to_datetime(series[shaped], format=fmt, errors="coerce", utc=utc)
+        ok = attempt.notna().to_numpy()
+        positions = np.flatnonzero(shaped)[ok]
+        parsed[positions] = convert(attempt[ok])
+        done[positions] = True
+        if len(positions) > best_count:
+            best, best_count = fmt, len(positions)
+    if best is not None:
+        _record(formats, best)
+    return parsed, done
+
+
+class SeriesCaster:
+    """Whole-column versions of the PostgresCaster fixers, returning the same values as `.apply`."""
+
+    @staticmethod
+    def to_boolean(series: pd.Series) -> pd.Series:
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return series
+        lowered = text_values(series).str.lower()
+        is_true = lowered.isin(TRUE_VALUES).to_numpy(dtype=bool)
+        is_false = lowered.isin(FALSE_VALUES).to_numpy(dtype=bool)
+        parsed = np.where(is_true, True, False).astype(object)
+        return _finish(series, parsed, is_true | is_false, PostgresCaster.to_boolean, infer=True)
+
+    @staticmethod
+    def to_integer(series: pd.Series) -> pd.Series:
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return series
+        parsed = np.empty(len(series), dtype=object)
+        if pd.api.types.is_float_dtype(series.dtype):
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                done = np.isfinite(values) & (np.abs(values) < INT64_LIMIT)
+            parsed[done] = np.trunc(values[done]).astype(np.int64).astype(object)
+        else:
+            text = text_values(series)
+            done = text.str.fullmatch(_INT_RE, na=False).to_numpy(dtype=bool)
+            if done.any():
+                parsed[done] = text[done].str.strip().to_numpy(dtype=object).astype(np.int64).astype(object)
+        return _finish(series, parsed, done, PostgresCaster.to_integer, infer=True)
+
+    @staticmethod
+    def to_float(series: pd.Series) -> pd.Series:
+        if pd.api.types.is_float_dtype(series.dtype):
+            return series
+        if pd.api.types.is_integer_dtype(series.dtype):
+            #nullable Int64 columns (parquet) keep their NULLs as NaN
+            return pd.Series(series.to_numpy(dtype=np.float64, na_value=np.nan), index=series.index, name=series.name)
+        values, done = parse_floats(series)
+        return _finish(series, values.astype(object), done, PostgresCaster.to_float, infer=True)
+
+    @staticmethod
+    def to_date(series: pd.Series, formats: Iterable[str] = DATE_FORMATS) -> pd.Series:
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            #typed input (parquet): keep the calendar day
+            return pd.Series(series.dt.date.to_numpy(dtype=object), index=series.index, name=series.name)
+        dates, done = _parse_formats(series, formats, utc=False,
+                                     convert=lambda attempt: attempt.dt.date.to_numpy(dtype=object))
+        return _finish(series, dates, done, partial(PostgresCaster.to_date, formats=formats))
+
+    @staticmethod
+    def to_timestamp(series: pd.Series, formats: Iterable[str] = TIMESTAMP_FORMATS) -> pd.Series:
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series
+        parsed, done = _parse_formats(series, formats, utc=False)
+        return _finish(series, parsed, done,
+                       partial(PostgresCaster.to_timestamp, formats=formats))
+
+    @staticmethod
+    def to_timestamptz(series: pd.Series, formats: Iterable[str] = TIMESTAMPTZ_FORMATS) -> pd.Series:
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series if series.dt.tz is not None else series.dt.tz_localize("UTC")
+        normalized = text_values(series).str.replace("+00", "+0000", regex=False)
+
+        def zero_offset_pattern(fmt: str) -> str | None:
+            #only UTC offsets go through pandas: strptime keeps any other offset as its own tzinfo
+            pattern = strptime_pattern(fmt.replace("%z", ""))
+            return pattern + _ZERO_OFFSET_RE if pattern is not None and "%z" in fmt else pattern
+
+        parsed, done = _parse_formats(normalized, formats, utc=True, pattern_for=zero_offset_pattern)
+        return _finish(series, parsed, done,
+                       partial(PostgresCaster.to_timestamptz, formats=formats))
+
+    @staticmethod
+    def to_string(series: pd.Series) -> pd.Series:
+        values = series.to_numpy(dtype=object)
+        if isinstance(series.dtype, pd.StringDtype):
+            done = series.notna().to_numpy()
+        else:
+            done = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+        return _finish(series, values, done, PostgresCaster.to_string, nulls_to_scalar=True)
@@ -0,0 +1,186 @@
+import re
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from formater import Formater
+
+SeriesParser = Callable[[pd.Series], pd.Series]
+
+#regex pieces mirroring what datetime.strptime accepts for each directive
+_DIRECTIVE_PATTERNS = {
+    "%Y": r"\d{4}",
+    "%m": r"(?:1[0-2]|0[1-9]|[1-9])",
+    "%d": r"(?:3[01]|[12]\d|0[1-9]|[1-9]| [1-9])",
+    "%H": r"(?:2[0-3]|[0-1]\d|\d)",
+    "%M": r"(?:[0-5]\d|\d)",
+    "%S": r"(?:6[0-1]|[0-5]\d|\d)",
+    "%f": r"\d{1,6}",
+    "%z": r"(?:[+-]\d\d:?[0-5]\d(?::?[0-5]\d(?:\.\d{1,6})?)?|Z)",
+    "%%": "%",
+}
+
+_FLOAT_RE = r"\s*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\s*"
+#floats at or past this magnitude do not fit int64, the scalar casters keep them exact
+INT64_LIMIT = 2.0 ** 63
+#what infer_dtype calls object columns holding at least one string, the ones .str can read
+_TEXT_KINDS = ("string", "empty", "mixed", "mixed-integer")
+
+
+def strptime_pattern(format: str) -> str | None:
+    """Build a regex accepting the same shapes as strptime(format), or None if unsupported."""
+    parts = []
+    i = 0
+    while i < len(format):
+        char = format[i]
+        if char == "%":
+            directive = format[i:i + 2]
+            if directive not in _DIRECTIVE_PATTERNS:
+                return None
+            parts.append(_DIRECTIVE_PATTERNS[directive])
+            i += 2
+        elif char.isspace():
+            parts.append(r"\s+")
+            while i < len(format) and format[i].isspace():
+                i += 1
+        else:
+            parts.append(re.escape(char))
+            i += 1
+    return "".join(parts)
+
+
+def text_values(series: pd.Series) -> pd.Series:
+    """
+    `series` when .str can read it. An object column out of a parse step (ToInt) may hold no string
+    at all: it is then read as all missing, so every value goes to the scalar path.
+    """
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in _TEXT_KINDS:
+        return pd.Series(None, index=series.index, name=series.name, dtype=object)
+    return series
+
+
+def parse_floats(series: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """Parse the plain decimal strings of a column at once, returning (values, parsed_mask)."""
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        #typed input (parquet, an earlier ToFloat step) holds numbers already
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, np.isfinite(values)
+    series = text_values(series)
+    values = np.full(len(series), np.nan)
+    mask = series.str.fullmatch(_FLOAT_RE, na=False).to_numpy(dtype=bool)
+    if mask.any():
+        #object -> float64 goes through float() so results are identical to the scalar path
+        values[mask] = series.to_numpy(dtype=object)[mask].astype(np.float64)
+    return values, mask
+
+
+def round_half_exact(values: np.ndarray, decimal_places: int) -> np.ndarray:
+    """np.round, with values near a rounding tie re-rounded by the builtin round() to match it exactly."""
+    rounded = np.round(values, decimal_places)
+    scaled = values * 10.0 ** decimal_places
+    with np.errstate(invalid="ignore"):
+        near_tie = (np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6) | (np.abs(scaled) > 1e15)
+    near_tie &= np.isfinite(values)
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), decimal_places)
+    return rounded
+
+
+class SeriesFormater:
+    """Column-at-a-time counterparts of the Formater parsers used in `parse` steps."""
+
+    @staticmethod
+    def replace(to_replace: str, replace_by: str) -> SeriesParser:
+        def parse(series: pd.Series) -> pd.Series:
+            return series.str.replace(to_replace, replace_by, regex=False)
+        return parse
+
+    @staticmethod
+    def regex_replace(to_replace: str, replace_by: str) -> SeriesParser:
+        #a compiled pattern keeps python `re` semantics, whatever the string backend is
+        pattern = re.compile(to_replace)
+
+        def parse(series: pd.Series) -> pd.Series:
+            return series.str.replace(pattern, replace_by, regex=True)
+        return parse
+
+    @staticmethod
+    def to_upper() -> SeriesParser:
+        def parse(series: pd.Series) -> pd.Series:
+            return series.str.upper()
+        return parse
+
+    @staticmethod
+    def to_int() -> SeriesParser:
+        def parse(series: pd.Series) -> pd.Series:
+            if pd.api.types.is_integer_dtype(series.dtype):
+                return series
+            floats, mask = parse_floats(series)
+            #past int64 (1e20) the scalar int(float()) stays exact where astype would wrap
+            with np.errstate(invalid="ignore"):
+                mask = mask & (np.abs(floats) < INT64_LIMIT)
+            present = series.notna().to_numpy()
+            result = series.to_numpy(dtype=object, copy=True)
+            #nulls stay None like the scalar step, NaN would turn the ints around them into floats
+            result[~present] = None
+            result[mask] = np.trunc(floats[mask]).astype(np.int64).astype(object)
+            rest = ~mask & present
+            result[rest] = [Formater.to_int(v) for v in result[rest]]
+            out = pd.Series(result, index=series.index, name=series.name, dtype=object)
+            #infer_objects turns ints next to None into floats, only a column without nulls becomes int64
+            return out.infer_objects() if present.all() else out
+        return parse
+
+    @staticmethod
+    def to_float(decimal_places: int = 2) -> SeriesParser:
+        scalar = Formater.to_float(decimal_places)
+
+        def parse(series: pd.Series) -> pd.Series:
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                return pd.Series(round_half_exact(values, decimal_places), index=series.index, name=series.name)
+            values, mask = parse_floats(series)
+            rest = np.flatnonzero(~mask)
+            raw = series.to_numpy(dtype=object)
+            for i in rest:
+                value = raw[i]
+                parsed = None if pd.isna(value) else scalar(value)
+                values[i] = np.nan if parsed is None else parsed
+            values[mask] = round_half_exact(values[mask], decimal_places)
+            return pd.Series(values, index=series.index, name=series.name)
+        return parse
+
+    @staticmethod
+    def to_datetime(format: str) -> SeriesParser:
+        scalar = Formater.to_datetime(format)
+        #strptime keeps a parsed %z offset that replace() then overrides, so those formats stay scalar
+        pattern = None if "%z" in format else strptime_pattern(format)
+
+        def parse(series: pd.Series) -> pd.Series:
+            result = series.to_numpy(dtype=object, copy=True)
+            present = series.notna().to_numpy() & (series != "").to_numpy(dtype=bool, na_value=False)
+            result[~present] = None
+            done = np.zeros(len(series), dtype=bool)
+            if pattern is not None:
+                shaped = series.str.fullmatch(pattern, na=False).to_numpy(dtype=bool) & present
+                parsed = pd.to_datetime(series[shaped], format=format, errors="coerce", utc=True)
+                ok = parsed.notna().to_numpy()
+                idx = np.flatnonzero(shaped)[ok]
+                result[idx] = _isoformat_utc(parsed[ok])
+                done[idx] = True
+            rest = present & ~done
+            result[rest] = [scalar(v) for v in result[rest]]
+            return pd.Series(result, index=series.index, name=series.name)
+        return parse
+
+
+def _isoformat_utc(parsed: pd.Series) -> np.ndarray:
+    """Render UTC timestamps exactly like datetime.isoformat() does."""
+    if parsed.empty:
+        return np.empty(0, dtype=object)
+    whole = parsed.dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    fractional = parsed.dt.strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+    has_micro = (parsed.dt.microsecond != 0).to_numpy()
+    return np.where(has_micro, fractional.to_numpy(dtype=object), whole.to_numpy(dtype=object))
+
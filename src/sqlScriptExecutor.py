@@ -1,16 +1,205 @@
-from sqlalchemy import create_engine, text
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from sqlalchemy import text
+
+import metrics
+
+_IDENTIFIER = r"((?:\"[^\"]+\"|\w+)(?:\.(?:\"[^\"]+\"|\w+))?)"
+#statements that write a table or view: the target is the name right after the keyword
+_WRITE_RE = re.compile(
+    r"\b(?:CREATE\s+(?:OR\s+REPLACE\s+)?(?:UNLOGGED\s+|TEMP(?:ORARY)?\s+)?(?:RECURSIVE\s+)?"
+    r"(?:TABLE|VIEW|MATERIALIZED\s+VIEW)(?:\s+IF\s+NOT\s+EXISTS)?"
+    r"|INTO(?:\s+(?:TEMP(?:ORARY)?|UNLOGGED))?(?:\s+TABLE)?|UPDATE|DELETE\s+FROM"
+    r"|(?:DROP|ALTER)\s+(?:TABLE|VIEW|MATERIALIZED\s+VIEW)(?:\s+IF\s+EXISTS)?"
+    r"|REFRESH\s+MATERIALIZED\s+VIEW(?:\s+CONCURRENTLY)?|TRUNCATE(?:\s+TABLE)?)\s+" + _IDENTIFIER,
+    re.IGNORECASE,
+)
+#an index writes the table after ON
+_INDEX_RE = re.compile(
+    r"\bCREATE\s+(?:UNIQUE\s+)?INDEX\b[^;]*?\bON\s+(?:ONLY\s+)?" + _IDENTIFIER, re.IGNORECASE | re.DOTALL
+)
+#DDL whose target the patterns above do not know (DROP INDEX, CREATE FUNCTION, GRANT...) may touch anything
+_DDL_RE = re.compile(
+    r"^\s*(?:CREATE|ALTER|DROP|COMMENT|GRANT|REVOKE|REFRESH|REINDEX|CLUSTER|LOCK|VACUUM|ANALYZE)\b",
+    re.IGNORECASE,
+)
+#tables a statement reads; also catches a few column names (EXTRACT(x FROM col)), which only
+#makes the grouping more conservative
+_READ_RE = re.compile(r"\b(?:FROM|JOIN|USING)\s+" + _IDENTIFIER, re.IGNORECASE)
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_DOLLAR_TAG_RE = re.compile(r"\$(\w*)\$")
+#`ON CONFLICT ... DO UPDATE SET` is not a write to a table called "set"
+_NOT_TABLES = {"set", "select", "lateral", "only"}
+
+
+def table_name(identifier: str) -> str:
+    """`public."Film"` -> `film`: tables are compared without schema, quotes or case."""
+    return identifier.split(".")[-1].strip('"').lower()
+
+
+def split_statements(sql_script: str) -> list:
+    """Split a script on the semicolons outside of strings, quoted names, comments and $$ bodies."""
+    statements = []
+    start = 0
+    i = 0
+    n = len(sql_script)
+    while i < n:
+        char = sql_script[i]
+        if char in ("'", '"'):
+            #'' and "" escape the quote inside, the scan just resumes after the pair
+            end = sql_script.find(char, i + 1)
+            i = n if end == -1 else end + 1
+        elif sql_script.startswith("--", i):
+            end = sql_script.find("\n", i)
+            i = n if end == -1 else end + 1
+        elif sql_script.startswith("/*", i):
+            end = sql_script.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+        elif char == "$" and (m := _DOLLAR_TAG_RE.match(sql_script, i)):
+            end = sql_script.find(m.group(0), m.end())
+            i = n if end == -1 else end + len(m.group(0))
+        elif char == ";":
+            statements.append(sql_script[start:i])
+            start = i = i + 1
+        else:
+            i += 1
+    statements.append(sql_script[start:])
+    #drop empty pieces and comment-only leftovers
+    return [s.strip() for s in statements if _COMMENT_RE.sub("", s).strip()]
+
+
+class SqlStatement(NamedTuple):
+    index: int
+    sql: str
+    reads: frozenset
+    writes: frozenset
+    #DDL the parser cannot place: it is grouped with everything else
+    opaque: bool = False
+
+    @property
+    def summary(self):
+        return " ".join(_COMMENT_RE.sub(" ", self.sql).split())[:60]
+
+
+def parse_statements(sql_script: str) -> list:
+    statements = []
+    for index, sql in enumerate(split_statements(sql_script)):
+        code = _COMMENT_RE.sub(" ", sql)
+        writes = {table_name(m.group(1)) for m in _WRITE_RE.finditer(code)} - _NOT_TABLES
+        writes |= {table_name(m.group(1)) for m in _INDEX_RE.finditer(code)}
+        reads = {table_name(m.group(1)) for m in _READ_RE.finditer(code)} - _NOT_TABLES - writes
+        opaque = not writes and bool(_DDL_RE.match(code))
+        statements.append(SqlStatement(index, sql, frozenset(reads), frozenset(writes), opaque))
+    return statements
+
+
+def written_tables(sql_script: str) -> set:
+    """Names of the tables and views a script creates, fills, changes or drops."""
+    return set().union(*(s.writes for s in parse_statements(sql_script)))
+
+
+def statement_groups(statements: list) -> list:
+    """
+    Statements connected through the tables they touch, each group in script order.
+    Groups share no table, so they can run at the same time. A statement touching no known table
+    (SET, DO blocks, function calls) or DDL the parser cannot place may depend on anything: the
+    whole script is then one group.
+    """
+    if any(s.opaque or not (s.reads or s.writes) for s in statements):
+        return [statements] if statements else []
+
+    #union-find over statements that share a table
+    parent = list(range(len(statements)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner = {}
+    for i, statement in enumerate(statements):
+        for table in statement.reads | statement.writes:
+            if table in owner:
+                parent[find(i)] = find(owner[table])
+            else:
+                owner[table] = i
+
+    groups = {}
+    for i, statement in enumerate(statements):
+        groups.setdefault(find(i), []).append(statement)
+    return list(groups.values())
+
+
+def written_by(groups: list) -> set:
+    return set().union(*(s.writes for group in groups for s in group))
+
+
+def group_sources(group: list) -> set:
+    """Tables a group reads without producing them itself, i.e. the loaded tables it depends on."""
+    written = written_by([group])
+    return set().union(*(s.reads for s in group)) - written
+
 
 class SqlScriptExecutor:
-    def __init__(self, user, password, host, port, database):
-        self.engine = create_engine(
-            f'postgresql+psycopg2://{user}:{password}@{host}:{port}/{database}'
-        )
+    def __init__(self, session, workers=4):
+        self.session = session
+        #one pooled connection per group running at the same time, never more than the pool holds
+        self.workers = max(1, min(workers, session.capacity))
 
-    def execute_sql_file(self, filepath: str):
-        """Executes the SQL statements from a .sql file."""
+    def plan_file(self, filepath: str, changed_tables=None) -> list:
+        """
+        The statement groups of a script. With `changed_tables`, only the groups reading one of
+        them (directly or through a table the group builds from it) are kept, and the groups reading
+        no table at all (INSERT ... VALUES seeds, tables built from constants): nothing tells whether
+        their output is still there.
+        """
         with open(filepath, 'r') as file:
-            sql_script = file.read()
+            groups = statement_groups(parse_statements(file.read()))
+        if changed_tables is None:
+            return groups
+        changed = {table_name(t) for t in changed_tables}
+        return [group for group in groups if not group_sources(group) or group_sources(group) & changed]
+
+    def _run_group(self, group: list, label: str):
+        """Run one group in order, in one transaction: it commits whole or not at all."""
+        start = time.perf_counter()
+        with self.session.begin("sql") as conn:
+            for statement in group:
+                with metrics.stage("sql", detail=f"{label} #{statement.index + 1} {statement.summary}"):
+                    conn.execute(text(statement.sql))
+        return time.perf_counter() - start
+
+    def execute_sql_file(self, filepath: str, changed_tables=None):
+        """
+        Executes the SQL statements from a .sql file: independent statement groups run concurrently on
+        pooled connections, each in its own transaction. Every group is attempted; failed ones are
+        rolled back and reported together. `changed_tables` restricts the run to the groups reading
+        those tables. Returns the tables written by the groups that ran.
+        """
+        groups = self.plan_file(filepath, changed_tables)
+        label = os.path.basename(filepath)
+        if not groups:
+            print(f"⏭️ No statement of {label} reads a changed table")
+            return set()
+
+        errors = {}
+        with metrics.stage("sql", detail=label), ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._run_group, group, label): group for group in groups}
+            for future, group in futures.items():
+                tables = sorted(written_by([group])) or [group[0].summary]
+                try:
+                    seconds = future.result()
+                    print(f"✅ {label}: {len(group)} statement(s) for {', '.join(tables)} in {seconds:.2f}s")
+                except Exception as e:
+                    errors[', '.join(tables)] = f"{type(e).__name__}: {e}"
+                    print(f"❌ {label}: rolled back the statements for {', '.join(tables)}: {e}")
 
-        with self.engine.connect() as conn:
-            conn.execute(text(sql_script))
-            print(f"✅ Executed SQL script from: {filepath}")
+        if errors:
+            raise RuntimeError(f"{len(errors)} statement group(s) of {label} failed: {'; '.join(errors)}")
+        print(f"✅ Executed SQL script from: {filepath}")
+        return written_by(groups)
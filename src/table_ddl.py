@@ -0,0 +1,129 @@
+import re
+from typing import Dict, List, NamedTuple, Tuple
+
+from parse_dbml_schema import DbmlIndex
+
+#PostgreSQL built-in types a DBML column may name as is; anything else (enums, domains) keeps the header type
+BUILTIN_TYPES = {
+    "int2", "int4", "int8", "smallint", "integer", "int", "bigint",
+    "float4", "float8", "real", "numeric", "decimal", "money",
+    "bool", "boolean",
+    "text", "varchar", "bpchar", "char", "character", "citext",
+    "date", "time", "timetz", "timestamp", "timestamptz", "interval",
+    "uuid", "json", "jsonb", "bytea", "inet", "cidr", "tsvector",
+}
+#the values of serial columns come from the raw files, no sequence is created for them
+SERIAL_TYPES = {"serial": "int4", "serial4": "int4", "smallserial": "int2", "serial2": "int2",
+                "bigserial": "int8", "serial8": "int8"}
+_TYPE_RE = re.compile(r"^(\w+)(\(\s*\d+\s*(?:,\s*\d+\s*)?\))?((?:\[\])*)$")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+_METHOD_RE = re.compile(r"^(btree|hash|gin|gist|brin|spgist)$")
+#identifiers are limited to 63 bytes, longer generated index names are cut
+_MAX_IDENTIFIER = 63
+
+
+def postgres_type(dbml_type: str):
+    """The column type of a DBML type (`int2`, `numeric(5,2)`, `bpchar(20)`, `text[]`, `_text`), None if not built in."""
+    m = _TYPE_RE.match(dbml_type.strip().lower())
+    if not m:
+        return None
+    base, args, arrays = m.groups()
+    #pg_dump spells arrays with a leading underscore
+    if base.startswith("_") and not arrays:
+        base, arrays = base[1:], "[]"
+    base = SERIAL_TYPES.get(base, base)
+    if base not in BUILTIN_TYPES:
+        return None
+    args = re.sub(r"\s", "", args or "")
+    return f"{base}{args}{arrays}"
+
+
+class ColumnDDL(NamedTuple):
+    name: str
+    pg_type: str
+    not_null: bool = False
+    default: str = None
+
+    def sql(self, constraints=True):
+        parts = [self.name, self.pg_type]
+        if self.default is not None:
+            parts.append(f"DEFAULT {self.default}")
+        if constraints and self.not_null:
+            parts.append("NOT NULL")
+        return " ".join(parts)
+
+
+class TableDDL(NamedTuple):
+    """
+    Exact DDL of a loaded table: column types, defaults, NOT NULL and the primary key from the DBML
+    schema, header types for the columns it does not know. Created in full, or created bare for a bulk
+    load with `constraint_sql` and `index_sql` run once the rows are in.
+    """
+    table_name: str
+    columns: List[ColumnDDL]
+    primary_key: List[str]
+    indexes: List[DbmlIndex]
+
+    def create_sql(self, unlogged=False, constraints=True, if_not_exists=False):
+        cols_sql = [column.sql(constraints) for column in self.columns]
+        if constraints and self.primary_key:
+            cols_sql.append(f"PRIMARY KEY ({', '.join(self.primary_key)})")
+        return (f"CREATE {'UNLOGGED ' if unlogged else ''}TABLE {'IF NOT EXISTS ' if if_not_exists else ''}"
+                f"{self.table_name} ({', '.join(cols_sql)})")
+
+    def constraint_sql(self):
+        """The NOT NULL and primary key of a table created without constraints, as one ALTER TABLE."""
+        actions = [f"ALTER COLUMN {column.name} SET NOT NULL" for column in self.columns if column.not_null]
+        if self.primary_key:
+            actions.append(f"ADD PRIMARY KEY ({', '.join(self.primary_key)})")
+        return [f"ALTER TABLE {self.table_name} {', '.join(actions)}"] if actions else []
+
+    def index_sql(self):
+        statements = []
+        for index in self.indexes:
+            name = index.name if index.name and _IDENTIFIER_RE.match(index.name) else (
+                f"{self.table_name}_{'_'.join(index.columns)}_idx"[:_MAX_IDENTIFIER]
+            )
+            using = f" USING {index.method}" if index.method else ""
+            statements.append(
+                f"CREATE {'UNIQUE ' if index.unique else ''}INDEX IF NOT EXISTS {name} "
+                f"ON {self.table_name}{using} ({', '.join(index.columns)})"
+            )
+        return statements
+
+
+def compile_table(table_name: str, cols_and_types: List[Tuple[str, str]], dbml_columns: Dict = None,
+                  dbml_indexes: List[DbmlIndex] = None) -> TableDDL:
+    """
+    TableDDL of the (name, header type) columns of a frame, typed and constrained by the table's DBML
+    columns and indexes when given. Keys and indexes only cover columns the frame has.
+    """
+    dbml_columns = dbml_columns or {}
+    columns = []
+    for name, header_type in cols_and_types:
+        schema = dbml_columns.get(name)
+        if schema is None:
+            columns.append(ColumnDDL(name, header_type))
+            continue
+        constraints = schema["constraints"]
+        default = constraints.get("default_sql")
+        #sequences of the source database are not recreated here
+        if default is not None and "nextval(" in default.lower():
+            default = None
+        columns.append(ColumnDDL(
+            name,
+            postgres_type(schema["type"]) or header_type,
+            bool(constraints.get("not null") or constraints.get("pk")),
+            default,
+        ))
+
+    names = {column.name for column in columns}
+    primary_key = [col for col, schema in dbml_columns.items() if schema["constraints"].get("pk")]
+    if not set(primary_key) <= names:
+        primary_key = []
+    indexes = [
+        index for index in dbml_indexes or []
+        if not index.pk and set(index.columns) <= names
+        and (index.method is None or _METHOD_RE.match(index.method.lower()))
+    ]
+    return TableDDL(table_name, columns, primary_key, indexes)
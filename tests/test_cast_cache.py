@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from cast_cache import cast_distinct, memoized
+from PostgresCaster import PostgresCaster
+from series_caster import SeriesCaster
+
+#few distinct values repeated over many rows, so cast_distinct casts the uniques only
+REPEATED = {
+    "to_integer": ["12", "12x", None, " 7 ", ""],
+    "to_float": ["1.5", "abc", None, "1e3", ""],
+    "to_boolean": ["t", "maybe", None, "FALSE", ""],
+    "to_date": ["2021-01-31", "31/12/2021", "2021-13-45", None, "9999-12-31"],
+    "to_timestamptz": ["2021-01-31 10:00:00+02", "tomorrow", None, "2021-01-31 10:00:00"],
+}
+
+
+def same(a, b):
+    return len(a) == len(b) and all(
+        (pd.isna(x) and pd.isna(y)) if pd.isna(y) else (x == y and type(x) is type(y)) for x, y in zip(a, b)
+    )
+
+
+@pytest.mark.parametrize("name", sorted(REPEATED))
+def test_cast_distinct_matches_casting_every_row(name):
+    cast = getattr(SeriesCaster, name)
+    series = pd.Series(REPEATED[name] * 50, dtype="str", index=range(100, 100 + 50 * len(REPEATED[name])))
+    got = cast_distinct(cast)(series)
+    want = cast(series)
+    assert got.index.equals(series.index)
+    assert same(got.tolist(), want.tolist())
+
+
+def test_cast_distinct_passes_mostly_unique_columns_through():
+    seen = []
+
+    def cast(series):
+        seen.append(len(series))
+        return series
+
+    cast_distinct(cast)(pd.Series([str(i) for i in range(10)], dtype="str"))
+    assert seen == [10]
+
+
+@pytest.mark.parametrize("name", sorted(REPEATED))
+def test_memoized_matches_the_scalar_caster(name):
+    cast = getattr(PostgresCaster, name)
+    cached = memoized(cast)
+    values = [v for v in REPEATED[name] if v is not None] * 3
+    assert same([cached(v) for v in values], [cast(v) for v in values])
+    assert cached.cache_info().hits == len(values) - len(set(values))
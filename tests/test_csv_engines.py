@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from csv_processor import CSVProcessor
+
+SCHEMA = """
+actor:
+  actor_id:
+    type: Integer
+  first_name:
+    type: String
+film:
+  load_mode: append
+"""
+
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "table_format.yml").write_text(SCHEMA)
+    (tmp_path / "actor.csv").write_text("actor_id,first_name,unused\n1,PENELOPE,x\n2,NICK,y\n")
+    (tmp_path / "film.csv").write_text("film_id,title\n1,ACADEMY DINOSAUR\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize("table", ["actor", "film"])
+def test_pyarrow_and_c_parsers_read_the_same_columns(folder, table):
+    frames = [
+        CSVProcessor(str(folder / "table_format.yml"), csv_engine=engine).process_file(str(folder / f"{table}.csv"))[0]
+        for engine in ("c", "pyarrow")
+    ]
+    pd.testing.assert_frame_equal(frames[0], frames[1])
+    if table == "film":
+        #a table configuring no column reads none
+        assert frames[1].shape == (0, 0)
@@ -0,0 +1,82 @@
+import contextlib
+
+import pandas as pd
+import pytest
+
+import main
+from parse_dbml_schema import DBMLValidator
+from postgresCsvExporter import PostgresCsvExporter
+
+
+class FakeConn:
+    def rollback(self):
+        pass
+
+    def set_session(self, **kwargs):
+        pass
+
+
+class FakeSession:
+    capacity = 4
+
+    @contextlib.contextmanager
+    def raw(self, stage=None):
+        yield FakeConn()
+
+
+def failing_export(self, table, file_path, *args, **kwargs):
+    if table == "film":
+        raise RuntimeError("relation \"film\" does not exist")
+    with open(file_path, "w") as f:
+        f.write("actor_id\n1\n")
+
+
+def test_sequential_export_returns_failed_tables(tmp_path, monkeypatch):
+    monkeypatch.setattr(PostgresCsvExporter, "_export_one", failing_export)
+    config = {"output_dir": str(tmp_path), "export_workers": 1}
+    failed = main.export_tables(config, FakeSession(), ["actor", "film"])
+    assert list(failed) == ["film"]
+    assert (tmp_path / "temp_actor.csv").exists() and not (tmp_path / "temp_film.csv").exists()
+
+
+def test_concurrent_export_returns_failed_tables(tmp_path, monkeypatch):
+    def snapshot_exports(self, table_names, *args, **kwargs):
+        return {table: {"file": None, "seconds": 0.0, "bytes": 0, "error": "boom" if table == "film" else None}
+                for table in table_names}
+
+    monkeypatch.setattr(PostgresCsvExporter, "export_tables_concurrently", snapshot_exports)
+    config = {"output_dir": str(tmp_path), "export_workers": 4}
+    assert main.export_tables(config, FakeSession(), ["actor", "film"]) == {"film": "boom"}
+
+
+def test_async_export_of_a_failed_table_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(PostgresCsvExporter, "_export_one", failing_export)
+    with pytest.raises(RuntimeError):
+        main.export_table_or_raise({"output_dir": str(tmp_path)}, FakeSession(), "film")
+
+
+class FailingCopyConn:
+    """A connection whose COPY fails before sending any row, like a missing relation."""
+
+    def cursor(self):
+        return contextlib.nullcontext(self)
+
+    def copy_expert(self, sql, sink):
+        raise RuntimeError('relation "film" does not exist')
+
+    def commit(self):
+        raise AssertionError("a failed export must not commit")
+
+
+def test_failed_copy_while_validating_raises_the_database_error(tmp_path):
+    dbml = tmp_path / "schema.dbml"
+    dbml.write_text('Table "film" {\n  "film_id" int4 [pk]\n}\n')
+    validator = DBMLValidator(str(tmp_path), str(dbml), str(tmp_path / "invalid"))
+    file_path = tmp_path / "temp_film.csv"
+
+    exporter = PostgresCsvExporter(FakeSession())
+    with pytest.raises(RuntimeError, match='relation "film" does not exist') as raised:
+        exporter.export_and_validate_table("film", validator, str(file_path), conn=FailingCopyConn())
+    #the empty stream pandas could not parse is kept as the cause
+    assert isinstance(raised.value.__cause__, pd.errors.EmptyDataError)
+    assert not file_path.exists()
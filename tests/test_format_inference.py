@@ -0,0 +1,65 @@
+import datetime
+import logging
+
+import pandas as pd
+import pytest
+import yaml
+
+from cast_cache import FormatOrder
+from csv_processor import CSVProcessor
+from series_caster import SeriesCaster
+
+SCHEMA = """
+rental:
+  rental_date:
+    type: Date
+  return_date:
+    type: Date
+    format: "%d/%m/%Y"
+"""
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / "table_format.yml"
+    path.write_text(SCHEMA)
+    return str(path)
+
+
+def test_the_format_of_most_sampled_values_goes_first():
+    order = FormatOrder(("%Y-%m-%d", "%Y/%m/%d"))
+    series = pd.Series(["2021/01/31", "2021/02/01", "2021-03-01", None], dtype="str")
+    dates = SeriesCaster.to_date(series, order).tolist()
+    assert order.inferred == "%Y/%m/%d" and order.formats[0] == "%Y/%m/%d"
+    assert dates[:3] == [datetime.date(2021, 1, 31), datetime.date(2021, 2, 1), datetime.date(2021, 3, 1)]
+
+
+def test_a_pinned_format_is_never_inferred():
+    order = FormatOrder(["%d/%m/%Y"], pinned=True)
+    SeriesCaster.to_date(pd.Series(["2021-01-31"], dtype="str"), order)
+    assert order.inferred is None and order.formats == ["%d/%m/%Y"]
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_pinned_format_quarantines_other_spellings(schema, tmp_path, vectorized, caplog):
+    processor = CSVProcessor(schema, vectorized=vectorized, quarantine_dir=str(tmp_path / "quarantine"))
+    raw = pd.DataFrame({
+        "rental_date": ["2021/01/31", "2021/02/01", "2021/02/02"],
+        "return_date": ["01/02/2021", "2021-02-03", "03/02/2021"],
+    })
+    with caplog.at_level(logging.INFO):
+        df = processor.transform(raw, processor.plans["rental"])
+    assert df["return_date:Date"].dt.strftime("%Y-%m-%d").tolist() == ["2021-02-01", "2021-02-03"]
+    assert processor.quarantine.counts == {"rental": 1}
+    if vectorized:
+        #the unpinned column reports what it inferred, once
+        assert sum("Inferred format '%Y/%m/%d' for rental.rental_date" in r.message for r in caplog.records) == 1
+
+
+@pytest.mark.parametrize("rules", [{"type": "Integer", "format": "%Y"}, {"type": "Date", "format": ""},
+                                   {"type": "Date", "format": ["%Y", 3]}])
+def test_invalid_format_fails_on_the_schema(tmp_path, rules):
+    path = tmp_path / "table_format.yml"
+    path.write_text(yaml.safe_dump({"rental": {"rental_date": rules}}))
+    with pytest.raises(ValueError, match="rental.rental_date"):
+        CSVProcessor(str(path))
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from cast_cache import FormatOrder
+from series_caster import SeriesCaster
+
+FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y%m%d")
+
+
+def test_concurrent_records_keep_every_format():
+    order = FormatOrder(FORMATS)
+
+    def reorder(i):
+        for j in range(2000):
+            order.record(FORMATS[(i + j) % len(FORMATS)])
+            assert sorted(order) == sorted(FORMATS)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(reorder, range(4)))
+    assert sorted(order.formats) == sorted(FORMATS)
+
+
+def test_format_is_inferred_once_across_threads():
+    order = FormatOrder(FORMATS)
+    calls = []
+    barrier = threading.Barrier(4)
+
+    def infer(_):
+        barrier.wait()
+        return order.infer(lambda fmt: calls.append(fmt) or (fmt == "%d/%m/%Y"))
+
+    with ThreadPoolExecutor(4) as pool:
+        assert set(pool.map(infer, range(4))) == {"%d/%m/%Y"}
+    assert len(calls) == len(FORMATS)
+    assert order.formats[0] == "%d/%m/%Y"
+
+
+def test_parts_parsed_in_parallel_match_one_pass():
+    values = ["2024-01-31", "31/01/2024", "20240131", None, "junk"] * 200
+    parts = [pd.Series(values[i::4], dtype=object) for i in range(4)]
+    expected = [SeriesCaster.to_date(part, FormatOrder(FORMATS)).tolist() for part in parts]
+
+    shared = FormatOrder(FORMATS)
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda part: SeriesCaster.to_date(part, shared).tolist(), parts))
+    assert results == expected
@@ -0,0 +1,41 @@
+from manifest import RunManifest
+from parse_dbml_schema import parse_dbml_schema
+
+DBML = """
+Table "actor" {
+  "actor_id" int4 [pk]
+  "first_name" varchar(45) [not null]
+}
+"""
+
+
+def fingerprint(tmp_path, dbml_text):
+    raw = tmp_path / "actor.csv"
+    raw.write_text("actor_id,first_name\n1,PENELOPE\n")
+    (tmp_path / "film.csv").write_text("film_id\n1\n")
+    dbml = tmp_path / "schema.dbml"
+    dbml.write_text(dbml_text)
+    manifest = RunManifest(str(tmp_path / "manifest.json"))
+    current = manifest.fingerprint(
+        {"actor": [str(raw)], "film": [str(tmp_path / "film.csv")]}, {}, str(dbml), parse_dbml_schema(str(dbml))
+    )
+    return manifest, current
+
+
+def test_dbml_change_reloads_the_tables_it_defines(tmp_path):
+    manifest, current = fingerprint(tmp_path, DBML)
+    manifest.update(current, "sql")
+    manifest.save()
+
+    manifest, current = fingerprint(tmp_path, DBML.replace("varchar(45)", "text"))
+    assert manifest.changed_tables(current) == {"actor"}
+
+
+def test_unchanged_dbml_keeps_tables_unchanged(tmp_path):
+    manifest, current = fingerprint(tmp_path, DBML)
+    manifest.update(current, "sql")
+    manifest.save()
+
+    manifest, current = fingerprint(tmp_path, DBML)
+    assert manifest.changed_tables(current) == set()
+    assert "dbml" not in current["film"]
@@ -0,0 +1,75 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import metrics
+from csv_processor import CSVProcessor, native_column
+
+SCHEMA = """
+rental:
+  rental_id:
+    type: Integer
+  amount:
+    type: Float
+  returned:
+    type: Boolean
+  rental_date:
+    type: Date
+  last_update:
+    type: Timestamptz
+  status:
+    type: String
+"""
+
+
+@pytest.fixture
+def processor(tmp_path):
+    schema = tmp_path / "table_format.yml"
+    schema.write_text(SCHEMA)
+    return CSVProcessor(str(schema))
+
+
+def test_cast_columns_get_native_dtypes(processor):
+    raw = pd.DataFrame({
+        "rental_id": ["1", "2", None, "4"],
+        "amount": ["1.5", None, "2", "3"],
+        "returned": ["t", "f", None, "t"],
+        "rental_date": ["2021-01-31", None, "2021-02-01", "2021-02-02"],
+        "last_update": ["2021-01-31 10:00:00+02:00", "2021-01-31 10:00:00+00", None, "2021-01-31 12:00:00+00"],
+        "status": ["open", "open", "closed", "open"],
+    })
+    df = processor.transform(raw, processor.plans["rental"])
+    assert {col: str(dtype) for col, dtype in df.dtypes.items()} == {
+        "rental_id:Integer": "Int64",
+        "amount:Float": "Float64",
+        "returned:Boolean": "boolean",
+        "rental_date:Date": "datetime64[s]",
+        "last_update:Timestamptz": "datetime64[us, UTC]",
+        "status:String": "category",
+    }
+    #missing values stay NULL, ints are not turned into floats
+    assert df["rental_id:Integer"].tolist() == [1, 2, pd.NA, 4]
+    assert df["last_update:Timestamptz"][0] == pd.Timestamp("2021-01-31 08:00:00", tz="UTC")
+
+
+def test_values_that_fit_no_dtype_are_left_as_is():
+    naive_and_aware = pd.Series([datetime.datetime(2021, 1, 1),
+                                 datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)], dtype=object)
+    assert native_column(naive_and_aware, "Timestamptz") is naive_and_aware
+    unique = pd.Series(["a", "b", "c"], dtype=object)
+    assert native_column(unique, "String") is unique
+
+
+def test_memory_saved_is_reported(processor, capsys):
+    run = metrics.RunMetrics()
+    previous = metrics.activate(run)
+    try:
+        raw = pd.DataFrame({"rental_id": [str(i) for i in range(1000)], "status": ["open"] * 1000})
+        processor.transform(raw, processor.plans["rental"])
+    finally:
+        metrics.activate(previous)
+    compact = next(s for s in run.records() if s["stage"] == "compact")
+    assert compact["bytes"] < compact["bytes_in"]
+    run.summary()
+    assert "saved" in capsys.readouterr().out
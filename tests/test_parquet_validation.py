@@ -0,0 +1,46 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from columnar import read_parquet_chunks, stringify_frame
+from parse_dbml_schema import DBMLValidator
+
+DBML = '''Table "rental" {
+  "rental_id" int4 [not null]
+  "staff_id" int2
+  "amount" numeric
+}
+'''
+
+
+def write_export(path):
+    #like write_cursor_parquet: arrow types from postgres, no pandas metadata
+    table = pa.table({
+        "rental_id": pa.array([1, 2, 3], type=pa.int32()),
+        "staff_id": pa.array([7, None, 9], type=pa.int16()),
+        "amount": pa.array([1.5, None, 2.0], type=pa.float64()),
+    })
+    pq.write_table(table, path)
+
+
+def test_nullable_int_round_trips_as_integers(tmp_path):
+    path = tmp_path / "temp_rental.parquet"
+    write_export(path)
+    frame = next(read_parquet_chunks(str(path), 100))
+    assert str(frame["staff_id"].dtype) == "Int16"
+    assert stringify_frame(frame)["staff_id"].tolist() == ["7", "", "9"]
+
+
+def test_parquet_export_with_null_ints_validates(tmp_path):
+    schema = tmp_path / "schema.dbml"
+    schema.write_text(DBML)
+    path = tmp_path / "temp_rental.parquet"
+    write_export(path)
+    validator = DBMLValidator(str(tmp_path), str(schema), str(tmp_path / "invalid"))
+    assert validator.validate_single_csv(str(path)) == (3, 0)
+
+
+def test_pandas_nullable_frame_round_trips(tmp_path):
+    path = tmp_path / "cached.parquet"
+    pd.DataFrame({"film_id": pd.array([1, None, 3], dtype="Int64")}).to_parquet(path, index=False)
+    assert next(read_parquet_chunks(str(path), 100))["film_id"].tolist() == [1, pd.NA, 3]
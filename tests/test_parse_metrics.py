@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+import metrics
+from csv_processor import CSVProcessor
+
+SCHEMA = """
+payment:
+  amount:
+    type: Float
+    parse:
+      - Replace(",", ".")
+      - ToFloat(2)
+"""
+
+
+@pytest.fixture
+def run():
+    run = metrics.RunMetrics()
+    previous = metrics.activate(run)
+    yield run
+    metrics.activate(previous)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_parse_steps_are_timed(tmp_path, run, vectorized):
+    schema = tmp_path / "table_format.yml"
+    schema.write_text(SCHEMA)
+    processor = CSVProcessor(str(schema), vectorized=vectorized)
+    df = processor.transform(pd.DataFrame({"amount": ["1,5", "2,25"]}), processor.plans["payment"])
+
+    assert df["amount:Float"].tolist() == [1.5, 2.25]
+    details = {s["detail"] for s in run.records() if s["stage"] == "parse"}
+    if vectorized:
+        assert details == {'amount Replace(",", ".")', "amount ToFloat(2)"}
+    else:
+        assert details == {"amount"}
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from csv_processor import CSVProcessor
+from manifest import RunManifest
+
+SCHEMA = """
+actor:
+  actor_id:
+    type: Integer
+    required: true
+  first_name:
+    type: String
+    required: true
+"""
+
+
+@pytest.fixture
+def processor(tmp_path):
+    schema = tmp_path / "table_format.yml"
+    schema.write_text(SCHEMA)
+    (tmp_path / "actor.csv").write_text("actor_id,first_name\n1,PENELOPE\n2,NICK\n")
+    return CSVProcessor(str(schema), cache_dir=str(tmp_path / "cache"))
+
+
+def no_hashing(monkeypatch):
+    def hash_file(path, block_size=1 << 20):
+        raise AssertionError(f"{path} was hashed again")
+    monkeypatch.setattr(RunManifest, "hash_file", staticmethod(hash_file))
+
+
+def test_cache_key_reuses_the_manifest_digest(processor, tmp_path, monkeypatch):
+    raw = str(tmp_path / "actor.csv")
+    processor.file_digests = {"actor.csv": RunManifest.hash_file(raw)}
+    no_hashing(monkeypatch)
+    df, _ = processor.process_file(raw)
+    cached, _ = processor.process_file(raw)
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    assert cached["actor_id:Integer"].tolist() == df["actor_id:Integer"].tolist() == [1, 2]
+
+
+def test_chunked_reads_do_not_touch_the_cache(processor, tmp_path, monkeypatch):
+    no_hashing(monkeypatch)
+    chunks = list(processor.iter_file_chunks(str(tmp_path / "actor.csv"), 1))
+    assert [len(chunk) for chunk, _ in chunks] == [1, 1]
+    assert os.listdir(tmp_path / "cache") == []
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from csv_processor import CSVProcessor
+from quarantine import Quarantine
+
+SCHEMA = """
+payment:
+  payment_id:
+    type: Integer
+    required: true
+  amount:
+    type: Float
+  paid:
+    type: Boolean
+  payment_date:
+    type: Timestamp
+  note:
+    type: String
+"""
+
+#three failing rows, one missing its required id and four clean ones
+RAW = pd.DataFrame({
+    "payment_id": ["1", "2", "3", "", "5", "x6", "7", "8"],
+    "amount": ["1.5", "abc", "2", "zzz", None, "3", "4", "5"],
+    "paid": ["t", "f", "maybe", "t", None, "t", "f", "f"],
+    "payment_date": ["2021-01-31 10:00:00", "2021-02-01 10:00:00", "2021/02/02 10:00:00", "noon",
+                     None, "2021-02-03 10:00:00", None, None],
+    "note": ["a", "b", "c", "d", "e", "f", "g", "h"],
+})
+
+
+def processor_for(tmp_path, vectorized=True, quarantine_dir=None):
+    schema = tmp_path / "table_format.yml"
+    schema.write_text(SCHEMA)
+    return CSVProcessor(str(schema), vectorized=vectorized, quarantine_dir=quarantine_dir)
+
+
+def transform(tmp_path, vectorized):
+    processor = processor_for(tmp_path, vectorized, str(tmp_path / f"quarantine_{vectorized}"))
+    df = processor.transform(RAW.copy(), processor.plans["payment"])
+    quarantined = pd.read_csv(processor.quarantine.path_for("payment"), dtype=str, keep_default_na=False)
+    return df, quarantined
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_rows_failing_a_cast_are_set_aside(tmp_path, vectorized):
+    df, quarantined = transform(tmp_path, vectorized)
+    assert df["payment_id:Integer"].tolist() == [1, 5, 7, 8]
+    #the row missing its required id is dropped, not quarantined
+    assert quarantined["payment_id"].tolist() == ["2", "3", "x6"]
+    assert quarantined["error"].tolist() == [
+        "amount: not a valid Float",
+        "paid: not a valid Boolean",
+        "payment_id: not a valid Integer",
+    ]
+
+
+def test_vectorized_and_scalar_runs_agree(tmp_path):
+    vector_df, vector_quarantined = transform(tmp_path, True)
+    scalar_df, scalar_quarantined = transform(tmp_path, False)
+    #.apply leaves text as pandas' str dtype, the column path as object: same values either way
+    pd.testing.assert_frame_equal(vector_df, scalar_df.astype({"note:String": object}))
+    pd.testing.assert_frame_equal(vector_quarantined, scalar_quarantined)
+
+
+def test_without_a_folder_failing_rows_stay_in_the_frame(tmp_path):
+    processor = processor_for(tmp_path)
+    df = processor.transform(RAW.copy(), processor.plans["payment"])
+    assert len(df) == 7 and processor.quarantine.counts == {}
+
+
+def test_a_mostly_failing_chunk_fails_its_table(tmp_path):
+    processor = processor_for(tmp_path, quarantine_dir=str(tmp_path / "quarantine"))
+    raw = RAW.copy()
+    raw["amount"] = "1,5"
+    with pytest.raises(ValueError, match="7 of 7 rows of payment failed their cast"):
+        processor.transform(raw, processor.plans["payment"])
+    #the rows are still written for a look
+    assert len(pd.read_csv(tmp_path / "quarantine" / "payment.csv")) == 7
+
+
+def test_parts_are_combined_in_part_order(tmp_path):
+    errors = pd.Series(["amount: not a valid Float"])
+    for part in (2, 1):
+        Quarantine(str(tmp_path), part=part).add("payment", pd.DataFrame({"amount": [f"bad{part}"]}), errors, 4)
+    assert Quarantine(str(tmp_path)).combine("payment") == 2
+    assert pd.read_csv(tmp_path / "payment.csv")["amount"].tolist() == ["bad1", "bad2"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["payment.csv"]
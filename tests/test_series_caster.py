@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from PostgresCaster import PostgresCaster
+from formater import Formater
+from series_caster import SeriesCaster
+from series_formater import SeriesFormater
+
+
+def scalar(fn, values):
+    """What the per-row path gives for each value, nulls passed as None."""
+    return [None if pd.isna(v) else fn(v) for v in values]
+
+
+def assert_same(vectorized, expected):
+    assert len(vectorized) == len(expected)
+    for got, want in zip(vectorized, expected):
+        if want is None:
+            assert pd.isna(got)
+        else:
+            assert got == want and type(got) is type(want), (got, want)
+
+
+DIRTY = {
+    "to_integer": ["12", " 7 ", "-3", "12x", "n/a", "1.5", "", None, "99999999999999999999"],
+    "to_float": ["1.5", "-2", "1e3", "abc", "1,5", "", None, ".5"],
+    "to_boolean": ["t", "FALSE", "yes", "0", "maybe", "", None, "On"],
+    "to_date": ["2021-01-31", "2021/02/01", "2021-13-45", "31/12/2021", "", None, "9999-12-31", "1500-01-01"],
+    "to_timestamp": ["2021-01-31 10:00:00", "2021/02/01 23:59:59", "noon", None, "9999-12-31 23:59:59",
+                     "1500-01-01 00:00:00"],
+    "to_timestamptz": ["2021-01-31 10:00:00+00", "2021-01-31 10:00:00.123+00", "2021-01-31 10:00:00",
+                       "2021-01-31 10:00:00+02", "tomorrow", None, "9999-12-31 23:59:59+00",
+                       "1500-01-01 00:00:00+00"],
+}
+
+
+@pytest.mark.parametrize("name", sorted(DIRTY))
+def test_vectorized_casts_match_scalar_on_dirty_data(name):
+    values = DIRTY[name]
+    series = pd.Series(values, dtype="str")
+    assert_same(getattr(SeriesCaster, name)(series).tolist(), scalar(getattr(PostgresCaster, name), values))
+
+
+@pytest.mark.parametrize("name", ["to_date", "to_timestamp", "to_timestamptz"])
+def test_dates_outside_the_nanosecond_range(name):
+    suffix = {"to_date": "", "to_timestamp": " 12:30:00", "to_timestamptz": " 12:30:00+00"}[name]
+    values = [f"{day}{suffix}" for day in ("9999-12-31", "1500-01-01", "0001-01-01", "2020-06-15")]
+    series = pd.Series(values, dtype="str")
+    assert_same(getattr(SeriesCaster, name)(series).tolist(), scalar(getattr(PostgresCaster, name), values))
+
+
+def test_integer_floats_past_int64_stay_exact():
+    series = pd.Series([1e20, -1e19, 7.9, np.nan])
+    assert SeriesCaster.to_integer(series).tolist()[:3] == [10 ** 20, -10 ** 19, 7]
+
+
+def test_to_int_parse_step_past_int64_matches_scalar():
+    values = ["1e20", "12345678901234567890", "7", "-7.9", None]
+    parsed = SeriesFormater.to_int()(pd.Series(values, dtype="str")).tolist()
+    assert_same(parsed, scalar(Formater.to_int, values))
+
+
+@pytest.mark.parametrize("series", [
+    pd.Series([1.9, -2.5, np.nan, 1e20]),
+    pd.Series([1, 2, None], dtype="Int64"),
+    pd.Series([3, 4], dtype="int64"),
+])
+def test_to_int_parse_step_on_typed_columns_matches_scalar(series):
+    values = series.tolist()
+    assert_same(SeriesFormater.to_int()(series).tolist(), scalar(Formater.to_int, values))
+
+
+def test_to_float_then_to_int_steps():
+    values = ["1.256", "x", None, "-7.5"]
+    floats = SeriesFormater.to_float(2)(pd.Series(values, dtype="str"))
+    expected = scalar(Formater.to_int, scalar(Formater.to_float(2), values))
+    assert_same(SeriesFormater.to_int()(floats).tolist(), expected)
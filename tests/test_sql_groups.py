@@ -0,0 +1,49 @@
+from sqlScriptExecutor import SqlScriptExecutor, parse_statements, statement_groups, written_tables
+
+
+class FakeSession:
+    capacity = 4
+
+
+VIEW_CHAIN = """
+CREATE OR REPLACE VIEW v1 AS SELECT * FROM film;
+CREATE VIEW v2 AS SELECT * FROM v1;
+CREATE MATERIALIZED VIEW IF NOT EXISTS m3 AS SELECT * FROM v2;
+SELECT * INTO TEMP t4 FROM m3;
+CREATE TABLE t5 AS SELECT * FROM t4;
+INSERT INTO report SELECT * FROM t5;
+"""
+
+
+def groups_of(sql):
+    return [[s.index for s in group] for group in statement_groups(parse_statements(sql))]
+
+
+def test_view_chain_is_one_group():
+    assert groups_of(VIEW_CHAIN) == [[0, 1, 2, 3, 4, 5]]
+    assert written_tables(VIEW_CHAIN) == {"v1", "v2", "m3", "t4", "t5", "report"}
+
+
+def test_independent_tables_run_as_separate_groups():
+    sql = "INSERT INTO a SELECT * FROM film; INSERT INTO b SELECT * FROM actor; CREATE INDEX b_idx ON b (id);"
+    assert groups_of(sql) == [[0], [1, 2]]
+
+
+def test_refresh_and_drop_view_join_the_view_group():
+    sql = VIEW_CHAIN + "REFRESH MATERIALIZED VIEW CONCURRENTLY m3; DROP VIEW IF EXISTS v1; INSERT INTO x SELECT 1 FROM y;"
+    assert groups_of(sql) == [[0, 1, 2, 3, 4, 5, 6, 7], [8]]
+
+
+def test_unknown_ddl_makes_the_script_one_group():
+    sql = "INSERT INTO a SELECT * FROM film; CREATE FUNCTION f() RETURNS int AS $$ SELECT 1 $$ LANGUAGE sql; " \
+          "INSERT INTO b SELECT * FROM actor; DROP INDEX a_idx;"
+    assert groups_of(sql) == [[0, 1, 2, 3]]
+
+
+def test_groups_reading_no_table_always_run_on_incremental_runs(tmp_path):
+    script = tmp_path / "map.sql"
+    script.write_text("INSERT INTO a SELECT * FROM film; INSERT INTO b SELECT * FROM actor; "
+                      "INSERT INTO rating_lookup VALUES ('G', 'General');")
+    executor = SqlScriptExecutor(FakeSession())
+    planned = [[s.index for s in group] for group in executor.plan_file(str(script), {"film"})]
+    assert planned == [[0], [2]]
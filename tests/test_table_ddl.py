@@ -0,0 +1,123 @@
+import contextlib
+
+import pandas as pd
+import pytest
+
+from parse_dbml_schema import parse_dbml_indexes, parse_dbml_schema
+from postgresLoader import PostgresLoader
+from table_ddl import compile_table, postgres_type
+
+DBML = """
+Table "film_actor" {
+  "actor_id" int2 [not null]
+  "film_id" int2 [not null]
+  "note" varchar(20) [default: 'it\\'s']
+  "rate" numeric(4,2) [default: 4.99]
+  "last_update" timestamp [not null, default: `now()`]
+  "rowid" serial [default: `nextval('film_actor_seq'::regclass)`]
+  "mood" mood_enum
+
+  Indexes {
+    (actor_id, film_id) [pk]
+    film_id [name: "idx_fk_film_id"]
+    (note, rate) [unique, type: btree]
+  }
+}
+"""
+
+HEADERS = [("actor_id", "INTEGER"), ("film_id", "INTEGER"), ("note", "TEXT"), ("rate", "FLOAT"),
+           ("last_update", "TIMESTAMPTZ"), ("rowid", "INTEGER"), ("mood", "TEXT")]
+
+
+@pytest.fixture
+def dbml(tmp_path):
+    path = tmp_path / "schema.dbml"
+    path.write_text(DBML)
+    return parse_dbml_schema(str(path)), parse_dbml_indexes(str(path))
+
+
+@pytest.mark.parametrize("dbml_type, expected", [
+    ("int4", "int4"), ("numeric( 5, 2 )", "numeric(5,2)"), ("bpchar(20)", "bpchar(20)"), ("text[]", "text[]"),
+    ("_text", "text[]"), ("bigserial", "int8"), ("mood_enum", None), ("varchar(x)", None),
+])
+def test_postgres_type(dbml_type, expected):
+    assert postgres_type(dbml_type) == expected
+
+
+def test_table_compiled_from_dbml(dbml):
+    tables, indexes = dbml
+    ddl = compile_table("film_actor", HEADERS, tables["film_actor"], indexes["film_actor"])
+    assert ddl.create_sql() == (
+        "CREATE TABLE film_actor (actor_id int2 NOT NULL, film_id int2 NOT NULL, note varchar(20) DEFAULT 'it''s', "
+        "rate numeric(4,2) DEFAULT 4.99, last_update timestamp DEFAULT now() NOT NULL, rowid int4, mood TEXT, "
+        "PRIMARY KEY (actor_id, film_id))"
+    )
+    assert ddl.create_sql(unlogged=True, constraints=False).startswith(
+        "CREATE UNLOGGED TABLE film_actor (actor_id int2, film_id int2, "
+    )
+    assert ddl.constraint_sql() == [
+        "ALTER TABLE film_actor ALTER COLUMN actor_id SET NOT NULL, ALTER COLUMN film_id SET NOT NULL, "
+        "ALTER COLUMN last_update SET NOT NULL, ADD PRIMARY KEY (actor_id, film_id)"
+    ]
+    assert ddl.index_sql() == [
+        "CREATE INDEX IF NOT EXISTS idx_fk_film_id ON film_actor (film_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS film_actor_note_rate_idx ON film_actor USING btree (note, rate)",
+    ]
+
+
+def test_keys_and_indexes_need_every_column(dbml):
+    tables, indexes = dbml
+    ddl = compile_table("film_actor", HEADERS[1:3], tables["film_actor"], indexes["film_actor"])
+    assert ddl.primary_key == [] and [index.columns for index in ddl.indexes] == [("film_id",)]
+
+
+class RecordingSession:
+    """Records the statements run through begin() and the COPYs run through raw()."""
+
+    def __init__(self):
+        self.statements = []
+        session = self
+
+        class Conn:
+            def execute(self, statement):
+                session.statements.append(str(statement))
+
+            def cursor(self):
+                return contextlib.nullcontext(self)
+
+            def copy_expert(self, sql, buffer):
+                session.statements.append(sql.split(" FROM")[0])
+
+            def commit(self):
+                pass
+
+        self.conn = Conn()
+
+    def begin(self, stage=None):
+        return contextlib.nullcontext(self.conn)
+
+    def raw(self, stage=None):
+        return contextlib.nullcontext(self.conn)
+
+
+def test_replace_load_defers_constraints_until_every_chunk_is_in(dbml):
+    tables, indexes = dbml
+    session = RecordingSession()
+    loader = PostgresLoader(session, dbml_tables=tables, dbml_indexes=indexes)
+    chunk = pd.DataFrame({"actor_id:Integer": [1], "film_id:Integer": [2], "last_update:Timestamptz": ["2021-01-01"]})
+    loader.load_stream([("film_actor", chunk.copy()), ("film_actor", chunk.copy())])
+
+    statements = [s.split(" (")[0] for s in session.statements]
+    assert statements == [
+        "DROP TABLE IF EXISTS film_actor;",
+        "CREATE UNLOGGED TABLE film_actor",
+        "COPY film_actor",
+        "COPY film_actor",
+        "ALTER TABLE film_actor ALTER COLUMN actor_id SET NOT NULL, ALTER COLUMN film_id SET NOT NULL, "
+        "ALTER COLUMN last_update SET NOT NULL, ADD PRIMARY KEY",
+        "CREATE INDEX IF NOT EXISTS idx_fk_film_id ON film_actor",
+        "ALTER TABLE film_actor SET LOGGED",
+    ]
+    #finishing twice does nothing
+    loader.finish_table("film_actor")
+    assert len(session.statements) == len(statements)
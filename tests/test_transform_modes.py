@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from csv_processor import CSVProcessor
+
+SCHEMA = """
+film:
+  film_id:
+    type: Integer
+    parse:
+      - ToInt()
+  title:
+    type: String
+    parse:
+      - Replace("_", " ")
+      - ToUpper()
+  rental_rate:
+    type: Float
+    parse:
+      - Replace(",", ".")
+      - ToFloat(2)
+  length:
+    type: Integer
+    parse:
+      - ToFloat(1)
+      - ToInt()
+  last_update:
+    type: Timestamp
+    parse:
+      - Replace("-", "/")
+      - Regex_replace("(\\\\.\\\\d+)?\\\\+\\\\d{2}$", "")
+"""
+
+RAW = pd.DataFrame({
+    "film_id": ["1", "2.0", "3"],
+    "title": ["academy_dinosaur", "ace goldfinger", "adaptation holes"],
+    "rental_rate": ["0,99", "4.989", "2"],
+    "length": ["86.4", "117", "48"],
+    "last_update": ["2013-05-26 14:50:58.951+00", "2006-02-15 05:03:42+00", "2006-02-15 05:03:42.5+00"],
+})
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / "table_format.yml"
+    path.write_text(SCHEMA)
+    return str(path)
+
+
+def test_the_same_plan_compiles_and_transforms_alike_in_both_modes(schema):
+    frames = []
+    for vectorized in (True, False):
+        processor = CSVProcessor(schema, vectorized=vectorized)
+        frames.append(processor.transform(RAW.copy(), processor.plans["film"]))
+    vector, scalar = frames
+    assert vector["title:String"].tolist() == ["ACADEMY DINOSAUR", "ACE GOLDFINGER", "ADAPTATION HOLES"]
+    assert vector["length:Integer"].tolist() == [86, 117, 48]
+    assert str(vector["last_update:Timestamp"][0]) == "2013-05-26 14:50:58"
+    #.apply leaves text as pandas' str dtype, the column path as object: same values either way
+    pd.testing.assert_frame_equal(vector, scalar.astype({"title:String": object}))